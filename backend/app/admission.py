@@ -0,0 +1,178 @@
+from collections import deque
+from time import perf_counter
+from typing import Deque, Dict, List, Optional, Tuple
+from starlette.responses import JSONResponse
+from app.metrics import admission_in_flight, admission_queue_depth, admission_rejected, admission_wait
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Set to "false" to admit every request as soon as it arrives
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "true").lower() == "true"
+# Requests each lane handles at once and lets wait, as "lane=concurrency:queue,...";
+# lanes left out keep their defaults
+ADMISSION_LIMITS = os.environ.get("ADMISSION_LIMITS", "")
+# Longest a request waits for its turn before it is turned away
+ADMISSION_MAX_WAIT_MS = float(os.environ.get("ADMISSION_MAX_WAIT_MS", "500"))
+# Seconds a client that was turned away is asked to wait before retrying
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+
+# Requests handled at once and allowed to wait, per lane
+DEFAULT_LIMITS: Dict[str, Tuple[int, int]] = {
+    "admin": (4, 64),
+    "orders": (8, 32),
+    "exports": (2, 4),
+    "reads": (64, 256),
+}
+# Lane of each route as (lane, method or None for any, path prefix); the first
+# match wins, and requests matching none are reads. Routes in no lane are always admitted.
+ROUTES: List[Tuple[Optional[str], Optional[str], str]] = [
+    # Streams stay open for as long as the client wants; metrics must stay readable under load
+    (None, None, "/changes"),
+    (None, None, "/metrics"),
+    ("admin", None, "/items-management"),
+    ("admin", None, "/offers-management"),
+    ("admin", "POST", "/analytics/rebuild"),
+    ("orders", "POST", "/orders"),
+    ("exports", None, "/exports"),
+]
+DEFAULT_LANE = "reads"
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse lane limits given as "lane=concurrency:queue,..." over the defaults.
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        lane, _, values = part.partition("=")
+        lane = lane.strip()
+        if lane not in limits:
+            raise ValueError(f"Unknown admission lane: {lane}")
+        concurrency, _, queue = values.partition(":")
+        limits[lane] = (int(concurrency), int(queue or 0))
+    return limits
+
+class Lane:
+    """
+    Admits up to `concurrency` requests at once, and lets up to `queue` more
+    wait for a turn, first come first served, for at most `max_wait` seconds.
+    A finishing request hands its turn straight to the next one waiting.
+    Used from one event loop.
+    """
+    def __init__(self, name: str, concurrency: int, queue: int, max_wait: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._in_flight = admission_in_flight.labels(name)
+        self._queue_depth = admission_queue_depth.labels(name)
+        self._wait = admission_wait.labels(name)
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Wait for a turn. Returns None once admitted, or why the request was
+        turned away: "queue_full" or "timeout".
+        """
+        if self._active < self.concurrency and not self._waiters:
+            self._active += 1
+            self._in_flight.inc()
+            self._wait.observe(0.0)
+            return None
+        if len(self._waiters) >= self.queue:
+            return "queue_full"
+
+        start = perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._queue_depth.inc()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            return "timeout"
+        except BaseException:
+            # The client left; a turn handed over meanwhile goes to the next one
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            if not future.done() or future.cancelled():
+                try:
+                    self._waiters.remove(future)
+                    self._queue_depth.dec()
+                except ValueError:
+                    pass
+        self._wait.observe(perf_counter() - start)
+        return None
+
+    def release(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            self._queue_depth.dec()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+        self._in_flight.dec()
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that limits how many requests each lane of routes handles
+    at once, so a spike in one kind of request cannot slow down the others.
+
+    Orders, exports, admin management routes and other reads each have their
+    own lane. A request over its lane's limit waits its turn in a bounded
+    queue; when the queue is full, or the wait runs out, it is turned away at
+    once with 503 and a Retry-After header, before its body is read. Admin
+    routes never share turns with public traffic, so the catalog can still be
+    managed during a flash sale.
+    """
+    def __init__(
+        self,
+        app,
+        limits: Optional[Dict[str, Tuple[int, int]]] = None,
+        max_wait: float = ADMISSION_MAX_WAIT_MS / 1000,
+        retry_after: int = ADMISSION_RETRY_AFTER_SECONDS
+    ):
+        self.app = app
+        limits = parse_limits(ADMISSION_LIMITS) if limits is None else limits
+        self.lanes = {name: Lane(name, concurrency, queue, max_wait) for name, (concurrency, queue) in limits.items()}
+        self.retry_after = retry_after
+        logger.info("Admission limits (concurrency/queue) per lane: %s", ", ".join(
+            f"{name} {concurrency}/{queue}" for name, (concurrency, queue) in limits.items()
+        ))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        lane = self._lane(scope["method"], scope["path"])
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await lane.acquire()
+        if reason is not None:
+            admission_rejected.labels(lane.name, reason).inc()
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry later"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+
+    def _lane(self, method: str, path: str) -> Optional[Lane]:
+        for name, route_method, prefix in ROUTES:
+            if (route_method is None or route_method == method) and (path == prefix or path.startswith(prefix + "/")):
+                return self.lanes[name] if name is not None else None
+        return self.lanes[DEFAULT_LANE]
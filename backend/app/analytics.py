@@ -0,0 +1,345 @@
+from typing import Callable, Dict, Iterable, List, Optional, Set
+from app.models import (
+    CategorySales, Cents, Item, ItemSales, OfferSales, Order, SalesBucket, SalesInterval, SalesTotals
+)
+from app.database import db
+from app.storage import Storage
+from datetime import datetime, timedelta
+import bisect
+import heapq
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Orders placed this long before a rebuild starts may still be on their way to
+# `record`; their IDs are remembered so they are not counted twice
+REBUILD_OVERLAP = timedelta(minutes=5)
+# Orders read from the history per page when rebuilding
+REBUILD_BATCH = 1000
+
+class _Sales:
+    """
+    Running totals for one item, category or time bucket.
+    Amounts are in cents.
+    """
+    __slots__ = ("orders", "units", "gross", "discount")
+
+    def __init__(self):
+        self.orders = 0
+        self.units = 0
+        self.gross = 0
+        self.discount = 0
+
+    def add(self, units: int, gross: int, discount: int):
+        self.units += units
+        self.gross += gross
+        self.discount += discount
+
+class _Redemptions:
+    """
+    Running totals for one offer. Amounts are in cents.
+    """
+    __slots__ = ("lines", "units", "discount")
+
+    def __init__(self):
+        self.lines = 0
+        self.units = 0
+        self.discount = 0
+
+def _local(when: datetime) -> datetime:
+    # Orders are stamped in local wall-clock time; aware times are converted to it
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+def _bucket_start(when: datetime, interval: SalesInterval) -> datetime:
+    start = _local(when).replace(minute=0, second=0, microsecond=0)
+    if interval == SalesInterval.DAY:
+        start = start.replace(hour=0)
+    return start
+
+class _Series:
+    """
+    Totals per time bucket, with bucket start times kept sorted for range reads.
+    """
+    def __init__(self, interval: SalesInterval):
+        self.interval = interval
+        self.buckets: Dict[datetime, _Sales] = {}
+        self.starts: List[datetime] = []
+
+    def bucket(self, when: datetime) -> _Sales:
+        start = _bucket_start(when, self.interval)
+        sales = self.buckets.get(start)
+        if sales is None:
+            sales = self.buckets[start] = _Sales()
+            # Orders arrive roughly in time order, so this is usually an append
+            if not self.starts or self.starts[-1] < start:
+                self.starts.append(start)
+            else:
+                bisect.insort(self.starts, start)
+        return sales
+
+class SalesAnalytics:
+    """
+    Sales aggregates kept up to date as orders are placed: units and revenue
+    per item and per category, redemptions and discounts per offer, and
+    totals per hour and per day.
+
+    Each placed order updates them through `record` in time proportional to
+    its lines, so reading them costs nothing that grows with the number of
+    orders. They are built from the order history on first use, and can be
+    rebuilt from it at any time.
+
+    Live orders are counted under the category their item had when the order
+    was placed. A rebuild only knows the items' current categories, and
+    counts lines of deleted items under no category.
+    """
+    def __init__(self, storage: Storage):
+        self._storage = storage
+        self._lock = threading.Lock()
+        self._built = False
+        # Called with orders recorded here and their items' categories; set
+        # in worker processes to pass them on to the other workers
+        self.forward: Optional[Callable[[List[Order], Dict[str, Optional[str]]], None]] = None
+        self._reset()
+
+    def _reset(self):
+        self._totals = _Sales()
+        self._items: Dict[str, _Sales] = {}
+        self._categories: Dict[Optional[str], _Sales] = {}
+        self._offers: Dict[str, _Redemptions] = {}
+        self._series = {interval: _Series(interval) for interval in SalesInterval}
+        # Recent orders counted by the last rebuild, which `record` may still be called for
+        self._rebuilt_recent: Set[str] = set()
+
+    def _ensure_built(self):
+        # Called with the lock held
+        if not self._built:
+            self._build()
+
+    def _build(self):
+        self._reset()
+        recent = datetime.now() - REBUILD_OVERLAP
+        count = 0
+        batch: List[Order] = []
+        for order in self._storage.iter_orders(batch_size=REBUILD_BATCH):
+            batch.append(order)
+            if _local(order.created_at) >= recent:
+                self._rebuilt_recent.add(order.id)
+            if len(batch) == REBUILD_BATCH:
+                count += self._add_history(batch)
+                batch = []
+        count += self._add_history(batch)
+        self._built = True
+        logger.info("Built sales analytics from %s order(s)", count)
+
+    def _add_history(self, orders: List[Order]) -> int:
+        item_ids = {line.item_id for order in orders for line in order.items}
+        items = self._storage.get_items(item_ids)
+        categories = {item_id: item.category for item_id, item in items.items()}
+        for order in orders:
+            self._add(order, categories)
+        return len(orders)
+
+    # Updates
+
+    def record(self, order: Order, items: Dict[str, Item]):
+        """
+        Count a placed order. `items` holds the order's items as they were
+        when it was priced, and gives each line's category.
+        """
+        self.record_many([order], items)
+
+    def record_many(self, orders: Iterable[Order], items: Dict[str, Item]):
+        orders = list(orders)
+        categories = {item_id: item.category for item_id, item in items.items()}
+        self.record_categorized(orders, categories)
+        if self.forward is not None:
+            self.forward(orders, categories)
+
+    def record_categorized(self, orders: Iterable[Order], categories: Dict[str, Optional[str]]):
+        """
+        Count placed orders, given the category of each of their items.
+        """
+        with self._lock:
+            if not self._built:
+                # Nothing to update yet: the first build, on the first query,
+                # reads the history, which already holds them
+                return
+            for order in orders:
+                if self._rebuilt_recent and order.id in self._rebuilt_recent:
+                    self._rebuilt_recent.discard(order.id)
+                    continue
+                self._add(order, categories)
+
+    def rebuild(self) -> SalesTotals:
+        """
+        Recompute every aggregate from the order history.
+        Returns the new totals.
+        """
+        with self._lock:
+            self._build()
+            return self._totals_model()
+
+    def _add(self, order: Order, categories: Dict[str, Optional[str]]):
+        buckets = [self._totals, *(series.bucket(order.created_at) for series in self._series.values())]
+        for sales in buckets:
+            sales.orders += 1
+
+        seen_items = set()
+        seen_categories = set()
+        for line in order.items:
+            gross = line.unit_price * line.quantity
+            discount = line.discount_amount
+            for sales in buckets:
+                sales.add(line.quantity, gross, discount)
+
+            item_sales = self._items.get(line.item_id)
+            if item_sales is None:
+                item_sales = self._items[line.item_id] = _Sales()
+            item_sales.add(line.quantity, gross, discount)
+            if line.item_id not in seen_items:
+                seen_items.add(line.item_id)
+                item_sales.orders += 1
+
+            category = categories.get(line.item_id)
+            category_sales = self._categories.get(category)
+            if category_sales is None:
+                category_sales = self._categories[category] = _Sales()
+            category_sales.add(line.quantity, gross, discount)
+            if category not in seen_categories:
+                seen_categories.add(category)
+                category_sales.orders += 1
+
+            if line.applied_offer_id is not None:
+                redemptions = self._offers.get(line.applied_offer_id)
+                if redemptions is None:
+                    redemptions = self._offers[line.applied_offer_id] = _Redemptions()
+                redemptions.lines += 1
+                redemptions.units += line.quantity
+                redemptions.discount += discount
+
+    # Queries
+
+    def _totals_model(self) -> SalesTotals:
+        sales = self._totals
+        return SalesTotals(
+            orders=sales.orders,
+            units=sales.units,
+            gross_amount=Cents(sales.gross),
+            discount_amount=Cents(sales.discount),
+            revenue=Cents(sales.gross - sales.discount)
+        )
+
+    def totals(self) -> SalesTotals:
+        """
+        Totals over every order placed.
+        """
+        with self._lock:
+            self._ensure_built()
+            return self._totals_model()
+
+    def item(self, item_id: str) -> ItemSales:
+        """
+        Sales of one item; all zero if it was never sold.
+        """
+        with self._lock:
+            self._ensure_built()
+            return _item_model(item_id, self._items.get(item_id) or _Sales())
+
+    def top_items(self, limit: int = 10, by: str = "revenue") -> List[ItemSales]:
+        """
+        The best selling items by revenue or by units, best first.
+        """
+        key = _revenue if by == "revenue" else _units
+        with self._lock:
+            self._ensure_built()
+            best = heapq.nlargest(limit, self._items.items(), key=lambda entry: key(entry[1]))
+            return [_item_model(item_id, sales) for item_id, sales in best]
+
+    def categories(self) -> List[CategorySales]:
+        """
+        Sales per category, highest revenue first.
+        """
+        with self._lock:
+            self._ensure_built()
+            ranked = sorted(self._categories.items(), key=lambda entry: -_revenue(entry[1]))
+            return [
+                CategorySales(
+                    category=category,
+                    orders=sales.orders,
+                    units=sales.units,
+                    gross_amount=Cents(sales.gross),
+                    discount_amount=Cents(sales.discount),
+                    revenue=Cents(sales.gross - sales.discount)
+                )
+                for category, sales in ranked
+            ]
+
+    def offers(self, limit: int = 100) -> List[OfferSales]:
+        """
+        Redemptions of the offers that gave the most discount, largest first.
+        """
+        with self._lock:
+            self._ensure_built()
+            ranked = heapq.nlargest(limit, self._offers.items(), key=lambda entry: entry[1].discount)
+            return [
+                OfferSales(
+                    offer_id=offer_id,
+                    redemptions=redemptions.lines,
+                    units=redemptions.units,
+                    discount_amount=Cents(redemptions.discount)
+                )
+                for offer_id, redemptions in ranked
+            ]
+
+    def series(
+        self,
+        interval: SalesInterval = SalesInterval.DAY,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[SalesBucket]:
+        """
+        Totals per hour or per day, oldest first, for the buckets containing
+        times from `start` up to but not including `end`. Buckets without
+        orders are left out.
+        """
+        with self._lock:
+            self._ensure_built()
+            series = self._series[interval]
+            first = 0 if start is None else bisect.bisect_left(series.starts, _bucket_start(start, interval))
+            last = len(series.starts) if end is None else bisect.bisect_left(series.starts, _local(end))
+            return [
+                _bucket_model(bucket_start, series.buckets[bucket_start])
+                for bucket_start in series.starts[first:last]
+            ]
+
+def _revenue(sales: _Sales) -> int:
+    return sales.gross - sales.discount
+
+def _units(sales: _Sales) -> int:
+    return sales.units
+
+def _item_model(item_id: str, sales: _Sales) -> ItemSales:
+    return ItemSales(
+        item_id=item_id,
+        orders=sales.orders,
+        units=sales.units,
+        gross_amount=Cents(sales.gross),
+        discount_amount=Cents(sales.discount),
+        revenue=Cents(sales.gross - sales.discount)
+    )
+
+def _bucket_model(start: datetime, sales: _Sales) -> SalesBucket:
+    return SalesBucket(
+        start=start,
+        orders=sales.orders,
+        units=sales.units,
+        gross_amount=Cents(sales.gross),
+        discount_amount=Cents(sales.discount),
+        revenue=Cents(sales.gross - sales.discount)
+    )
+
+# Aggregates over the application's orders
+sales_analytics = SalesAnalytics(db)
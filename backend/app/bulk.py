@@ -0,0 +1,108 @@
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Tuple, Type, TypeVar
+from app.models import BulkRecordResult, BulkStatus
+import json
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Largest batch accepted in one request
+MAX_BULK_RECORDS = 50000
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+async def read_records(request: Request) -> List[Any]:
+    """
+    Read a bulk request body: a JSON array, or one JSON value per line when
+    sent with an NDJSON content type.
+    """
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        if content_type in NDJSON_MEDIA_TYPES:
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            records = json.loads(body)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Malformed request body: {e}")
+
+    if not isinstance(records, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+    if len(records) > MAX_BULK_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_RECORDS} records per request")
+    return records
+
+def error_result(index: int, error: str, record_id: str = None) -> BulkRecordResult:
+    return BulkRecordResult(index=index, id=record_id, status=BulkStatus.ERROR, error=error)
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc']) or 'record'}: {e['msg']}" for e in error.errors())
+
+def validate_records(records: List[Any], model: Type[ModelT]) -> Tuple[List[Tuple[int, ModelT]], List[BulkRecordResult]]:
+    """
+    Validate each raw record against a model.
+    Returns the valid records with their index in the batch, and an error result for each invalid one.
+    """
+    valid = []
+    errors = []
+    for index, record in enumerate(records):
+        try:
+            valid.append((index, model.model_validate(record)))
+        except ValidationError as e:
+            errors.append(error_result(index, validation_message(e)))
+    return valid, errors
+
+def validate_ids(records: List[Any]) -> Tuple[List[Tuple[int, str]], List[BulkRecordResult]]:
+    """
+    Validate a batch of IDs for deletion, rejecting non-strings and repeats.
+    """
+    valid = []
+    errors = []
+    seen = set()
+    for index, record_id in enumerate(records):
+        if not isinstance(record_id, str):
+            errors.append(error_result(index, "ID must be a string"))
+        elif record_id in seen:
+            errors.append(error_result(index, "Duplicate ID in batch", record_id))
+        else:
+            seen.add(record_id)
+            valid.append((index, record_id))
+    return valid, errors
+
+def plan_upserts(
+    valid: List[Tuple[int, BaseModel]],
+    existing_ids: set,
+    create_model: Type[BaseModel],
+    model: Type[ModelT]
+) -> Tuple[List[Tuple[int, ModelT]], Dict[str, Tuple[int, Dict]], List[BulkRecordResult]]:
+    """
+    Split validated upsert records into new records to create and partial
+    updates keyed by ID. Records without an existing ID must carry every field
+    `create_model` requires.
+    """
+    creates = []
+    updates = {}
+    errors = []
+    seen = set()
+    for index, record in valid:
+        if record.id is not None:
+            if record.id in seen:
+                errors.append(error_result(index, "Duplicate ID in batch", record.id))
+                continue
+            seen.add(record.id)
+
+        data = record.model_dump(exclude_unset=True, exclude={"id"})
+        if record.id in existing_ids:
+            updates[record.id] = (index, data)
+            continue
+
+        try:
+            fields = create_model.model_validate(data)
+        except ValidationError as e:
+            errors.append(error_result(index, validation_message(e), record.id))
+            continue
+        new_record = model(**fields.model_dump())
+        if record.id is not None:
+            new_record.id = record.id
+        creates.append((index, new_record))
+    return creates, updates, errors
@@ -0,0 +1,120 @@
+from collections import OrderedDict
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+from app.metrics import timed
+import hashlib
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_adapters: Dict[Any, TypeAdapter] = {}
+
+@timed("serialize")
+def dump_json(value: Any, value_type: Any, fields: Optional[Set[str]] = None) -> bytes:
+    """
+    Serialize a model or list of models straight to JSON bytes.
+    For lists, `fields` limits each record to the given fields.
+    """
+    adapter = _adapters.get(value_type)
+    if adapter is None:
+        adapter = _adapters.setdefault(value_type, TypeAdapter(value_type))
+    if fields is None:
+        return adapter.dump_json(value)
+    return adapter.dump_json(value, include={"__all__": fields} if isinstance(value, list) else fields)
+
+def json_response(value: Any, value_type: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Respond with a model or list of models serialized straight to JSON.
+    Values from storage or the services are already valid, so this skips
+    FastAPI's re-validation against the response model.
+    """
+    return Response(content=dump_json(value, value_type), media_type="application/json", headers=headers)
+
+class CachedBody:
+    __slots__ = ("version", "body", "etag", "headers")
+
+    def __init__(self, version: int, body: bytes, headers: Dict[str, str]):
+        self.version = version
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.headers = headers
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized response bodies.
+    Each entry remembers the collection version it was built from and is
+    only served while the collection is still at that version.
+    """
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedBody]:
+        """
+        Get the cached body for a key if it was built at the given version.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, version: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> CachedBody:
+        """
+        Store a body built at the given version, evicting the least recently used entries.
+        """
+        entry = CachedBody(version, body, headers or {})
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+response_cache = ResponseCache(max_entries=int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "4096")))
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def cached_json(
+    request: Request,
+    key: Hashable,
+    version: int,
+    build: Callable[[], Tuple[bytes, Optional[Dict[str, str]]]]
+) -> Response:
+    """
+    Serve a JSON body from the response cache, calling `build` for the body
+    and any extra headers when the cached copy is missing or stale.
+    `version` must be read before building so a concurrent change is never
+    cached under the old version. Answers 304 when If-None-Match matches.
+    """
+    entry = response_cache.get(key, version)
+    if entry is None:
+        body, headers = build()
+        entry = response_cache.put(key, version, body, headers)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
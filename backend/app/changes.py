@@ -0,0 +1,297 @@
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from app.models import Item, Offer
+from app.database import db
+from app.storage.base import decode_cursor, encode_cursor
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Recent changes kept so reconnecting subscribers can resume where they left off
+CHANGE_FEED_HISTORY = int(os.environ.get("CHANGE_FEED_HISTORY", "10000"))
+# Shortest time between two batches sent to one subscriber; changes to the same
+# record within it are merged into one event
+CHANGE_FEED_INTERVAL_MS = float(os.environ.get("CHANGE_FEED_INTERVAL_MS", "100"))
+CHANGE_FEED_MAX_SUBSCRIBERS = int(os.environ.get("CHANGE_FEED_MAX_SUBSCRIBERS", "1000"))
+# Idle subscribers get a comment this often, so proxies keep the connection open
+CHANGE_FEED_HEARTBEAT_SECONDS = 15.0
+# Rendered batches of events kept for other subscribers reading the same changes
+RENDERED_BATCHES = 64
+# How often offers are checked for starting or ending on schedule
+OFFER_SCHEDULE_CHECK_SECONDS = 1.0
+
+class TooManySubscribers(Exception):
+    """
+    Raised when the change feed already has as many subscribers as it allows.
+    """
+
+class _Change:
+    __slots__ = ("kind", "record_id", "data", "encoded")
+
+    def __init__(self, kind: str, record_id: str, data: Dict):
+        self.kind = kind
+        self.record_id = record_id
+        self.data = data
+        # Encoded once, however many subscribers it is sent to
+        self.encoded = json.dumps(data, separators=(",", ":"))
+
+def _merge(previous: Dict, data: Dict) -> Dict:
+    if data.get("deleted") or previous.get("deleted"):
+        return data
+    return {**previous, **data}
+
+def _event(kind: str, data: str, event_id: Optional[str] = None) -> str:
+    lines = [f"event: {kind}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+class ChangeFeed:
+    """
+    Changes to items and offers, published by the services and the management
+    routers, and streamed to subscribers as Server-Sent Events.
+
+    Each change is a delta for one record: the fields that changed, with the
+    record's ID, or `deleted: true`. Changes go into a fixed-size ring with a
+    sequence number, and subscribers read the ring from their own position, so
+    publishing costs the same however many subscribers there are, and a slow
+    subscriber holds no more than its position. When a subscriber reads
+    several changes to the same record at once, they are merged into one event.
+
+    Event IDs are resume cursors; a new subscriber gets one right away in a
+    `ready` event. A subscriber that reconnects with one gets every change
+    since, merged; one that fell further behind than the ring, or whose cursor
+    comes from another process, gets a `reset` event and should fetch the
+    lists again.
+    """
+    def __init__(self, history: int = CHANGE_FEED_HISTORY):
+        self._lock = threading.Lock()
+        self._ring: List[Optional[_Change]] = [None] * history
+        # Sequence number of the last change published; changes are numbered from 1
+        self._sequence = 0
+        # Tells cursors from this process apart from those of an earlier one
+        self._epoch = uuid.uuid4().hex[:12]
+        self._subscribers = 0
+        # Rendered events by (position, head)
+        self._batches: Dict[Tuple[int, int], str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup = asyncio.Event()
+        # Called with changes published here; set in worker processes to pass
+        # them on to the other workers
+        self.forward: Optional[Callable[[str, List[Dict]], None]] = None
+
+    # Publishing
+
+    def publish(self, kind: str, changes: Iterable[Dict], forward: bool = True):
+        """
+        Publish deltas of one kind of record ("item" or "offer").
+        Each delta holds the record's `id`. Safe to call from any thread.
+        Pass `forward=False` for changes other workers see for themselves or
+        have already published.
+        """
+        changes = list(changes)
+        if forward and changes and self.forward is not None:
+            self.forward(kind, changes)
+        with self._lock:
+            published = False
+            for data in changes:
+                self._sequence += 1
+                self._ring[self._sequence % len(self._ring)] = _Change(kind, data["id"], data)
+                published = True
+            loop = self._loop if published and self._subscribers else None
+        if loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._wake()
+        else:
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        # Runs on the event loop; subscribers wait on the event that was current when they last read
+        event, self._wakeup = self._wakeup, asyncio.Event()
+        event.set()
+
+    # Subscribing
+
+    def _resume_position(self, cursor: Optional[str]) -> Optional[int]:
+        # The sequence number to read after, or None if the subscriber must reset
+        with self._lock:
+            if cursor is None:
+                return self._sequence
+            try:
+                key = decode_cursor(cursor)
+            except ValueError:
+                return None
+            if len(key) != 2 or key[0] != self._epoch or not isinstance(key[1], int):
+                return None
+            position = key[1]
+            if position > self._sequence or position < self._sequence - len(self._ring):
+                return None
+            return position
+
+    def _batch(self, position: int) -> Tuple[Optional[str], int, asyncio.Event]:
+        # The events for the changes after the position, the new position, and
+        # the event to wait on for more. Raises OverflowError if the changes
+        # are no longer in the ring.
+        with self._lock:
+            head = self._sequence
+            wakeup = self._wakeup
+            if head == position:
+                return None, head, wakeup
+            if head - position > len(self._ring):
+                raise OverflowError
+            # Subscribers woken by the same change usually read the same range
+            events = self._batches.get((position, head))
+            if events is None:
+                events = self._render(position, head)
+                if len(self._batches) >= RENDERED_BATCHES:
+                    self._batches.clear()
+                self._batches[(position, head)] = events
+            return events, head, wakeup
+
+    def _render(self, position: int, head: int) -> str:
+        latest: Dict[Tuple[str, str], _Change] = {}
+        merged: Dict[Tuple[str, str], Dict] = {}
+        for sequence in range(position + 1, head + 1):
+            change = self._ring[sequence % len(self._ring)]
+            key = (change.kind, change.record_id)
+            previous = latest.pop(key, None)
+            if previous is not None:
+                merged[key] = _merge(merged.get(key, previous.data), change.data)
+            # Reinserted, so a record's merged event comes where its last change did
+            latest[key] = change
+
+        events = []
+        last = len(latest) - 1
+        for index, (key, change) in enumerate(latest.items()):
+            data = json.dumps(merged[key], separators=(",", ":")) if key in merged else change.encoded
+            # Only the last event carries the cursor, so a reconnect never
+            # skips the rest of a partly received batch
+            event_id = encode_cursor([self._epoch, head]) if index == last else None
+            events.append(_event(change.kind, data, event_id))
+        return "".join(events)
+
+    def stream(self, cursor: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Stream changes after the cursor as Server-Sent Events, or changes from
+        now on without one. Raises TooManySubscribers when the feed is full.
+        """
+        with self._lock:
+            if self._subscribers >= CHANGE_FEED_MAX_SUBSCRIBERS:
+                raise TooManySubscribers
+            # Taken now rather than when the stream starts, so subscribers
+            # connecting at the same time cannot go over the limit
+            self._subscribers += 1
+        release = self._release_once()
+        events = self._events(cursor, release)
+        # A stream dropped before it starts never runs its cleanup; free its slot when it is collected
+        weakref.finalize(events, release)
+        return events
+
+    def _release_once(self) -> Callable[[], None]:
+        released = False
+
+        def release():
+            nonlocal released
+            with self._lock:
+                if not released:
+                    released = True
+                    self._subscribers -= 1
+        return release
+
+    async def _events(self, cursor: Optional[str], release: Callable[[], None]) -> AsyncIterator[str]:
+        with self._lock:
+            loop = asyncio.get_running_loop()
+            if self._loop is not loop:
+                self._loop = loop
+                self._wakeup = asyncio.Event()
+        try:
+            position = self._resume_position(cursor)
+            if position is None:
+                position = self._sequence
+                yield _event("reset", "{}", encode_cursor([self._epoch, position]))
+            elif cursor is None:
+                # Gives a new subscriber a cursor to resume from before any change arrives
+                yield _event("ready", "{}", encode_cursor([self._epoch, position]))
+            while True:
+                try:
+                    events, head, wakeup = self._batch(position)
+                except OverflowError:
+                    # Fell behind further than the ring reaches
+                    position = self._sequence
+                    yield _event("reset", "{}", encode_cursor([self._epoch, position]))
+                    continue
+                if events is not None:
+                    position = head
+                    yield events
+                    await asyncio.sleep(CHANGE_FEED_INTERVAL_MS / 1000)
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), CHANGE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            release()
+
+    def subscribers(self) -> int:
+        with self._lock:
+            return self._subscribers
+
+# Changes to the application's items and offers
+change_feed = ChangeFeed()
+
+def publish_items(items: Iterable[Item]):
+    """
+    Publish created or updated items in full.
+    """
+    change_feed.publish("item", [item.model_dump(mode="json") for item in items])
+
+def publish_stock(item_ids: Iterable[str]):
+    """
+    Publish the current stock of items, e.g. after orders took some.
+    """
+    items = db.get_items(item_ids)
+    change_feed.publish("item", [{"id": item.id, "stock": item.stock} for item in items.values()])
+
+def publish_offers(offers: Iterable[Offer]):
+    """
+    Publish created or updated offers in full.
+    """
+    change_feed.publish("offer", [offer.model_dump(mode="json") for offer in offers])
+
+def publish_deleted(kind: str, record_ids: Iterable[str]):
+    """
+    Publish the deletion of items or offers.
+    """
+    change_feed.publish(kind, [{"id": record_id, "deleted": True} for record_id in record_ids])
+
+async def watch_offer_schedule():
+    """
+    Publish `active` changes for offers that start or end on schedule, as
+    well as those switched on or off by hand. Runs until cancelled.
+    """
+    active = set(db.active_offers())
+    while True:
+        await asyncio.sleep(OFFER_SCHEDULE_CHECK_SECONDS)
+        try:
+            current = set(db.active_offers())
+        except Exception:
+            logger.exception("Could not check offer schedule")
+            continue
+        if current != active:
+            # Every worker process watches the schedule itself
+            change_feed.publish("offer", [
+                *({"id": offer_id, "active": True} for offer_id in current - active),
+                *({"id": offer_id, "active": False} for offer_id in active - current),
+            ], forward=False)
+            active = current
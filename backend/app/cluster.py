@@ -0,0 +1,135 @@
+from multiprocessing.connection import Connection, wait
+from typing import Dict, List, Optional
+from app.models import Item, Order
+import logging
+import multiprocessing
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Hub:
+    """
+    Runs in the process that starts the workers, and passes each message a
+    worker sends on to every other worker.
+
+    Workers keep their own search index, sales aggregates and change feed,
+    built from the shared database. What they learn as they handle requests
+    (items and offers written, stock taken, orders placed) is sent here and
+    applied by the others.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections: Dict[int, Connection] = {}
+        self._changed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def connect(self, worker: int) -> Connection:
+        """
+        A new pipe for a worker, replacing any it had before.
+        Returns the worker's end.
+        """
+        parent_end, worker_end = multiprocessing.Pipe()
+        with self._lock:
+            previous = self._connections.pop(worker, None)
+            self._connections[worker] = parent_end
+        if previous is not None:
+            previous.close()
+        return worker_end
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cluster-hub", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                workers = {connection: worker for worker, connection in self._connections.items()}
+            # Wakes up now and then to pick up workers connected since
+            for connection in wait(list(workers), timeout=0.5):
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    self._drop(workers[connection], connection)
+                    continue
+                for other, worker in workers.items():
+                    if other is connection:
+                        continue
+                    try:
+                        other.send(message)
+                    except OSError:
+                        self._drop(worker, other)
+
+    def _drop(self, worker: int, connection: Connection):
+        with self._lock:
+            if self._connections.get(worker) is connection:
+                del self._connections[worker]
+        connection.close()
+
+class _Link:
+    """
+    A worker's end of its pipe to the hub.
+    """
+    def __init__(self, connection: Connection):
+        self._connection = connection
+        # Requests are handled on several threads
+        self._lock = threading.Lock()
+
+    def send(self, message: tuple):
+        try:
+            with self._lock:
+                self._connection.send(message)
+        except OSError:
+            logger.exception("Could not send to the other workers")
+
+    def listen(self):
+        while True:
+            try:
+                message = self._connection.recv()
+            except (EOFError, OSError):
+                logger.warning("Lost the connection to the other workers")
+                return
+            try:
+                _apply(message)
+            except Exception:
+                logger.exception("Could not apply a %s message from another worker", message[0])
+
+def _apply(message: tuple):
+    # Imported here, so the hub's process never builds the application's state
+    from app.analytics import sales_analytics
+    from app.changes import change_feed
+    from app.search import search_index
+
+    if message[0] == "changes":
+        _, kind, changes = message
+        change_feed.publish(kind, changes, forward=False)
+        if kind == "item":
+            deleted = [change["id"] for change in changes if change.get("deleted")]
+            # Stock changes leave the index as it is; created and updated items come in full
+            written = [Item.model_validate(change) for change in changes if "name" in change]
+            if deleted:
+                search_index.remove_many(deleted)
+            if written:
+                search_index.add_many(written)
+    elif message[0] == "sales":
+        _, orders, categories = message
+        sales_analytics.record_categorized(orders, categories)
+
+def join(connection: Connection):
+    """
+    Connect this worker to the others through its end of a pipe from
+    `Hub.connect`, before it starts serving.
+    """
+    from app.analytics import sales_analytics
+    from app.changes import change_feed
+
+    link = _Link(connection)
+
+    def forward_changes(kind: str, changes: List[Dict]):
+        link.send(("changes", kind, changes))
+
+    def forward_sales(orders: List[Order], categories: Dict[str, Optional[str]]):
+        link.send(("sales", orders, categories))
+
+    change_feed.forward = forward_changes
+    sales_analytics.forward = forward_sales
+    threading.Thread(target=link.listen, name="cluster-listener", daemon=True).start()
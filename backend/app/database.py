@@ -1,85 +1,38 @@
-from typing import Dict, List
-from app.models import Item, Offer, Order
+from app.storage import MemoryStorage, SQLiteStorage, Storage
+from app.storage.wal import WriteAheadLog
+from app.storage import shared
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
-# In-memory database
-class Database:
-    def __init__(self):
-        self.items: Dict[str, Item] = {}
-        self.offers: Dict[str, Offer] = {}
-        self.orders: Dict[str, Order] = {}
-        self._initialize_sample_data()
+# Where data lives: "memory://" (default) or "sqlite:///path/to/inventory.db"
+DATABASE_URL = os.environ.get("INVENTORY_DATABASE_URL", "memory://")
+# For in-memory storage: directory older orders are archived to, and how many stay in memory
+ORDER_ARCHIVE_DIR = os.environ.get("ORDER_ARCHIVE_DIR")
+ORDER_HOT_WINDOW = int(os.environ.get("ORDER_HOT_WINDOW", "100000"))
+ORDER_ARCHIVE_BATCH = int(os.environ.get("ORDER_ARCHIVE_BATCH", "10000"))
+# For in-memory storage: directory of the write-ahead log and snapshots that make it durable
+MEMORY_WAL_DIR = os.environ.get("MEMORY_WAL_DIR")
+WAL_FLUSH_INTERVAL_MS = float(os.environ.get("WAL_FLUSH_INTERVAL_MS", "10"))
+WAL_SYNC_WRITES = os.environ.get("WAL_SYNC_WRITES", "false").lower() == "true"
+WAL_SNAPSHOT_EVERY = int(os.environ.get("WAL_SNAPSHOT_EVERY", "100000"))
 
-    def _initialize_sample_data(self):
-        # Sample items
-        sample_items = [
-            Item(
-                name="Laptop",
-                description="High-performance laptop",
-                price=999.99,
-                stock=15,
-                category="Electronics"
-            ),
-            Item(
-                name="Smartphone",
-                description="Latest smartphone model",
-                price=699.99,
-                stock=20,
-                category="Electronics"
-            ),
-            Item(
-                name="Headphones",
-                description="Noise-cancelling headphones",
-                price=149.99,
-                stock=30,
-                category="Electronics"
-            ),
-            Item(
-                name="Coffee Maker",
-                description="Automatic coffee maker",
-                price=79.99,
-                stock=10,
-                category="Kitchen"
-            ),
-            Item(
-                name="Blender",
-                description="High-speed blender",
-                price=49.99,
-                stock=25,
-                category="Kitchen"
-            )
-        ]
-
-        for item in sample_items:
-            self.items[item.id] = item
-            logger.info(f"Added sample item: {item.name} with ID: {item.id}")
-
-        # Sample offers
-        sample_offers = [
-            Offer(
-                name="Electronics Sale",
-                description="20% off all electronics",
-                offer_type="percentage",
-                discount_value=20.0,
-                applicable_items=[item.id for item in sample_items if item.category == "Electronics"],
-                is_active=True
-            ),
-            Offer(
-                name="Kitchen Special",
-                description="Buy one kitchen item, get $10 off",
-                offer_type="fixed",
-                discount_value=10.0,
-                min_quantity=1,
-                applicable_items=[item.id for item in sample_items if item.category == "Kitchen"],
-                is_active=True
-            )
-        ]
-
-        for offer in sample_offers:
-            self.offers[offer.id] = offer
-            logger.info(f"Added sample offer: {offer.name} with ID: {offer.id}")
+def create_storage(url: str) -> Storage:
+    """
+    Create the storage backend described by a database URL.
+    """
+    if url == "memory://":
+        if shared.current is not None:
+            raise ValueError("Worker processes need storage they can share, such as sqlite:///")
+        wal = None
+        if MEMORY_WAL_DIR is not None:
+            wal = WriteAheadLog(MEMORY_WAL_DIR, WAL_FLUSH_INTERVAL_MS / 1000, WAL_SYNC_WRITES)
+        return MemoryStorage(ORDER_ARCHIVE_DIR, ORDER_HOT_WINDOW, ORDER_ARCHIVE_BATCH, wal, WAL_SNAPSHOT_EVERY)
+    if url.startswith("sqlite:///"):
+        return SQLiteStorage(url[len("sqlite:///"):], shared.current)
+    raise ValueError(f"Unsupported database URL: {url}")
 
 # Create a singleton instance
-db = Database() 
\ No newline at end of file
+db = create_storage(DATABASE_URL)
+db.initialize()
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from typing import Any, Callable, Set, Tuple
+import asyncio
+import functools
+import hashlib
+import itertools
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyKeyReused(Exception):
+    """
+    Raised when an idempotency key is sent again with a different request.
+    """
+
+class _Entry:
+    __slots__ = ("fingerprint", "future", "expires_at")
+
+    def __init__(self, fingerprint: str, future: asyncio.Future, expires_at: float):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.expires_at = expires_at
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Hash the parts of a request that must match when its idempotency key is replayed.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+async def _call(func: Callable[[], Any]) -> Any:
+    result = func()
+    if asyncio.iscoroutine(result):
+        result = await result
+    return result
+
+class IdempotencyStore:
+    """
+    Bounded LRU store of request results keyed by idempotency key, with a TTL.
+    Only completed results are evicted to stay within the bound.
+    A request whose key is already in flight waits for the original result
+    instead of running again; the original runs to completion, and keeps its
+    key, even if the request that started it goes away. Results are kept per process.
+    """
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Work still running, held so its tasks are not garbage collected
+        self._running: Set[asyncio.Task] = set()
+
+    async def run(self, key: str, request_fingerprint: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run `func` once per key and return its result, along with whether the
+        result was replayed from an earlier request.
+        Raises IdempotencyKeyReused if the key was used for a different request.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            del self._entries[key]
+            entry = None
+
+        if entry is not None:
+            if entry.fingerprint != request_fingerprint:
+                raise IdempotencyKeyReused(key)
+            self._entries.move_to_end(key)
+            # Completed results come back at once; in-flight ones are awaited.
+            # shield() keeps a cancelled retry from cancelling the original.
+            return await asyncio.shield(entry.future), True
+
+        entry = _Entry(request_fingerprint, asyncio.get_running_loop().create_future(), now + self.ttl_seconds)
+        self._entries[key] = entry
+        self._evict()
+        # Run as a task of its own, so if this request is cancelled, e.g. because
+        # the client went away, the work still finishes and its result is kept
+        # for the retry instead of the retry doing the work again
+        task = asyncio.ensure_future(_call(func))
+        self._running.add(task)
+        task.add_done_callback(functools.partial(self._finish, key, entry))
+        return await asyncio.shield(entry.future), False
+
+    def _finish(self, key: str, entry: _Entry, task: asyncio.Task):
+        self._running.discard(task)
+        if task.cancelled():
+            self._forget(key, entry)
+            entry.future.cancel()
+            return
+        error = task.exception()
+        if error is not None:
+            # Failures are not cached; waiting retries see the error and the key can be used again
+            self._forget(key, entry)
+            entry.future.set_exception(error)
+            # Nobody may be waiting; mark the exception as retrieved
+            entry.future.exception()
+            return
+        entry.future.set_result(task.result())
+
+    def _forget(self, key: str, entry: _Entry):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def _evict(self):
+        # Least recently used first. Requests still in flight keep their keys,
+        # so a retry waits for them instead of running again; the store can
+        # hold more than `max_entries` while that many are running
+        excess = len(self._entries) - self.max_entries
+        if excess <= 0:
+            return
+        done = (key for key, entry in self._entries.items() if entry.future.done())
+        for key in list(itertools.islice(done, excess)):
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+idempotency_store = IdempotencyStore(
+    max_entries=int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "10000")),
+    ttl_seconds=float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+)
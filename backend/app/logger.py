@@ -1,25 +1,108 @@
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import json
 import logging
+import os
+import queue
+import random
 import sys
 
-def setup_logger():
-    # Configure logging
+# Log level, output format ("json" or "text") and the share of DEBUG lines kept
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+# Records waiting to be written; more than this and new records are dropped
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional["_NonBlockingQueueHandler"] = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line, including any `extra` fields.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DebugSampler(logging.Filter):
+    """
+    Keep only a share of DEBUG records; other levels always pass.
+    """
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the listener thread without formatting them or waiting.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener runs in this process, so the record can go as it is;
+        # the message is only built if a handler writes it
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging
+            self.dropped += 1
+
+def dropped_records() -> int:
+    """
+    Count the records dropped because the log queue was full.
+    """
+    return _handler.dropped if _handler is not None else 0
+
+def setup_logger() -> logging.Logger:
+    """
+    Route the root logger through a queue to a background thread that writes
+    to stdout. Safe to call more than once; the pipeline is installed once.
+    """
+    global _listener, _handler
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    
-    # Create handlers
+    if _listener is not None:
+        return logger
+    logger.setLevel(LOG_LEVEL)
+
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    
-    # Create formatters
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Add formatters to handlers
-    console_handler.setFormatter(formatter)
-    
-    # Add handlers to logger
-    logger.addHandler(console_handler)
-    
-    return logger 
\ No newline at end of file
+    if LOG_FORMAT == "json":
+        console_handler.setFormatter(JsonFormatter())
+    else:
+        console_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    _handler = _NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+    logger.addHandler(_handler)
+
+    _listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    # Write out whatever is still queued when the process exits
+    atexit.register(_listener.stop)
+    return logger
@@ -0,0 +1,285 @@
+from array import array
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+from app.logger import dropped_records
+import functools
+import threading
+import weakref
+
+# Latency bucket bounds in seconds: 50us to about 9s, each sqrt(2) times the last
+LATENCY_BUCKETS = tuple(0.00005 * 2 ** (i / 2) for i in range(36))
+QUANTILES = (0.5, 0.95, 0.99)
+
+class _Shard:
+    """
+    Holds one thread's values for a metric. Only the thread's local storage
+    refers to it, so it is collected when the thread exits.
+    """
+    __slots__ = ("values", "__weakref__")
+
+    def __init__(self, values: array):
+        self.values = values
+
+class _Sharded:
+    """
+    A metric whose values are kept in one array per thread.
+    Recording only touches the calling thread's array, so it takes no lock
+    and allocates nothing once the thread has recorded once. Reads sum the shards.
+    When a thread exits, its array is folded into retained totals, so threads
+    that come and go, like those of a thread pool, do not pile up shards.
+    """
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        # Arrays of live threads by id(), and what exited threads recorded
+        self._shards: Dict[int, array] = {}
+        self._retired = [0.0] * size
+        self._lock = threading.Lock()
+
+    def _shard(self) -> array:
+        try:
+            return self._local.shard.values
+        except AttributeError:
+            values = array("d", bytes(8 * self._size))
+            shard = self._local.shard = _Shard(values)
+            with self._lock:
+                self._shards[id(values)] = values
+            weakref.finalize(shard, self._retire, values)
+            return values
+
+    def _retire(self, values: array):
+        # Called once the thread that owned `values` has exited
+        with self._lock:
+            del self._shards[id(values)]
+            for index, value in enumerate(values):
+                self._retired[index] += value
+
+    def _totals(self) -> List[float]:
+        # Summed with the lock held, so a shard being retired is counted exactly once
+        with self._lock:
+            totals = list(self._retired)
+            for shard in self._shards.values():
+                for index, value in enumerate(shard):
+                    totals[index] += value
+        return totals
+
+class Counter(_Sharded):
+    """
+    A monotonically increasing count.
+    """
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1):
+        self._shard()[0] += amount
+
+    def value(self) -> float:
+        return self._totals()[0]
+
+class Gauge(_Sharded):
+    """
+    A value that goes up and down, such as the number of requests waiting.
+    """
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1):
+        self._shard()[0] += amount
+
+    def dec(self, amount: float = 1):
+        self._shard()[0] -= amount
+
+    def value(self) -> float:
+        return self._totals()[0]
+
+class Histogram(_Sharded):
+    """
+    Counts of observations per bucket, plus their sum.
+    The last two slots of each shard are the +Inf bucket and the sum.
+    """
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(len(bounds) + 2)
+        self.bounds = tuple(bounds)
+        self._sum_index = len(bounds) + 1
+
+    def observe(self, value: float):
+        shard = self._shard()
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[self._sum_index] += value
+
+    def snapshot(self) -> Tuple[List[float], float]:
+        """
+        Return the count in each bucket, including +Inf, and the sum.
+        """
+        totals = self._totals()
+        return totals[:-1], totals[-1]
+
+    def quantile(self, q: float, counts: List[float]) -> float:
+        """
+        Estimate a quantile from bucket counts, interpolating within the bucket it falls in.
+        """
+        total = sum(counts)
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0.0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                return lower + (self.bounds[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+class Family:
+    """
+    A named metric with one child per combination of label values.
+    """
+    def __init__(self, name: str, help: str, factory: Callable[[], _Sharded], labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.kind = {Counter: "counter", Gauge: "gauge"}.get(factory, "histogram")
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], _Sharded] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values: str) -> _Sharded:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._factory()
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], _Sharded]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+_registry: List[Family] = []
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], *extra: Tuple[str, str]) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+def _number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+def render() -> str:
+    """
+    Render every metric in the Prometheus text exposition format.
+    Histograms also get a gauge of estimated quantiles, named with a `_quantile` suffix.
+    """
+    lines = []
+    for family in _registry:
+        children = family.children()
+        if family.kind != "histogram":
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for values, metric in children:
+                lines.append(f"{family.name}{_labels(family.labelnames, values)} {_number(metric.value())}")
+            continue
+
+        snapshots = [(values, histogram, *histogram.snapshot()) for values, histogram in children]
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} histogram")
+        for values, histogram, counts, total in snapshots:
+            cumulative = 0.0
+            for bound, count in zip((*histogram.bounds, "+Inf"), counts):
+                cumulative += count
+                le = bound if isinstance(bound, str) else f"{bound:.6g}"
+                lines.append(f"{family.name}_bucket{_labels(family.labelnames, values, ('le', le))} {_number(cumulative)}")
+            lines.append(f"{family.name}_sum{_labels(family.labelnames, values)} {_number(total)}")
+            lines.append(f"{family.name}_count{_labels(family.labelnames, values)} {_number(cumulative)}")
+        quantile_name = f"{family.name}_quantile"
+        lines.append(f"# HELP {quantile_name} Estimated quantiles of {family.name}")
+        lines.append(f"# TYPE {quantile_name} gauge")
+        for values, histogram, counts, total in snapshots:
+            for q in QUANTILES:
+                estimate = histogram.quantile(q, counts)
+                lines.append(f"{quantile_name}{_labels(family.labelnames, values, ('quantile', q))} {_number(estimate)}")
+
+    lines.append("# HELP log_records_dropped_total Log records dropped because the log queue was full")
+    lines.append("# TYPE log_records_dropped_total counter")
+    lines.append(f"log_records_dropped_total {dropped_records()}")
+    return "\n".join(lines) + "\n"
+
+request_duration = Family(
+    "http_request_duration_seconds", "Time to handle a request, by route", Histogram, ("method", "route")
+)
+span_duration = Family(
+    "span_duration_seconds", "Time spent in instrumented parts of request handling", Histogram, ("span",)
+)
+orders_placed = Family("orders_placed_total", "Orders placed", Counter).labels()
+orders_rejected = Family("orders_rejected_total", "Orders rejected", Counter).labels()
+stock_out_errors = Family("stock_out_errors_total", "Order lines rejected for lack of stock", Counter).labels()
+discount_cents = Family("order_discount_cents_total", "Discounts given on placed orders, in cents", Counter).labels()
+admission_in_flight = Family("admission_in_flight", "Requests being handled, by admission lane", Gauge, ("lane",))
+admission_queue_depth = Family("admission_queue_depth", "Requests waiting for their turn, by admission lane", Gauge, ("lane",))
+admission_rejected = Family(
+    "admission_rejected_total", "Requests turned away with 503, by admission lane and reason", Counter, ("lane", "reason")
+)
+admission_wait = Family("admission_wait_seconds", "Time admitted requests waited for their turn, by admission lane", Histogram, ("lane",))
+
+def timed(span: str):
+    """
+    Decorator recording how long each call takes in the `span_duration_seconds` histogram.
+    """
+    histogram = span_duration.labels(span)
+
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start)
+        return wrapper
+    return decorate
+
+class TimingMiddleware:
+    """
+    ASGI middleware recording each HTTP request's duration, until its response
+    is fully sent, under its method and route template (not the raw path, so
+    IDs do not create new series). Requests that match no route are recorded
+    under the route "unmatched".
+    """
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Callable, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = perf_counter() - start
+            request_duration.labels(scope["method"], self._route(scope)).observe(elapsed)
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            # The router records the matched endpoint, not its path template
+            for candidate in scope["app"].routes:
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = self._routes[endpoint] = candidate.path
+                    break
+            else:
+                route = "unmatched"
+        return route
@@ -1,19 +1,91 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, PlainSerializer, PlainValidator, WithJsonSchema, model_validator
+from typing import Annotated, Any, List, Optional, Dict, Type, TypeVar
 from enum import Enum
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 import uuid
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+class Cents(int):
+    """
+    An amount of money in integer cents.
+    Arithmetic on cents gives plain ints; wrap results in Cents before
+    putting them in a model, or they are read as dollars.
+    """
+    __slots__ = ()
+
+_CENT = Decimal("0.01")
+
+def to_cents(value: Any) -> Cents:
+    """
+    Convert an amount in dollars to cents, rounding half up to the nearest cent.
+    Values that are already Cents are returned unchanged.
+    """
+    if isinstance(value, Cents):
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float, str, Decimal)):
+        raise ValueError("Amount must be a number")
+    try:
+        # str() gives the shortest decimal form of a float, so 0.1 becomes exactly 0.10
+        amount = Decimal(str(value)).quantize(_CENT, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {value!r}")
+    return Cents(amount * 100)
+
+def to_dollars(cents: int) -> float:
+    """
+    Render cents as a dollar amount. The nearest float to a two-decimal value
+    always prints as that value, so JSON output stays an exact decimal.
+    """
+    return cents / 100
+
+# Money is held as integer cents and sent as a JSON number in dollars
+Money = Annotated[
+    Cents,
+    PlainValidator(to_cents),
+    PlainSerializer(to_dollars, return_type=float, when_used="json"),
+    WithJsonSchema({"type": "number"})
+]
+
+# An offer's discount value as sent by clients: a finite number, never negative
+DiscountValue = Annotated[float, Field(ge=0, allow_inf_nan=False)]
+
+_object_setattr = object.__setattr__
+
+def construct_model(model: Type[ModelT], values: Dict[str, Any]) -> ModelT:
+    """
+    Build a model from values that are already valid, e.g. read back from storage.
+    Like model_construct, but `values` must hold every field, so no defaults
+    are looked up; it takes ownership of the dict.
+    """
+    instance = model.__new__(model)
+    _object_setattr(instance, "__dict__", values)
+    _object_setattr(instance, "__pydantic_fields_set__", set(values))
+    _object_setattr(instance, "__pydantic_extra__", None)
+    _object_setattr(instance, "__pydantic_private__", None)
+    return instance
+
 class OfferType(str, Enum):
     PERCENTAGE = "percentage"
     FIXED = "fixed"
     BUY_X_GET_Y = "buy_x_get_y"
 
+def check_free_units(offer_type: OfferType, discount_value: float):
+    """
+    Check that a buy X get Y offer gives away a whole number of units.
+    Raises ValueError if not.
+    """
+    if offer_type == OfferType.BUY_X_GET_Y and not float(discount_value).is_integer():
+        raise ValueError("discount_value must be a whole number of free units for buy_x_get_y offers")
+
 class Item(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     description: str
-    price: float
+    price: Money
     stock: int
     category: str
 
@@ -22,7 +94,7 @@ class Offer(BaseModel):
     name: str
     description: str
     offer_type: OfferType
-    discount_value: float
+    discount_value: float  # Percent, dollars or free units, depending on offer_type
     min_quantity: Optional[int] = None
     applicable_items: List[str]  # List of item IDs
     start_date: Optional[datetime] = None
@@ -32,29 +104,100 @@ class Offer(BaseModel):
 class OrderItem(BaseModel):
     item_id: str
     quantity: int
-    unit_price: float
+    unit_price: Money
     applied_offer_id: Optional[str] = None
-    discount_amount: float = 0
+    discount_amount: Money = Cents(0)
 
 class Order(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     items: List[OrderItem]
-    total_amount: float
-    discount_amount: float = 0
-    final_amount: float
+    total_amount: Money
+    discount_amount: Money = Cents(0)
+    final_amount: Money
     created_at: datetime = Field(default_factory=datetime.now)
 
+# Summaries are the fields of a record shown in list views (`summary=true`)
+
+class ItemSummary(BaseModel):
+    id: str
+    name: str
+    price: Money
+    stock: int
+    category: str
+
+class OfferSummary(BaseModel):
+    id: str
+    name: str
+    offer_type: OfferType
+    discount_value: float
+    min_quantity: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    is_active: bool = True
+
+class OrderSummary(BaseModel):
+    id: str
+    total_amount: Money
+    discount_amount: Money = Cents(0)
+    final_amount: Money
+    created_at: datetime
+
+class SearchSuggestions(BaseModel):
+    terms: List[str]
+    items: List[ItemSummary]
+
+class SalesInterval(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class SalesTotals(BaseModel):
+    orders: int
+    units: int
+    gross_amount: Money
+    discount_amount: Money
+    revenue: Money
+
+class ItemSales(BaseModel):
+    item_id: str
+    orders: int
+    units: int
+    gross_amount: Money
+    discount_amount: Money
+    revenue: Money
+
+class CategorySales(BaseModel):
+    category: Optional[str] = None  # None for items deleted before a rebuild
+    orders: int
+    units: int
+    gross_amount: Money
+    discount_amount: Money
+    revenue: Money
+
+class OfferSales(BaseModel):
+    offer_id: str
+    redemptions: int  # Order lines the offer was applied to
+    units: int
+    discount_amount: Money
+
+class SalesBucket(BaseModel):
+    start: datetime
+    orders: int
+    units: int
+    gross_amount: Money
+    discount_amount: Money
+    revenue: Money
+
 class ItemCreate(BaseModel):
     name: str
     description: str
-    price: float
+    price: Money
     stock: int
     category: str
 
 class ItemUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
-    price: Optional[float] = None
+    price: Optional[Money] = None
     stock: Optional[int] = None
     category: Optional[str] = None
 
@@ -62,20 +205,48 @@ class OfferCreate(BaseModel):
     name: str
     description: str
     offer_type: OfferType
-    discount_value: float
+    discount_value: DiscountValue
     min_quantity: Optional[int] = None
     applicable_items: List[str]
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     is_active: bool = True
 
+    @model_validator(mode="after")
+    def check_free_units(self):
+        check_free_units(self.offer_type, self.discount_value)
+        return self
+
 class OfferUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     offer_type: Optional[OfferType] = None
-    discount_value: Optional[float] = None
+    discount_value: Optional[DiscountValue] = None
     min_quantity: Optional[int] = None
     applicable_items: Optional[List[str]] = None
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
-    is_active: Optional[bool] = None 
\ No newline at end of file
+    is_active: Optional[bool] = None
+
+class ItemUpsert(ItemUpdate):
+    id: Optional[str] = None
+
+class OfferUpsert(OfferUpdate):
+    id: Optional[str] = None
+
+class BulkStatus(str, Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    ERROR = "error"
+
+class BulkRecordResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    status: BulkStatus
+    error: Optional[str] = None
+
+class BatchOrderResult(BaseModel):
+    index: int
+    order: Optional[Order] = None
+    errors: List[str] = []
@@ -0,0 +1,36 @@
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from typing import Dict, List, Optional, Set, Tuple, Type
+from app.cache import dump_json
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel], summary: Optional[Type[BaseModel]] = None) -> Optional[Set[str]]:
+    """
+    Parse a comma-separated `fields=` projection, rejecting unknown field names.
+    Without one, records are limited to the fields of the `summary` model if given.
+    """
+    if not fields:
+        return set(summary.model_fields) if summary is not None else None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = sorted(selected - set(model.model_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+    return selected
+
+def page_response(records: List[BaseModel], next_cursor: Optional[str], fields: Optional[Set[str]], model: Type[BaseModel]) -> Response:
+    """
+    Build the response for a page of records, serialized straight to JSON.
+    The records are already valid, so FastAPI's re-validation against the
+    response model is skipped. The next page's cursor goes in the
+    X-Next-Cursor header so the body stays a plain list.
+    """
+    body, headers = page_body(records, next_cursor, fields, model)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def page_body(records: List[BaseModel], next_cursor: Optional[str], fields: Optional[Set[str]], model: Type[BaseModel]) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize a page of records to JSON bytes along with its headers, for the response cache.
+    """
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor is not None else {}
+    return dump_json(records, List[model], fields), headers
@@ -0,0 +1,267 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from app.models import Offer, OfferType, OrderItem, to_cents
+from app.storage import Storage
+from decimal import Decimal, ROUND_HALF_UP
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Above this many competing buy X get Y pools in one cart, pick them greedily
+_EXACT_SEARCH_LIMIT = 16
+
+# (offer ID, discount in cents) for one order line; the offer ID is None when nothing applies
+LineDiscount = Tuple[Optional[str], int]
+
+# Rounding policy: all amounts are integer cents. Fixed discounts are converted
+# to cents and percentages to basis points when offers are compiled, rounding
+# half up. A percentage discount is rounded half up to the cent once per line.
+_BASIS_POINTS = 10000
+
+def basis_points(percent: float) -> int:
+    """
+    Convert a percentage to whole basis points (hundredths of a percent), rounding half up.
+    """
+    return int(Decimal(str(percent)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def percent_of(cents: int, points: int) -> int:
+    """
+    Take a percentage given in basis points of an amount in cents, rounding half up to the cent.
+    """
+    return (cents * points + _BASIS_POINTS // 2) // _BASIS_POINTS
+
+class BuyXGetY:
+    """
+    A buy X get Y rule: for every `paid + free` units bought from the offer's
+    items within one category, the cheapest `free` units are free.
+    An offer listing a single item gives the classic "buy 2 get 1 free" on that item.
+    """
+    __slots__ = ("offer_id", "paid", "free", "start", "end")
+
+    def __init__(self, offer_id: str, paid: int, free: int, start: float, end: float):
+        self.offer_id = offer_id
+        self.paid = paid
+        self.free = free
+        self.start = start
+        self.end = end
+
+class CompiledOffers:
+    """
+    Rule tables built from active offers, keyed by item ID.
+    Percentage and fixed rules are sorted by discount value, highest first,
+    so the first live rule for a line is the best one of its type.
+    """
+    __slots__ = ("percentage", "fixed", "buy_x_get_y", "offer_count", "columns")
+
+    def __init__(self):
+        # item ID -> [(basis points, start, end, offer ID)]
+        self.percentage: Dict[str, List[Tuple[int, float, float, str]]] = {}
+        # item ID -> [(cents, min quantity, start, end, offer ID)]
+        self.fixed: Dict[str, List[Tuple[int, int, float, float, str]]] = {}
+        # item ID -> rules listing that item
+        self.buy_x_get_y: Dict[str, List[BuyXGetY]] = {}
+        self.offer_count = 0
+        # Array form of the tables, built on first use by the columnar path
+        self.columns = None
+
+def compile_offers(offers: Iterable[Offer]) -> CompiledOffers:
+    """
+    Compile offers into rule tables. Inactive offers are skipped; validity
+    periods are kept with each rule and checked when a cart is priced.
+    For buy X get Y offers, `min_quantity` is X (default 1) and `discount_value` is Y.
+    """
+    compiled = CompiledOffers()
+    for offer in offers:
+        if not offer.is_active:
+            continue
+        start = offer.start_date.timestamp() if offer.start_date is not None else -math.inf
+        end = offer.end_date.timestamp() if offer.end_date is not None else math.inf
+        item_ids = dict.fromkeys(offer.applicable_items)
+
+        try:
+            if offer.offer_type == OfferType.PERCENTAGE:
+                table = compiled.percentage
+                rule = (basis_points(offer.discount_value), start, end, offer.id)
+            elif offer.offer_type == OfferType.FIXED:
+                table = compiled.fixed
+                rule = (to_cents(offer.discount_value), offer.min_quantity or 0, start, end, offer.id)
+            else:
+                # Infinite, NaN or fractional values are not a count of units
+                if not float(offer.discount_value).is_integer() or offer.discount_value < 1:
+                    logger.warning("Skipping buy X get Y offer %s with no valid number of free units", offer.id)
+                    continue
+                table = compiled.buy_x_get_y
+                rule = BuyXGetY(offer.id, max(offer.min_quantity or 1, 1), int(offer.discount_value), start, end)
+        except (ArithmeticError, ValueError):
+            # One bad offer must not take pricing down for every cart
+            logger.warning("Skipping offer %s with invalid discount value %r", offer.id, offer.discount_value)
+            continue
+        for item_id in item_ids:
+            table.setdefault(item_id, []).append(rule)
+        compiled.offer_count += 1
+
+    for rules in compiled.percentage.values():
+        rules.sort(key=lambda rule: rule[0], reverse=True)
+    for rules in compiled.fixed.values():
+        rules.sort(key=lambda rule: rule[0], reverse=True)
+    return compiled
+
+def price_lines(
+    rules: CompiledOffers,
+    lines: Sequence[OrderItem],
+    categories: Sequence[str],
+    now: Optional[float] = None
+) -> List[LineDiscount]:
+    """
+    Work out the discount for each order line.
+    Every line gets at most one offer. Percentage and fixed offers apply per
+    line; buy X get Y offers apply to all of a cart's lines for their items
+    in one category, and are used where they beat the per-line offers of
+    the lines they cover.
+    `categories` holds the category of each line's item.
+    """
+    if now is None:
+        now = time.time()
+    percentage = rules.percentage
+    fixed = rules.fixed
+
+    discounts: List[LineDiscount] = []
+    for line in lines:
+        item_id = line.item_id
+        best_offer_id = None
+        best = 0
+        line_total = line.unit_price * line.quantity
+        for points, start, end, offer_id in percentage.get(item_id, ()):
+            if start <= now <= end:
+                discount = percent_of(line_total, points)
+                if discount > best:
+                    best_offer_id, best = offer_id, discount
+                break
+        for amount, min_quantity, start, end, offer_id in fixed.get(item_id, ()):
+            if start <= now <= end and line.quantity >= min_quantity:
+                # Limit fixed discount to item total
+                discount = min(amount, line_total)
+                if discount > best:
+                    best_offer_id, best = offer_id, discount
+                break
+        discounts.append((best_offer_id, best))
+
+    apply_buy_x_get_y(rules, lines, categories, discounts, now)
+    return discounts
+
+def _free_units(lines: Sequence[OrderItem], indices: List[int], remaining: int) -> Dict[int, int]:
+    allocation = {}
+    # The cheapest units go free first
+    for index in sorted(indices, key=lambda index: lines[index].unit_price):
+        if remaining <= 0:
+            break
+        line = lines[index]
+        count = min(remaining, line.quantity)
+        allocation[index] = line.unit_price * count
+        remaining -= count
+    return allocation
+
+def apply_buy_x_get_y(
+    rules: CompiledOffers,
+    lines: Sequence[OrderItem],
+    categories: Sequence[str],
+    discounts: List[LineDiscount],
+    now: float
+):
+    """
+    Replace per-line discounts with live buy X get Y offers where they save more.
+    """
+    buy_x_get_y = rules.buy_x_get_y
+    if not buy_x_get_y:
+        return
+    pools: Dict[Tuple[BuyXGetY, str], List[int]] = {}
+    units: Dict[Tuple[BuyXGetY, str], int] = {}
+    for index, line in enumerate(lines):
+        for rule in buy_x_get_y.get(line.item_id, ()):
+            if rule.start <= now <= rule.end:
+                key = (rule, categories[index])
+                pools.setdefault(key, []).append(index)
+                units[key] = units.get(key, 0) + line.quantity
+
+    candidates = []
+    for key, indices in pools.items():
+        rule = key[0]
+        free = units[key] // (rule.paid + rule.free) * rule.free
+        if free <= 0:
+            continue
+        allocation = _free_units(lines, indices, free)
+        # A pool takes over all of its lines, including the ones paid for
+        gain = sum(allocation.values()) - sum(discounts[index][1] for index in indices)
+        if gain > 0:
+            candidates.append((gain, frozenset(indices), rule.offer_id, allocation))
+
+    for _, indices, offer_id, allocation in _best_disjoint(candidates):
+        for index in indices:
+            discounts[index] = (offer_id, allocation.get(index, 0))
+
+def _best_disjoint(candidates: List[Tuple[int, FrozenSet[int], str, Dict[int, int]]]) -> List[tuple]:
+    """
+    Pick pools that share no lines with the largest total gain.
+    """
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    if len(candidates) > _EXACT_SEARCH_LIMIT:
+        chosen, used = [], set()
+        for candidate in candidates:
+            if used.isdisjoint(candidate[1]):
+                chosen.append(candidate)
+                used |= candidate[1]
+        return chosen
+
+    # Branch and bound; gains left to pick bound what a branch can still reach
+    remaining = [0] * (len(candidates) + 1)
+    for position in range(len(candidates) - 1, -1, -1):
+        remaining[position] = remaining[position + 1] + candidates[position][0]
+    best_total = 0
+    best_chosen: List[tuple] = []
+    chosen: List[tuple] = []
+
+    def search(position: int, used: FrozenSet[int], total: int):
+        nonlocal best_total, best_chosen
+        if total > best_total:
+            best_total, best_chosen = total, list(chosen)
+        if position == len(candidates) or total + remaining[position] <= best_total:
+            return
+        candidate = candidates[position]
+        if used.isdisjoint(candidate[1]):
+            chosen.append(candidate)
+            search(position + 1, used | candidate[1], total + candidate[0])
+            chosen.pop()
+        search(position + 1, used, total)
+
+    search(0, frozenset(), 0)
+    return best_chosen
+
+class PricingEngine:
+    """
+    Keeps the storage's offers compiled into rule tables, recompiling them
+    only when the offers version changes.
+    """
+    def __init__(self, storage: Storage):
+        self._storage = storage
+        self._compiled: Tuple[Optional[int], Optional[CompiledOffers]] = (None, None)
+        self._lock = threading.Lock()
+
+    def rules(self) -> CompiledOffers:
+        """
+        Get the rule tables for the current offers.
+        """
+        # Read the version first so a concurrent change forces another compile
+        version = self._storage.version("offers")
+        compiled_version, compiled = self._compiled
+        if compiled_version == version:
+            return compiled
+        with self._lock:
+            compiled_version, compiled = self._compiled
+            if compiled_version == version:
+                return compiled
+            compiled = compile_offers(self._storage.list_offers())
+            self._compiled = (version, compiled)
+        logger.info("Compiled %s offer(s) into pricing rules", compiled.offer_count)
+        return compiled
@@ -0,0 +1,136 @@
+# Columnar pricing for large carts, using NumPy.
+# Importing this module raises ImportError when NumPy is not installed.
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.models import OrderItem
+from app.pricing import CompiledOffers, LineDiscount, apply_buy_x_get_y, price_lines
+import numpy as np
+import time
+
+# Largest value the int64 arithmetic below may produce
+_INT64_MAX = np.iinfo(np.int64).max
+
+class _RuleColumns:
+    """
+    The rules of one offer type as flat arrays, grouped by item index in
+    priority order. `offsets` and `counts` locate each item's rules.
+    """
+    __slots__ = ("offsets", "counts", "values", "min_quantities", "starts", "ends", "offer_ids")
+
+    def __init__(self, item_ids: List[str], rules: List[Tuple[int, int, float, float, str]], item_rules: Dict[str, List[int]]):
+        # One extra slot with no rules for items that no offer lists
+        counts = np.zeros(len(item_ids) + 1, dtype=np.int64)
+        order = []
+        for index, item_id in enumerate(item_ids):
+            positions = item_rules.get(item_id, ())
+            counts[index] = len(positions)
+            order.extend(positions)
+        self.counts = counts
+        self.offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self.values = np.array([rules[position][0] for position in order], dtype=np.int64)
+        self.min_quantities = np.array([rules[position][1] for position in order], dtype=np.int64)
+        self.starts = np.array([rules[position][2] for position in order], dtype=np.float64)
+        self.ends = np.array([rules[position][3] for position in order], dtype=np.float64)
+        self.offer_ids = np.array([rules[position][4] for position in order], dtype=object)
+
+    def first_live(self, item_indexes: np.ndarray, quantities: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the first live rule each line qualifies for.
+        Returns the indexes of the lines that have one and the positions of their rules.
+        """
+        counts = self.counts[item_indexes]
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        # Expand to one row per (line, candidate rule), in each line's priority order
+        lines = np.repeat(np.arange(len(item_indexes)), counts)
+        first_rows = np.cumsum(counts) - counts
+        positions = np.arange(total) + np.repeat(self.offsets[item_indexes] - first_rows, counts)
+        live = (
+            (self.starts[positions] <= now)
+            & (self.ends[positions] >= now)
+            & (self.min_quantities[positions] <= quantities[lines])
+        )
+        lines = lines[live]
+        positions = positions[live]
+        if len(lines) == 0:
+            return lines, positions
+        first = np.empty(len(lines), dtype=bool)
+        first[0] = True
+        np.not_equal(lines[1:], lines[:-1], out=first[1:])
+        return lines[first], positions[first]
+
+class _ColumnarOffers:
+    __slots__ = ("item_index", "unknown", "percentage", "fixed", "max_basis_points")
+
+    def __init__(self, rules: CompiledOffers):
+        item_ids = list(dict.fromkeys(list(rules.percentage) + list(rules.fixed)))
+        self.item_index = {item_id: index for index, item_id in enumerate(item_ids)}
+        self.unknown = len(item_ids)
+        self.percentage = _pack(item_ids, {
+            item_id: [(value, 0, start, end, offer_id) for value, start, end, offer_id in item_rules]
+            for item_id, item_rules in rules.percentage.items()
+        })
+        self.fixed = _pack(item_ids, rules.fixed)
+        self.max_basis_points = int(self.percentage.values.max(initial=0))
+
+def _pack(item_ids: List[str], table: Dict[str, List[Tuple[int, int, float, float, str]]]) -> _RuleColumns:
+    rules = []
+    item_rules = {}
+    for item_id, entries in table.items():
+        item_rules[item_id] = list(range(len(rules), len(rules) + len(entries)))
+        rules.extend(entries)
+    return _RuleColumns(item_ids, rules, item_rules)
+
+def _columns(rules: CompiledOffers) -> _ColumnarOffers:
+    columns = rules.columns
+    if columns is None:
+        # Built once per compiled rule set; a concurrent build just does the work twice
+        columns = rules.columns = _ColumnarOffers(rules)
+    return columns
+
+def price_lines_columnar(
+    rules: CompiledOffers,
+    lines: Sequence[OrderItem],
+    categories: Sequence[str],
+    now: Optional[float] = None
+) -> List[LineDiscount]:
+    """
+    Columnar version of pricing.price_lines, giving identical results.
+    The cart is packed into item index, quantity and unit price arrays and the
+    best percentage and fixed discount per line is found with array operations.
+    Carts whose amounts could overflow 64-bit integers go to the scalar path.
+    """
+    if now is None:
+        now = time.time()
+    columns = _columns(rules)
+    count = len(lines)
+    item_index = columns.item_index
+    unknown = columns.unknown
+    item_indexes = np.fromiter((item_index.get(line.item_id, unknown) for line in lines), dtype=np.int64, count=count)
+    quantities = np.fromiter((line.quantity for line in lines), dtype=np.int64, count=count)
+    prices = np.fromiter((line.unit_price for line in lines), dtype=np.int64, count=count)
+    if count == 0 or int(prices.max()) * int(quantities.max()) * max(columns.max_basis_points, 1) >= _INT64_MAX // 2:
+        return price_lines(rules, lines, categories, now)
+    line_totals = prices * quantities
+
+    best = np.zeros(count, dtype=np.int64)
+    offer_ids = np.full(count, None, dtype=object)
+
+    # Same integer rounding as pricing.percent_of
+    pct_lines, pct_positions = columns.percentage.first_live(item_indexes, quantities, now)
+    pct_discounts = (line_totals[pct_lines] * columns.percentage.values[pct_positions] + 5000) // 10000
+    better = pct_discounts > best[pct_lines]
+    best[pct_lines[better]] = pct_discounts[better]
+    offer_ids[pct_lines[better]] = columns.percentage.offer_ids[pct_positions[better]]
+
+    # Limit fixed discount to item total
+    fixed_lines, fixed_positions = columns.fixed.first_live(item_indexes, quantities, now)
+    fixed_discounts = np.minimum(columns.fixed.values[fixed_positions], line_totals[fixed_lines])
+    better = fixed_discounts > best[fixed_lines]
+    best[fixed_lines[better]] = fixed_discounts[better]
+    offer_ids[fixed_lines[better]] = columns.fixed.offer_ids[fixed_positions[better]]
+
+    discounts = list(zip(offer_ids.tolist(), best.tolist()))
+    apply_buy_x_get_y(rules, lines, categories, discounts, now)
+    return discounts
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Query
+from typing import List, Optional
+from app.analytics import sales_analytics
+from app.models import CategorySales, ItemSales, OfferSales, SalesBucket, SalesInterval, SalesTotals
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+)
+
+@router.get("/sales", response_model=SalesTotals)
+async def get_sales_totals():
+    """
+    Totals over every order placed.
+    Staff only endpoint.
+    """
+    return sales_analytics.totals()
+
+@router.get("/items", response_model=List[ItemSales])
+async def get_top_items(
+    limit: int = Query(10, ge=1, le=1000),
+    by: str = Query("revenue", pattern="^(revenue|units)$")
+):
+    """
+    The best selling items, by revenue or by units sold.
+    Staff only endpoint.
+    """
+    return sales_analytics.top_items(limit, by)
+
+@router.get("/items/{item_id}", response_model=ItemSales)
+async def get_item_sales(item_id: str):
+    """
+    Sales of one item; all zero if it was never sold.
+    Staff only endpoint.
+    """
+    return sales_analytics.item(item_id)
+
+@router.get("/categories", response_model=List[CategorySales])
+async def get_category_sales():
+    """
+    Sales per category, highest revenue first.
+    Staff only endpoint.
+    """
+    return sales_analytics.categories()
+
+@router.get("/offers", response_model=List[OfferSales])
+async def get_offer_sales(limit: int = Query(100, ge=1, le=1000)):
+    """
+    Redemptions and discount given for the offers that gave the most discount, largest first.
+    Staff only endpoint.
+    """
+    return sales_analytics.offers(limit)
+
+@router.get("/series", response_model=List[SalesBucket])
+async def get_sales_series(
+    interval: SalesInterval = SalesInterval.DAY,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """
+    Sales totals per hour or per day, oldest first, for the periods
+    overlapping the given range. Periods without orders are left out.
+    Staff only endpoint.
+    """
+    return sales_analytics.series(interval, created_from, created_to)
+
+@router.post("/rebuild", response_model=SalesTotals)
+async def rebuild_analytics():
+    """
+    Recompute every aggregate from the order history, e.g. after restoring a backup.
+    Staff only endpoint.
+    """
+    logger.info("Rebuilding sales analytics")
+    totals = sales_analytics.rebuild()
+    logger.info("Sales analytics rebuilt from %s order(s)", totals.orders)
+    return totals
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.changes import TooManySubscribers, change_feed
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["changes"],
+)
+
+@router.get("/")
+async def stream_changes(cursor: Optional[str] = None, last_event_id: Optional[str] = Header(None)):
+    """
+    Stream changes to items and offers as Server-Sent Events, so clients can
+    keep their lists up to date without polling.
+    Browsers reconnecting with EventSource send the Last-Event-ID header and
+    resume where they left off; other clients can pass the last event ID as `cursor`.
+    """
+    try:
+        events = change_feed.stream(last_event_id or cursor)
+    except TooManySubscribers:
+        logger.warning("Change feed subscriber refused: too many subscribers")
+        raise HTTPException(status_code=503, detail="Too many change feed subscribers", headers={"Retry-After": "5"})
+
+    logger.info("Change feed subscriber connected (cursor: %s)", last_event_id or cursor)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Ask proxies not to buffer or cache the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
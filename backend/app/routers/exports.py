@@ -0,0 +1,69 @@
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Iterator, Optional
+from app.database import db
+from datetime import datetime
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/exports",
+    tags=["exports"],
+)
+
+# Records serialized per chunk sent to the client
+EXPORT_BATCH_SIZE = 500
+
+def _ndjson_chunks(records: Iterator[BaseModel]) -> Iterator[bytes]:
+    batch = []
+    for record in records:
+        batch.append(record.model_dump_json())
+        if len(batch) == EXPORT_BATCH_SIZE:
+            yield ("\n".join(batch) + "\n").encode()
+            batch = []
+    if batch:
+        yield ("\n".join(batch) + "\n").encode()
+
+def _gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        # Sync-flush so every batch reaches the client instead of sitting in the compressor
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def _export_response(records: Iterator[BaseModel], name: str, gzip: bool) -> StreamingResponse:
+    chunks = _ndjson_chunks(records)
+    if gzip:
+        return StreamingResponse(
+            _gzip_chunks(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{name}.ndjson.gz"'}
+        )
+    return StreamingResponse(
+        chunks,
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{name}.ndjson"'}
+    )
+
+@router.get("/orders")
+async def export_orders(since: Optional[datetime] = None, gzip: bool = False):
+    """
+    Stream all orders as newline-delimited JSON, oldest first.
+    Pass `since` to only export orders created at or after that time; orders
+    at exactly the watermark are repeated, so consumers should de-duplicate by ID.
+    Pass `gzip=true` for a gzip-compressed stream.
+    """
+    logger.info("Exporting orders (since: %s, gzip: %s)", since, gzip)
+    return _export_response(db.iter_orders(since=since), "orders", gzip)
+
+@router.get("/items")
+async def export_items(gzip: bool = False):
+    """
+    Stream all items as newline-delimited JSON.
+    Pass `gzip=true` for a gzip-compressed stream.
+    """
+    logger.info("Exporting items (gzip: %s)", gzip)
+    return _export_response(db.iter_items(), "items", gzip)
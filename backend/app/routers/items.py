@@ -1,7 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models import Item
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import List, Optional
+from app.models import Item, ItemSummary, SearchSuggestions, to_cents
+from app.cache import cached_json, dump_json, json_response
 from app.database import db
+from app.pagination import page_body, page_response, parse_fields
+from app.search import search_index, tokenize
+from app.storage.base import decode_cursor, encode_cursor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,21 +17,121 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[Item])
-async def get_items():
+async def get_items(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: bool = False,
+    fields: Optional[str] = None,
+    summary: bool = False
+):
     """
-    Get all available items with stock levels and prices.
+    Get available items with stock levels and prices, one page at a time.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    Use `fields` to return only some fields, e.g. `fields=id,name,price`,
+    or `summary=true` for every field but the description.
+    Responses carry an ETag; send it back in If-None-Match to get a 304 while nothing changed.
     """
-    logger.info("Fetching all items")
-    return list(db.items.values())
+    selected_fields = parse_fields(fields, Item, ItemSummary if summary else None)
+    logger.info("Fetching items page (cursor: %s, limit: %s)", cursor, limit)
+    try:
+        min_cents = to_cents(min_price) if min_price is not None else None
+        max_cents = to_cents(max_price) if max_price is not None else None
+    except ValueError as e:
+        # Infinite or NaN bounds
+        logger.warning("Invalid price filter (min: %s, max: %s)", min_price, max_price)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def build():
+        try:
+            items, next_cursor = db.page_items(
+                cursor=cursor,
+                limit=limit,
+                category=category,
+                min_price=min_cents,
+                max_price=max_cents,
+                in_stock=in_stock
+            )
+        except ValueError as e:
+            logger.warning("Invalid items cursor: %s", cursor)
+            raise HTTPException(status_code=400, detail=str(e))
+        return page_body(items, next_cursor, selected_fields, Item)
+
+    key = (
+        "items", cursor, limit, category, min_cents, max_cents, in_stock,
+        frozenset(selected_fields) if selected_fields is not None else None
+    )
+    return cached_json(request, key, db.version("items"), build)
+
+# Search routes are declared before /{item_id} so their paths are not taken for an item ID
+
+@router.get("/search", response_model=List[Item])
+async def search_items(
+    q: str = Query(..., min_length=1),
+    category: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    summary: bool = False
+):
+    """
+    Search items by name, description and category, best matches first.
+    Every word of `q` must match; `category` limits results to one category.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    """
+    logger.info("Searching items for %r (cursor: %s, limit: %s)", q, cursor, limit)
+    offset = 0
+    if cursor is not None:
+        try:
+            key = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if len(key) != 1 or not isinstance(key[0], int) or key[0] < 0:
+            logger.warning("Invalid search cursor: %s", cursor)
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+        offset = key[0]
+
+    item_ids, more = search_index.search(q, category, offset, limit)
+    # Items deleted since they were indexed are skipped
+    items = db.get_items(item_ids)
+    next_cursor = encode_cursor([offset + limit]) if more else None
+    return page_response(
+        [items[item_id] for item_id in item_ids if item_id in items],
+        next_cursor,
+        parse_fields(None, Item, ItemSummary if summary else None),
+        Item
+    )
+
+@router.get("/suggest", response_model=SearchSuggestions)
+async def suggest_items(q: str = Query(..., min_length=1), limit: int = Query(5, ge=1, le=20)):
+    """
+    Typeahead suggestions while `q` is being typed: completions of its last
+    word, and the best items matching it with the last word as a prefix.
+    """
+    words = tokenize(q)
+    terms = search_index.complete(words[-1], limit) if words else []
+    item_ids, _ = search_index.search(q, limit=limit, prefix=True)
+    items = db.get_items(item_ids)
+    summaries = [
+        ItemSummary.model_construct(**items[item_id].model_dump(include=set(ItemSummary.model_fields)))
+        for item_id in item_ids if item_id in items
+    ]
+    return json_response(SearchSuggestions(terms=terms, items=summaries), SearchSuggestions)
 
 @router.get("/{item_id}", response_model=Item)
-async def get_item(item_id: str):
+async def get_item(request: Request, item_id: str):
     """
     Get details of a specific item by ID.
     """
-    if item_id not in db.items:
-        logger.warning(f"Item not found: {item_id}")
-        raise HTTPException(status_code=404, detail="Item not found")
-    
-    logger.info(f"Fetching item by ID: {item_id}")
-    return db.items[item_id] 
\ No newline at end of file
+    logger.info("Fetching item by ID: %s", item_id)
+
+    def build():
+        item = db.get_item(item_id)
+        if item is None:
+            logger.warning("Item not found: %s", item_id)
+            raise HTTPException(status_code=404, detail="Item not found")
+        return dump_json(item, Item), None
+
+    return cached_json(request, ("item", item_id), db.version("items"), build)
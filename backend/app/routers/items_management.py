@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Request
 from typing import List
-from app.models import Item, ItemCreate, ItemUpdate
+from app.models import BulkRecordResult, BulkStatus, Item, ItemCreate, ItemUpdate, ItemUpsert
 from app.database import db
+from app.search import search_index
+from app.changes import publish_deleted, publish_items
+from app.bulk import error_result, plan_upserts, read_records, validate_ids, validate_records
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +21,7 @@ async def create_item(item: ItemCreate):
     Add a new item to the inventory.
     Staff only endpoint.
     """
-    logger.info(f"Creating new item: {item.name}")
+    logger.info("Creating new item: %s", item.name)
     
     new_item = Item(
         name=item.name,
@@ -28,28 +31,101 @@ async def create_item(item: ItemCreate):
         category=item.category
     )
     
-    db.items[new_item.id] = new_item
-    logger.info(f"Item created with ID: {new_item.id}")
+    db.add_item(new_item)
+    search_index.add(new_item)
+    publish_items([new_item])
+    logger.info("Item created with ID: %s", new_item.id)
     
     return new_item
 
+# Bulk routes are declared before /{item_id} so "bulk" is not taken for an item ID
+
+@router.post("/bulk", response_model=List[BulkRecordResult])
+async def bulk_create_items(request: Request):
+    """
+    Add many items in one request.
+    Accepts a JSON array or NDJSON of items and returns a result per record.
+    Staff only endpoint.
+    """
+    records = await read_records(request)
+    valid, results = validate_records(records, ItemCreate)
+
+    new_items = [(index, Item(**item.model_dump())) for index, item in valid]
+    db.add_items([item for _, item in new_items])
+    search_index.add_many(item for _, item in new_items)
+    publish_items(item for _, item in new_items)
+    results.extend(BulkRecordResult(index=index, id=item.id, status=BulkStatus.CREATED) for index, item in new_items)
+
+    logger.info("Bulk created %s of %s item(s)", len(new_items), len(records))
+    return sorted(results, key=lambda result: result.index)
+
+@router.put("/bulk", response_model=List[BulkRecordResult])
+async def bulk_upsert_items(request: Request):
+    """
+    Create or update many items in one request.
+    Records whose `id` matches an existing item are applied as partial updates;
+    the others are created and must include every item field.
+    Staff only endpoint.
+    """
+    records = await read_records(request)
+    valid, results = validate_records(records, ItemUpsert)
+
+    existing_ids = set(db.get_items(record.id for _, record in valid if record.id is not None))
+    creates, updates, errors = plan_upserts(valid, existing_ids, ItemCreate, Item)
+    results.extend(errors)
+
+    db.add_items([item for _, item in creates])
+    results.extend(BulkRecordResult(index=index, id=item.id, status=BulkStatus.CREATED) for index, item in creates)
+
+    updated = db.update_items({item_id: data for item_id, (_, data) in updates.items()})
+    search_index.add_many([*(item for _, item in creates), *updated.values()])
+    publish_items([*(item for _, item in creates), *updated.values()])
+    for item_id, (index, _) in updates.items():
+        if item_id in updated:
+            results.append(BulkRecordResult(index=index, id=item_id, status=BulkStatus.UPDATED))
+        else:
+            results.append(error_result(index, "Item not found", item_id))
+
+    logger.info("Bulk upserted %s item(s): %s created, %s updated", len(records), len(creates), len(updated))
+    return sorted(results, key=lambda result: result.index)
+
+@router.delete("/bulk", response_model=List[BulkRecordResult])
+async def bulk_delete_items(request: Request):
+    """
+    Remove many items in one request.
+    Accepts a JSON array or NDJSON of item IDs and returns a result per ID.
+    Staff only endpoint.
+    """
+    records = await read_records(request)
+    valid, results = validate_ids(records)
+
+    deleted = db.delete_items(item_id for _, item_id in valid)
+    search_index.remove_many(deleted)
+    publish_deleted("item", deleted)
+    for index, item_id in valid:
+        if item_id in deleted:
+            results.append(BulkRecordResult(index=index, id=item_id, status=BulkStatus.DELETED))
+        else:
+            results.append(error_result(index, "Item not found", item_id))
+
+    logger.info("Bulk deleted %s of %s item(s)", len(deleted), len(records))
+    return sorted(results, key=lambda result: result.index)
+
 @router.post("/{item_id}", response_model=Item)
 async def update_item(item_id: str, item_update: ItemUpdate):
     """
     Update an existing item in the inventory.
     Staff only endpoint.
     """
-    if item_id not in db.items:
-        logger.warning(f"Item not found for update: {item_id}")
-        raise HTTPException(status_code=404, detail="Item not found")
-    
-    item = db.items[item_id]
-    
     update_data = item_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(item, key, value)
+    item = db.update_item(item_id, update_data)
+    if item is None:
+        logger.warning("Item not found for update: %s", item_id)
+        raise HTTPException(status_code=404, detail="Item not found")
     
-    logger.info(f"Updated item: {item.name} (ID: {item_id})")
+    search_index.add(item)
+    publish_items([item])
+    logger.info("Updated item: %s (ID: %s)", item.name, item_id)
     return item
 
 @router.delete("/{item_id}", response_model=dict)
@@ -58,12 +134,14 @@ async def delete_item(item_id: str):
     Remove an item from the inventory.
     Staff only endpoint.
     """
-    if item_id not in db.items:
-        logger.warning(f"Item not found for deletion: {item_id}")
+    item = db.delete_item(item_id)
+    if item is None:
+        logger.warning("Item not found for deletion: %s", item_id)
         raise HTTPException(status_code=404, detail="Item not found")
     
-    item_name = db.items[item_id].name
-    del db.items[item_id]
+    search_index.remove(item_id)
+    publish_deleted("item", [item_id])
+    item_name = item.name
     
-    logger.info(f"Deleted item: {item_name} (ID: {item_id})")
+    logger.info("Deleted item: %s (ID: %s)", item_name, item_id)
     return {"message": f"Item '{item_name}' deleted successfully"} 
\ No newline at end of file
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.metrics import render
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Request latencies, order counters and span timings in the Prometheus text format.
+    """
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models import Offer
+from fastapi import APIRouter, HTTPException, Request
+from typing import List, Optional
+from app.models import Offer, OfferSummary
+from app.cache import cached_json, dump_json
 from app.database import db
 from datetime import datetime
 import logging
@@ -14,31 +15,47 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[Offer])
-async def get_offers():
+async def get_offers(request: Request, at: Optional[datetime] = None, summary: bool = False):
     """
     Get all available offers.
     Only returns active offers within their validity period.
+    Pass `at` to preview the offers that will be active at another time,
+    and `summary=true` to leave out descriptions and applicable items.
+    Responses carry an ETag; send it back in If-None-Match to get a 304 while nothing changed.
     """
+    version = db.version("offers")
+    fields = set(OfferSummary.model_fields) if summary else None
+    if at is not None:
+        logger.info("Fetching offers active at %s", at)
+        return cached_json(
+            request,
+            ("offers_at", at.timestamp(), summary),
+            version,
+            lambda: (dump_json(db.offers_active_at(at), List[Offer], fields), None)
+        )
+
     logger.info("Fetching active offers")
-    
-    now = datetime.now()
-    active_offers = [
-        offer for offer in db.offers.values()
-        if offer.is_active and
-        (offer.start_date is None or offer.start_date <= now) and
-        (offer.end_date is None or offer.end_date >= now)
-    ]
-    
-    return active_offers
+    # Offers start and end without a write, so the live set is part of the key
+    active_offers = db.active_offers()
+    return cached_json(
+        request,
+        ("offers", tuple(active_offers), summary),
+        version,
+        lambda: (dump_json(list(active_offers.values()), List[Offer], fields), None)
+    )
 
 @router.get("/{offer_id}", response_model=Offer)
-async def get_offer(offer_id: str):
+async def get_offer(request: Request, offer_id: str):
     """
     Get details of a specific offer by ID.
     """
-    if offer_id not in db.offers:
-        logger.warning(f"Offer not found: {offer_id}")
-        raise HTTPException(status_code=404, detail="Offer not found")
-    
-    logger.info(f"Fetching offer by ID: {offer_id}")
-    return db.offers[offer_id] 
\ No newline at end of file
+    logger.info("Fetching offer by ID: %s", offer_id)
+
+    def build():
+        offer = db.get_offer(offer_id)
+        if offer is None:
+            logger.warning("Offer not found: %s", offer_id)
+            raise HTTPException(status_code=404, detail="Offer not found")
+        return dump_json(offer, Offer), None
+
+    return cached_json(request, ("offer", offer_id), db.version("offers"), build)
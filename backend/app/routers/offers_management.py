@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models import Offer, OfferCreate, OfferUpdate
+from fastapi import APIRouter, HTTPException, Request
+from typing import List, Optional, Tuple
+from app.models import BulkRecordResult, BulkStatus, Offer, OfferCreate, OfferUpdate, OfferUpsert, check_free_units
 from app.database import db
+from app.changes import publish_deleted, publish_offers
+from app.bulk import error_result, plan_upserts, read_records, validate_ids, validate_records
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,12 +20,12 @@ async def create_offer(offer: OfferCreate):
     Add a new offer.
     Staff only endpoint.
     """
-    logger.info(f"Creating new offer: {offer.name}")
+    logger.info("Creating new offer: %s", offer.name)
     
     # Validate that all applicable items exist
-    invalid_items = [item_id for item_id in offer.applicable_items if item_id not in db.items]
+    invalid_items = db.missing_items(offer.applicable_items)
     if invalid_items:
-        logger.warning(f"Invalid item IDs in offer: {invalid_items}")
+        logger.warning("Invalid item IDs in offer: %s", invalid_items)
         raise HTTPException(status_code=400, detail=f"Invalid item IDs: {invalid_items}")
     
     new_offer = Offer(
@@ -38,35 +40,154 @@ async def create_offer(offer: OfferCreate):
         is_active=offer.is_active
     )
     
-    db.offers[new_offer.id] = new_offer
-    logger.info(f"Offer created with ID: {new_offer.id}")
+    db.add_offer(new_offer)
+    publish_offers([new_offer])
+    logger.info("Offer created with ID: %s", new_offer.id)
     
     return new_offer
 
+def _check_applicable_items(valid: List[Tuple[int, OfferCreate]], results: List[BulkRecordResult]) -> List[Tuple[int, OfferCreate]]:
+    # One existence check for every item ID referenced anywhere in the batch
+    referenced = set()
+    for _, offer in valid:
+        referenced.update(offer.applicable_items or ())
+    missing = set(db.missing_items(referenced))
+    if not missing:
+        return valid
+
+    checked = []
+    for index, offer in valid:
+        invalid_items = [item_id for item_id in offer.applicable_items or () if item_id in missing]
+        if invalid_items:
+            results.append(error_result(index, f"Invalid item IDs: {invalid_items}", getattr(offer, "id", None)))
+        else:
+            checked.append((index, offer))
+    return checked
+
+def _update_error(offer: Offer, update_data: dict) -> Optional[str]:
+    # The discount value means percent, dollars or free units depending on the
+    # offer type, so a stored value is not carried over to a different type
+    offer_type = update_data.get("offer_type", offer.offer_type)
+    if offer_type != offer.offer_type and "discount_value" not in update_data:
+        return "discount_value must be given when offer_type changes"
+    # The offer type and value may each come from the update or the stored offer
+    try:
+        check_free_units(
+            offer_type,
+            update_data.get("discount_value", offer.discount_value)
+        )
+    except ValueError as e:
+        return str(e)
+    return None
+
+# Bulk routes are declared before /{offer_id} so "bulk" is not taken for an offer ID
+
+@router.post("/bulk", response_model=List[BulkRecordResult])
+async def bulk_create_offers(request: Request):
+    """
+    Add many offers in one request.
+    Accepts a JSON array or NDJSON of offers and returns a result per record.
+    Staff only endpoint.
+    """
+    records = await read_records(request)
+    valid, results = validate_records(records, OfferCreate)
+    valid = _check_applicable_items(valid, results)
+
+    new_offers = [(index, Offer(**offer.model_dump())) for index, offer in valid]
+    db.add_offers([offer for _, offer in new_offers])
+    publish_offers(offer for _, offer in new_offers)
+    results.extend(BulkRecordResult(index=index, id=offer.id, status=BulkStatus.CREATED) for index, offer in new_offers)
+
+    logger.info("Bulk created %s of %s offer(s)", len(new_offers), len(records))
+    return sorted(results, key=lambda result: result.index)
+
+@router.put("/bulk", response_model=List[BulkRecordResult])
+async def bulk_upsert_offers(request: Request):
+    """
+    Create or update many offers in one request.
+    Records whose `id` matches an existing offer are applied as partial updates;
+    the others are created and must include every required offer field.
+    Staff only endpoint.
+    """
+    records = await read_records(request)
+    valid, results = validate_records(records, OfferUpsert)
+    valid = _check_applicable_items(valid, results)
+
+    existing = db.get_offers(record.id for _, record in valid if record.id is not None)
+    creates, updates, errors = plan_upserts(valid, set(existing), OfferCreate, Offer)
+    results.extend(errors)
+    for offer_id, (index, data) in list(updates.items()):
+        error = _update_error(existing[offer_id], data)
+        if error is not None:
+            results.append(error_result(index, error, offer_id))
+            del updates[offer_id]
+
+    db.add_offers([offer for _, offer in creates])
+    results.extend(BulkRecordResult(index=index, id=offer.id, status=BulkStatus.CREATED) for index, offer in creates)
+
+    updated = db.update_offers({offer_id: data for offer_id, (_, data) in updates.items()})
+    publish_offers([*(offer for _, offer in creates), *updated.values()])
+    for offer_id, (index, _) in updates.items():
+        if offer_id in updated:
+            results.append(BulkRecordResult(index=index, id=offer_id, status=BulkStatus.UPDATED))
+        else:
+            results.append(error_result(index, "Offer not found", offer_id))
+
+    logger.info("Bulk upserted %s offer(s): %s created, %s updated", len(records), len(creates), len(updated))
+    return sorted(results, key=lambda result: result.index)
+
+@router.delete("/bulk", response_model=List[BulkRecordResult])
+async def bulk_delete_offers(request: Request):
+    """
+    Remove many offers in one request.
+    Accepts a JSON array or NDJSON of offer IDs and returns a result per ID.
+    Staff only endpoint.
+    """
+    records = await read_records(request)
+    valid, results = validate_ids(records)
+
+    deleted = db.delete_offers(offer_id for _, offer_id in valid)
+    publish_deleted("offer", deleted)
+    for index, offer_id in valid:
+        if offer_id in deleted:
+            results.append(BulkRecordResult(index=index, id=offer_id, status=BulkStatus.DELETED))
+        else:
+            results.append(error_result(index, "Offer not found", offer_id))
+
+    logger.info("Bulk deleted %s of %s offer(s)", len(deleted), len(records))
+    return sorted(results, key=lambda result: result.index)
+
 @router.post("/{offer_id}", response_model=Offer)
 async def update_offer(offer_id: str, offer_update: OfferUpdate):
     """
     Update an existing offer.
     Staff only endpoint.
     """
-    if offer_id not in db.offers:
-        logger.warning(f"Offer not found for update: {offer_id}")
+    current = db.get_offer(offer_id)
+    if current is None:
+        logger.warning("Offer not found for update: %s", offer_id)
         raise HTTPException(status_code=404, detail="Offer not found")
     
     # Validate that all applicable items exist if provided
     if offer_update.applicable_items:
-        invalid_items = [item_id for item_id in offer_update.applicable_items if item_id not in db.items]
+        invalid_items = db.missing_items(offer_update.applicable_items)
         if invalid_items:
-            logger.warning(f"Invalid item IDs in offer update: {invalid_items}")
+            logger.warning("Invalid item IDs in offer update: %s", invalid_items)
             raise HTTPException(status_code=400, detail=f"Invalid item IDs: {invalid_items}")
     
-    offer = db.offers[offer_id]
-    
     update_data = offer_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(offer, key, value)
+    error = _update_error(current, update_data)
+    if error is not None:
+        logger.warning("Invalid offer update for %s: %s", offer_id, error)
+        raise HTTPException(status_code=422, detail=error)
+
+    offer = db.update_offer(offer_id, update_data)
+    if offer is None:
+        logger.warning("Offer not found for update: %s", offer_id)
+        raise HTTPException(status_code=404, detail="Offer not found")
     
-    logger.info(f"Updated offer: {offer.name} (ID: {offer_id})")
+    publish_offers([offer])
+    logger.info("Updated offer: %s (ID: %s)", offer.name, offer_id)
     return offer
 
 @router.delete("/{offer_id}", response_model=dict)
@@ -75,12 +196,13 @@ async def delete_offer(offer_id: str):
     Remove an offer.
     Staff only endpoint.
     """
-    if offer_id not in db.offers:
-        logger.warning(f"Offer not found for deletion: {offer_id}")
+    offer = db.delete_offer(offer_id)
+    if offer is None:
+        logger.warning("Offer not found for deletion: %s", offer_id)
         raise HTTPException(status_code=404, detail="Offer not found")
     
-    offer_name = db.offers[offer_id].name
-    del db.offers[offer_id]
+    publish_deleted("offer", [offer_id])
+    offer_name = offer.name
     
-    logger.info(f"Deleted offer: {offer_name} (ID: {offer_id})")
+    logger.info("Deleted offer: %s (ID: %s)", offer_name, offer_id)
     return {"message": f"Offer '{offer_name}' deleted successfully"} 
\ No newline at end of file
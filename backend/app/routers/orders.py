@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import List
-from app.models import Order, OrderItem
+from fastapi import APIRouter, HTTPException, Body, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
+from app.models import BatchOrderResult, Order, OrderItem, OrderSummary
+from app.cache import json_response
 from app.database import db
-from app.services import process_order
+from app.idempotency import IdempotencyKeyReused, fingerprint, idempotency_store
+from app.pagination import page_response, parse_fields
+from app.services import process_order, process_orders, quote_order
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,42 +19,120 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=Order)
-async def create_order(order_items: List[OrderItem] = Body(...)):
+async def create_order(
+    order_items: List[OrderItem] = Body(...),
+    idempotency_key: Optional[str] = Header(None)
+):
     """
     Place a new order with the specified items.
     Offers will be automatically applied if conditions are met.
+    Retries sent with the same Idempotency-Key header get the original result
+    instead of placing the order again.
     """
-    logger.info(f"Processing new order with {len(order_items)} item(s)")
+    logger.info("Processing new order with %s item(s)", len(order_items))
     
-    order, errors = process_order(order_items)
+    replayed = False
+    # Priced on a worker thread, so the event loop keeps serving other requests
+    # and admission control sees how many orders are in flight
+    if idempotency_key is None:
+        order, errors = await run_in_threadpool(process_order, order_items)
+    else:
+        request_fingerprint = fingerprint([(item.item_id, item.quantity) for item in order_items])
+        try:
+            (order, errors), replayed = await idempotency_store.run(
+                idempotency_key,
+                request_fingerprint,
+                lambda: run_in_threadpool(process_order, order_items)
+            )
+        except IdempotencyKeyReused:
+            logger.warning("Idempotency key reused with a different order: %s", idempotency_key)
+            raise HTTPException(status_code=422, detail="Idempotency key was already used for a different order")
+        if replayed:
+            logger.info("Replaying result for idempotency key: %s", idempotency_key)
     
     if errors:
-        logger.error(f"Order processing failed: {errors}")
-        raise HTTPException(status_code=400, detail=errors)
+        logger.error("Order processing failed: %s", errors, extra={"order_errors": errors})
+        raise HTTPException(
+            status_code=400,
+            detail=errors,
+            headers={"Idempotent-Replayed": "true"} if replayed else None
+        )
     
-    # Save the order to the database
-    db.orders[order.id] = order
-    logger.info(f"Order created successfully with ID: {order.id}")
+    logger.info("Order created successfully with ID: %s", order.id, extra={"order_id": order.id})
     
-    return order
+    return json_response(order, Order, {"Idempotent-Replayed": "true"} if replayed else None)
+
+@router.post("/batch", response_model=List[BatchOrderResult])
+async def create_orders(carts: List[List[OrderItem]] = Body(...)):
+    """
+    Place many orders in one request, e.g. for marketplace partners.
+    Each order succeeds or fails on its own; results are returned in the same order.
+    """
+    logger.info("Processing batch of %s order(s)", len(carts))
+
+    results = []
+    for index, (order, errors) in enumerate(await run_in_threadpool(process_orders, carts)):
+        results.append(BatchOrderResult(index=index, order=order, errors=errors))
+
+    placed = sum(1 for result in results if result.order is not None)
+    logger.info("Batch processed: %s placed, %s rejected", placed, len(results) - placed)
+    return json_response(results, List[BatchOrderResult])
+
+@router.post("/quote", response_model=Order)
+async def create_quote(order_items: List[OrderItem] = Body(...)):
+    """
+    Price an order without placing it: stock is not taken and nothing is saved.
+    The quote applies the same offers and totals as placing the order would.
+    """
+    logger.info("Quoting order with %s item(s)", len(order_items))
+
+    order, errors = await run_in_threadpool(quote_order, order_items)
+    if errors:
+        logger.warning("Order quote failed: %s", errors)
+        raise HTTPException(status_code=400, detail=errors)
+
+    return json_response(order, Order)
 
 @router.get("/", response_model=List[Order])
-async def get_orders():
+async def get_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: Optional[str] = None,
+    summary: bool = False
+):
     """
-    Get all orders (for demonstration purposes).
+    Get orders by creation time, one page at a time (for demonstration purposes).
     In a real system, this would be restricted to staff or filtered by user.
+    The cursor for the next page is returned in the X-Next-Cursor header.
+    Use `summary=true` for totals only, without the order lines.
     """
-    logger.info("Fetching all orders")
-    return list(db.orders.values())
+    selected_fields = parse_fields(fields, Order, OrderSummary if summary else None)
+    logger.info("Fetching orders page (cursor: %s, limit: %s)", cursor, limit)
+    try:
+        orders, next_cursor = db.page_orders(
+            cursor=cursor,
+            limit=limit,
+            created_from=created_from,
+            created_to=created_to,
+            with_items=selected_fields is None or "items" in selected_fields
+        )
+    except ValueError as e:
+        logger.warning("Invalid orders cursor: %s", cursor)
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return page_response(orders, next_cursor, selected_fields, Order)
 
 @router.get("/{order_id}", response_model=Order)
 async def get_order(order_id: str):
     """
     Get details of a specific order by ID.
     """
-    if order_id not in db.orders:
-        logger.warning(f"Order not found: {order_id}")
+    order = db.get_order(order_id)
+    if order is None:
+        logger.warning("Order not found: %s", order_id)
         raise HTTPException(status_code=404, detail="Order not found")
     
-    logger.info(f"Fetching order by ID: {order_id}")
-    return db.orders[order_id] 
\ No newline at end of file
+    logger.info("Fetching order by ID: %s", order_id)
+    return json_response(order, Order) 
\ No newline at end of file
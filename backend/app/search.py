@@ -0,0 +1,308 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from app.models import Item
+from app.database import db
+from app.storage import Storage
+import bisect
+import heapq
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+# How much one occurrence of a term counts in each field
+NAME_WEIGHT = 3
+CATEGORY_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+# Vocabulary terms looked at when expanding a prefix, and the most kept
+PREFIX_SCAN = 2000
+PREFIX_TERMS = 32
+# Prefix expansions remembered between writes
+EXPANSION_CACHE_SIZE = 10000
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens.
+    """
+    return _TOKEN.findall(text.lower())
+
+def _term_weights(item: Item) -> Dict[str, int]:
+    weights: Dict[str, int] = {}
+    for field, weight in ((item.name, NAME_WEIGHT), (item.category, CATEGORY_WEIGHT), (item.description, DESCRIPTION_WEIGHT)):
+        for term in tokenize(field):
+            weights[term] = weights.get(term, 0) + weight
+    return weights
+
+class _Postings:
+    """
+    The items containing a term, bucketed by the term's weight in each item.
+    Buckets are dicts used as insertion-ordered sets.
+    """
+    __slots__ = ("count", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.buckets: Dict[int, Dict[str, None]] = {}
+
+class SearchIndex:
+    """
+    In-memory full-text index over item names, descriptions and categories.
+
+    Each term has a posting list of the items containing it, bucketed by the
+    term's weight in the item, so the best matches for a term can be read
+    first without scoring every item containing it. The vocabulary is also
+    kept sorted, so the terms starting with a prefix are one contiguous range,
+    as in a trie, found by binary search. Each category has its own posting list.
+
+    The index is built from the storage on first use, then kept up to date by
+    calling `add` and `remove` as items are written. Item IDs it returns may
+    have been deleted since by another process, so callers fetch the items
+    themselves and skip missing ones.
+    """
+    def __init__(self, storage: Storage):
+        self._storage = storage
+        self._lock = threading.Lock()
+        self._built = False
+        self._postings: Dict[str, _Postings] = {}
+        self._terms: List[str] = []
+        self._categories: Dict[str, Set[str]] = {}
+        # For each item: the weight of each of its terms, and its category
+        self._documents: Dict[str, Tuple[Dict[str, int], str]] = {}
+        self._expansions: Dict[Tuple[str, int], List[str]] = {}
+
+    def _ensure_built(self):
+        # Called with the lock held
+        if self._built:
+            return
+        for item in self._storage.iter_items():
+            self._add(item)
+        self._terms = sorted(self._postings)
+        self._built = True
+        logger.info("Built search index of %s item(s) and %s term(s)", len(self._documents), len(self._terms))
+
+    # Updates
+
+    def add(self, item: Item):
+        """
+        Index an item, replacing its previous entry if it was indexed.
+        """
+        self.add_many([item])
+
+    def add_many(self, items: Iterable[Item]):
+        with self._lock:
+            if not self._built:
+                # The first build reads the storage, which already holds them
+                self._ensure_built()
+                return
+            self._expansions.clear()
+            new_terms = []
+            for item in items:
+                self._remove(item.id)
+                new_terms.extend(self._add(item))
+            self._insert_terms(new_terms)
+
+    def remove(self, item_id: str):
+        self.remove_many([item_id])
+
+    def remove_many(self, item_ids: Iterable[str]):
+        with self._lock:
+            if not self._built:
+                self._ensure_built()
+                return
+            self._expansions.clear()
+            for item_id in item_ids:
+                self._remove(item_id)
+
+    def _add(self, item: Item) -> List[str]:
+        # Returns the terms that are new to the vocabulary
+        new_terms = []
+        weights = _term_weights(item)
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+                new_terms.append(term)
+            bucket = postings.buckets.get(weight)
+            if bucket is None:
+                bucket = postings.buckets[weight] = {}
+            bucket[item.id] = None
+            postings.count += 1
+        category = self._categories.get(item.category)
+        if category is None:
+            category = self._categories[item.category] = set()
+        category.add(item.id)
+        self._documents[item.id] = (weights, item.category)
+        return new_terms
+
+    def _insert_terms(self, terms: List[str]):
+        if len(terms) > len(self._terms) // 16:
+            self._terms = sorted(self._postings)
+            return
+        for term in terms:
+            bisect.insort(self._terms, term)
+
+    def _remove(self, item_id: str):
+        document = self._documents.pop(item_id, None)
+        if document is None:
+            return
+        weights, category = document
+        for term, weight in weights.items():
+            postings = self._postings[term]
+            bucket = postings.buckets[weight]
+            del bucket[item_id]
+            if not bucket:
+                del postings.buckets[weight]
+            postings.count -= 1
+            if not postings.count:
+                del self._postings[term]
+                position = bisect.bisect_left(self._terms, term)
+                if position < len(self._terms) and self._terms[position] == term:
+                    del self._terms[position]
+        members = self._categories[category]
+        members.discard(item_id)
+        if not members:
+            del self._categories[category]
+
+    # Queries
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20,
+        prefix: bool = False
+    ) -> Tuple[List[str], bool]:
+        """
+        Find the items matching every term of the query, best first.
+        With `prefix`, the last term also matches longer words, for typeahead.
+        Items score the sum of their term weights times each term's inverse
+        document frequency; ties go to the item indexed first.
+        Returns one page of item IDs and whether there are more.
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return [], False
+        with self._lock:
+            self._ensure_built()
+            total = len(self._documents)
+            # For each query term: the inverse document frequency of each
+            # vocabulary term it matches
+            sources: List[Dict[str, float]] = []
+            for index, term in enumerate(query_terms):
+                if prefix and index == len(query_terms) - 1:
+                    matched = self._expand(term)
+                else:
+                    matched = [term] if term in self._postings else []
+                if not matched:
+                    return [], False
+                sources.append({match: math.log(1 + total / self._postings[match].count) for match in matched})
+            members = None
+            if category is not None:
+                members = self._categories.get(category)
+                if members is None:
+                    return [], False
+            return self._top(sources, members, offset, limit)
+
+    def _top(self, sources: List[Dict[str, float]], members: Optional[Set[str]], offset: int, limit: int) -> Tuple[List[str], bool]:
+        # Each item is in one bucket per query term (for a prefix, per
+        # vocabulary term), and scores the sum of those buckets' impacts.
+        # Visit combinations of one bucket per query term from the highest sum
+        # down, and stop once the top `offset + limit + 1` items are known to
+        # beat every combination left (a threshold algorithm).
+        term_levels = []
+        for idfs in sources:
+            levels = [
+                (weight * idf, bucket)
+                for term, idf in idfs.items()
+                for weight, bucket in self._postings[term].buckets.items()
+            ]
+            levels.sort(key=lambda level: -level[0])
+            term_levels.append(levels)
+
+        wanted = offset + limit + 1
+        # Min-heap of (score, -arrival, item ID), so earlier arrivals win ties
+        best: List[Tuple[float, int, str]] = []
+        # Items already ranked; with a prefix, an item can be in several combinations,
+        # and the first one it is found in has its best score
+        ranked: Set[str] = set()
+        arrival = 0
+        first = (0,) * len(term_levels)
+        combinations = [(-sum(levels[0][0] for levels in term_levels), first)]
+        queued = {first}
+        while combinations:
+            negative_score, positions = heapq.heappop(combinations)
+            score = -negative_score
+            if len(best) == wanted and best[0][0] >= score:
+                break
+            buckets = [term_levels[term][position][1] for term, position in enumerate(positions)]
+            buckets.sort(key=len)
+            smallest, others = buckets[0], buckets[1:]
+            for item_id in smallest:
+                if len(best) == wanted and best[0][0] >= score:
+                    break
+                if item_id in ranked or (members is not None and item_id not in members):
+                    continue
+                for bucket in others:
+                    if item_id not in bucket:
+                        break
+                else:
+                    ranked.add(item_id)
+                    arrival += 1
+                    entry = (score, -arrival, item_id)
+                    if len(best) < wanted:
+                        heapq.heappush(best, entry)
+                    else:
+                        heapq.heapreplace(best, entry)
+
+            for term, position in enumerate(positions):
+                if position + 1 < len(term_levels[term]):
+                    following = positions[:term] + (position + 1,) + positions[term + 1:]
+                    if following not in queued:
+                        queued.add(following)
+                        following_score = score - term_levels[term][position][0] + term_levels[term][position + 1][0]
+                        heapq.heappush(combinations, (-following_score, following))
+
+        ordered = sorted(best, reverse=True)
+        page = [item_id for _, _, item_id in ordered[offset:offset + limit]]
+        return page, len(ordered) > offset + limit
+
+    def _expand(self, prefix: str, count: int = PREFIX_TERMS) -> List[str]:
+        # The most common vocabulary terms starting with the prefix
+        key = (prefix, count)
+        expansion = self._expansions.get(key)
+        if expansion is not None:
+            return expansion
+        start = bisect.bisect_left(self._terms, prefix)
+        # No word character sorts after U+10FFFF, so this ends the prefix's range
+        end = min(bisect.bisect_left(self._terms, prefix + "\U0010ffff", start), start + PREFIX_SCAN)
+        expansion = self._terms[start:end]
+        if len(expansion) > count:
+            expansion = heapq.nlargest(count, expansion, key=lambda term: self._postings[term].count)
+        if len(self._expansions) >= EXPANSION_CACHE_SIZE:
+            self._expansions.clear()
+        self._expansions[key] = expansion
+        return expansion
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Suggest vocabulary terms starting with the prefix, most common first.
+        """
+        prefix = prefix.lower()
+        if not prefix:
+            return []
+        with self._lock:
+            self._ensure_built()
+            terms = self._expand(prefix, limit)
+            return sorted(terms, key=lambda term: (-self._postings[term].count, term))
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_built()
+            return len(self._documents)
+
+# Index over the application's storage
+search_index = SearchIndex(db)
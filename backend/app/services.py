@@ -1,89 +1,101 @@
 from typing import List, Dict, Optional, Tuple
-from app.models import Item, Offer, OrderItem, Order
+from app.models import Cents, Item, OrderItem, Order
+from app.analytics import sales_analytics
+from app.changes import publish_stock
 from app.database import db
-from datetime import datetime
+from app.metrics import discount_cents, orders_placed, orders_rejected, stock_out_errors, timed
+from app.pricing import CompiledOffers, LineDiscount, PricingEngine, price_lines
 import logging
 
+try:
+    from app.pricing_columnar import price_lines_columnar
+except ImportError:
+    # NumPy is optional; without it every cart is priced by the scalar path
+    price_lines_columnar = None
+
 logger = logging.getLogger(__name__)
 
-def calculate_applicable_offers(items: List[OrderItem]) -> Dict[str, float]:
+pricing_engine = PricingEngine(db)
+
+# Carts with at least this many lines are priced by the columnar path when NumPy is installed
+COLUMNAR_MIN_LINES = 256
+
+# Prefix of the error for an order line that asks for more than is in stock
+STOCK_OUT_ERROR = "Not enough stock"
+
+def _record_outcome(order: Optional[Order], errors: List[str], db_items: Dict[str, Item]):
+    if not errors:
+        orders_placed.inc()
+        discount_cents.inc(order.discount_amount)
+        sales_analytics.record(order, db_items)
+        return
+    orders_rejected.inc()
+    for error in errors:
+        if error.startswith(STOCK_OUT_ERROR):
+            stock_out_errors.inc()
+
+@timed("calculate_applicable_offers")
+def calculate_applicable_offers(
+    items: List[OrderItem],
+    db_items: Optional[Dict[str, Item]] = None,
+    rules: Optional[CompiledOffers] = None,
+    columnar: Optional[bool] = None
+) -> List[LineDiscount]:
     """
     Calculate which offers apply to the items in the order and the discount amount.
-    Returns a dictionary mapping item_id to discount amount.
+    Returns the applied offer ID (or None) and discount amount for each line.
+    `db_items` and `rules` may be passed in when they were already
+    fetched for a batch of orders.
+    `columnar` forces the NumPy pricing path on or off; by default large carts use it.
+    Both paths give identical results.
     """
-    applicable_discounts = {}
-    item_counts_by_category = {}
-
-    # Group items by category for category-based offers
-    for order_item in items:
-        if order_item.item_id in db.items:
-            item = db.items[order_item.item_id]
-            if item.category not in item_counts_by_category:
-                item_counts_by_category[item.category] = []
-            item_counts_by_category[item.category].append((order_item, item))
-
-    # Check each offer for applicability
-    now = datetime.now()
-    for offer_id, offer in db.offers.items():
-        # Skip inactive offers or offers outside date range
-        if not offer.is_active:
-            continue
-        if offer.start_date and offer.start_date > now:
-            continue
-        if offer.end_date and offer.end_date < now:
-            continue
+    if db_items is None:
+        db_items = db.get_items(order_item.item_id for order_item in items)
+    if rules is None:
+        rules = pricing_engine.rules()
 
-        # Apply the offer based on its type
-        if offer.offer_type == "percentage":
-            for order_item in items:
-                if order_item.item_id in offer.applicable_items:
-                    item = db.items[order_item.item_id]
-                    discount = (offer.discount_value / 100) * order_item.unit_price * order_item.quantity
-                    if order_item.item_id not in applicable_discounts or discount > applicable_discounts[order_item.item_id][1]:
-                        applicable_discounts[order_item.item_id] = (offer_id, discount)
-                        logger.info(f"Applied percentage discount of {discount} to item {item.name}")
-
-        elif offer.offer_type == "fixed":
-            for order_item in items:
-                if order_item.item_id in offer.applicable_items and (not offer.min_quantity or order_item.quantity >= offer.min_quantity):
-                    item = db.items[order_item.item_id]
-                    # Limit fixed discount to item total
-                    item_total = order_item.unit_price * order_item.quantity
-                    discount = min(offer.discount_value, item_total)
-                    if order_item.item_id not in applicable_discounts or discount > applicable_discounts[order_item.item_id][1]:
-                        applicable_discounts[order_item.item_id] = (offer_id, discount)
-                        logger.info(f"Applied fixed discount of {discount} to item {item.name}")
-
-        elif offer.offer_type == "buy_x_get_y":
-            # This would be a more complex implementation based on your specific requirements
-            # For example, buy 2 get 1 free from the same category
-            pass
-
-    # Convert to simpler format for return
-    return {item_id: discount for item_id, (offer_id, discount) in applicable_discounts.items()}
+    # Category of each line's item, for category-based offers
+    categories = [db_items[order_item.item_id].category for order_item in items]
+    if columnar is None:
+        columnar = len(items) >= COLUMNAR_MIN_LINES
+    if columnar and price_lines_columnar is not None:
+        discounts = price_lines_columnar(rules, items, categories)
+    else:
+        discounts = price_lines(rules, items, categories)
 
-def process_order(order_items: List[OrderItem]) -> Tuple[Order, List[str]]:
+    if logger.isEnabledFor(logging.DEBUG):
+        for order_item, (offer_id, discount) in zip(items, discounts):
+            if offer_id is not None:
+                logger.debug("Applied offer %s with discount of %s to item %s", offer_id, discount, order_item.item_id)
+    return discounts
+
+def price_order(
+    order_items: List[OrderItem],
+    db_items: Dict[str, Item],
+    rules: CompiledOffers,
+    columnar: Optional[bool] = None
+) -> Tuple[Order, List[str]]:
     """
-    Process an order, applying offers and calculating totals.
-    Returns the processed order and a list of error messages if any.
+    Validate an order against the given items and apply the given offer rules,
+    without taking stock or saving it.
+    Returns the priced order and a list of error messages if any.
     """
     errors = []
     processed_items = []
     
     # Validate items and check stock
     for item in order_items:
-        if item.item_id not in db.items:
+        db_item = db_items.get(item.item_id)
+        if db_item is None:
             errors.append(f"Item with ID {item.item_id} not found")
             continue
-            
-        db_item = db.items[item.item_id]
         
         if item.quantity <= 0:
             errors.append(f"Quantity for item {db_item.name} must be greater than 0")
             continue
             
         if db_item.stock < item.quantity:
-            errors.append(f"Not enough stock for item {db_item.name}. Available: {db_item.stock}, Requested: {item.quantity}")
+            errors.append(f"{STOCK_OUT_ERROR} for item {db_item.name}. Available: {db_item.stock}, Requested: {item.quantity}")
             continue
             
         # Update the item with current price
@@ -97,32 +109,83 @@ def process_order(order_items: List[OrderItem]) -> Tuple[Order, List[str]]:
     if errors:
         return None, errors
     
-    # Calculate total before discounts
+    # Calculate total before discounts; amounts are integer cents, so sums are exact
     total_amount = sum(item.unit_price * item.quantity for item in processed_items)
     
     # Apply offers
-    applicable_discounts = calculate_applicable_offers(processed_items)
+    applicable_discounts = calculate_applicable_offers(processed_items, db_items, rules, columnar)
     total_discount = 0
     
-    for item in processed_items:
-        if item.item_id in applicable_discounts:
-            discount = applicable_discounts[item.item_id]
-            item.discount_amount = discount
+    for item, (offer_id, discount) in zip(processed_items, applicable_discounts):
+        if offer_id is not None:
+            item.applied_offer_id = offer_id
+            item.discount_amount = Cents(discount)
             total_discount += discount
     
     # Create the order
     order = Order(
         items=processed_items,
-        total_amount=total_amount,
-        discount_amount=total_discount,
-        final_amount=total_amount - total_discount
+        total_amount=Cents(total_amount),
+        discount_amount=Cents(total_discount),
+        final_amount=Cents(total_amount - total_discount)
     )
-    
-    # Update inventory
-    if len(errors) == 0:
-        for item in processed_items:
-            db_item = db.items[item.item_id]
-            db_item.stock -= item.quantity
-            logger.info(f"Updated stock for {db_item.name}: new stock = {db_item.stock}")
-    
-    return order, errors 
\ No newline at end of file
+
+    return order, errors
+
+def quote_order(order_items: List[OrderItem]) -> Tuple[Order, List[str]]:
+    """
+    Price an order exactly as process_order would, without taking stock or saving it.
+    Uses the columnar pricing path when NumPy is installed.
+    Returns the quoted order and a list of error messages if any.
+    """
+    db_items = db.get_items(item.item_id for item in order_items)
+    return price_order(order_items, db_items, pricing_engine.rules(), columnar=True)
+
+@timed("process_order")
+def process_order(order_items: List[OrderItem]) -> Tuple[Order, List[str]]:
+    """
+    Process an order, applying offers and calculating totals, then place it,
+    taking stock and saving it to the database.
+    Returns the processed order and a list of error messages if any.
+    """
+    db_items = db.get_items(item.item_id for item in order_items)
+    order, errors = price_order(order_items, db_items, pricing_engine.rules())
+    if not errors:
+        # Take stock for every line and save the order in one step;
+        # another order may have won the race since validation
+        errors = db.place_order(order)
+    if errors:
+        order = None
+    else:
+        publish_stock(item.item_id for item in order.items)
+
+    _record_outcome(order, errors, db_items)
+    return order, errors
+
+@timed("process_orders")
+def process_orders(carts: List[List[OrderItem]]) -> List[Tuple[Order, List[str]]]:
+    """
+    Process and place a batch of orders.
+    Items and offer rules are fetched once for the whole batch, and each
+    order then succeeds or fails on its own, in the order given.
+    Returns the processed order and a list of error messages for each cart.
+    """
+    item_ids = {item.item_id for order_items in carts for item in order_items}
+    db_items = db.get_items(item_ids)
+    rules = pricing_engine.rules()
+
+    results = [price_order(order_items, db_items, rules) for order_items in carts]
+    priced = [order for order, errors in results if not errors]
+    placement_errors = iter(db.place_orders(priced))
+
+    processed = []
+    for order, errors in results:
+        if not errors:
+            errors = next(placement_errors)
+            if errors:
+                order = None
+        _record_outcome(order, errors, db_items)
+        processed.append((order, errors))
+    # One stock change per item, however many of the orders took it
+    publish_stock({item.item_id for order, _ in processed if order is not None for item in order.items})
+    return processed
@@ -0,0 +1,5 @@
+from app.storage.base import Storage
+from app.storage.memory import MemoryStorage
+from app.storage.sqlite import SQLiteStorage
+
+__all__ = ["Storage", "MemoryStorage", "SQLiteStorage"]
@@ -0,0 +1,475 @@
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.models import Cents, Order, OrderItem, construct_model
+from app.storage.records import CompactOrders, encode_id, from_epoch_us, order_to_row, page_tiers, to_epoch_us
+from datetime import datetime
+import bisect
+import heapq
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Order record: order ID, created_at (epoch microseconds), total, discount and
+# final amount in cents, then the position and number of its line records
+_ORDER = struct.Struct("<16s6q")
+# Line record: item ID, offer ID (all zero for none), quantity, and unit price
+# and discount in cents
+_LINE = struct.Struct("<16s16s3q")
+# Index entry: order ID and record number, big-endian so entries sort as bytes
+_ENTRY = struct.Struct(">16sq")
+_ID = struct.Struct(">16s")
+_CREATED = struct.Struct("<q")
+_NO_ID = bytes(16)
+
+_ORDERS_FILE = "orders.dat"
+_LINES_FILE = "lines.dat"
+_RUN_FILE = re.compile(r"ids-(\d+)-(\d+)\.idx")
+
+def _pack_id(value: str) -> Optional[bytes]:
+    # Only UUIDs fit a fixed-size record; the nil UUID is reserved for "no offer"
+    key = encode_id(value)
+    if not isinstance(key, int) or key == 0:
+        return None
+    return key.to_bytes(16, "big")
+
+def _unpack_id(packed: bytes) -> str:
+    return str(uuid.UUID(bytes=packed))
+
+def _map(file) -> bytes:
+    # Empty files cannot be mapped
+    if os.fstat(file.fileno()).st_size == 0:
+        return b""
+    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+class _Field:
+    """
+    Read-only sequence over one field of fixed-size records, so bisect can search a mapped file.
+    """
+    __slots__ = ("_buffer", "_size", "_offset", "_field", "_length")
+
+    def __init__(self, buffer, size: int, offset: int, field: struct.Struct, length: int):
+        self._buffer = buffer
+        self._size = size
+        self._offset = offset
+        self._field = field
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int):
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return self._field.unpack_from(self._buffer, index * self._size + self._offset)[0]
+
+class _Run:
+    """
+    A sorted ID index over the order records in [start, end).
+    """
+    __slots__ = ("start", "end", "path", "buffer", "ids")
+
+    def __init__(self, start: int, end: int, path: str):
+        self.start = start
+        self.end = end
+        self.path = path
+        with open(path, "rb") as file:
+            self.buffer = _map(file)
+        self.ids = _Field(self.buffer, _ENTRY.size, 0, _ID, end - start)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def find(self, packed: bytes) -> Optional[int]:
+        position = bisect.bisect_left(self.ids, packed)
+        if position < len(self.ids) and self.ids[position] == packed:
+            return _ENTRY.unpack_from(self.buffer, position * _ENTRY.size)[1]
+        return None
+
+    def entries(self) -> Iterator[bytes]:
+        for offset in range(0, len(self) * _ENTRY.size, _ENTRY.size):
+            yield self.buffer[offset:offset + _ENTRY.size]
+
+class ArchiveView:
+    """
+    An immutable view of the archive, safe to read while new orders are appended.
+    """
+    __slots__ = ("count", "line_count", "orders", "lines", "runs", "created")
+
+    def __init__(self, count: int, line_count: int, orders, lines, runs: Tuple[_Run, ...]):
+        self.count = count
+        self.line_count = line_count
+        self.orders = orders
+        self.lines = lines
+        self.runs = runs
+        self.created = _Field(orders, _ORDER.size, 16, _CREATED, count)
+
+    def find(self, order_id: str) -> Optional[int]:
+        packed = _pack_id(order_id)
+        if packed is None:
+            return None
+        # Newer runs are smaller, so check them first
+        for run in reversed(self.runs):
+            position = run.find(packed)
+            if position is not None:
+                return position
+        return None
+
+    def get(self, order_id: str) -> Optional[Order]:
+        position = self.find(order_id)
+        return self.order_at(position) if position is not None else None
+
+    def last_created(self) -> Optional[int]:
+        return self.created[self.count - 1] if self.count else None
+
+    # Tier interface used by page_tiers
+
+    def locate(self, timestamp: int, order_id: str) -> Optional[int]:
+        position = self.find(order_id)
+        if position is not None and self.created[position] == timestamp:
+            return position
+        return None
+
+    def id_at(self, position: int) -> str:
+        return _unpack_id(_ID.unpack_from(self.orders, position * _ORDER.size)[0])
+
+    def order_at(self, position: int, with_items: bool = True) -> Order:
+        packed, created, total, discount, final, first_line, line_count = _ORDER.unpack_from(self.orders, position * _ORDER.size)
+        items = []
+        for line in range(first_line, first_line + line_count if with_items else first_line):
+            item_id, offer_id, quantity, unit_price, line_discount = _LINE.unpack_from(self.lines, line * _LINE.size)
+            items.append(construct_model(OrderItem, {
+                "item_id": _unpack_id(item_id),
+                "quantity": quantity,
+                "unit_price": Cents(unit_price),
+                "applied_offer_id": _unpack_id(offer_id) if offer_id != _NO_ID else None,
+                "discount_amount": Cents(line_discount)
+            }))
+        return construct_model(Order, {
+            "id": _unpack_id(packed),
+            "items": items,
+            "total_amount": Cents(total),
+            "discount_amount": Cents(discount),
+            "final_amount": Cents(final),
+            "created_at": from_epoch_us(created)
+        })
+
+class OrderArchive:
+    """
+    Archived orders in append-only files of fixed-size records, read through mmap.
+    Orders are appended in creation order, so the created_at field is sorted and
+    searched in place. Order IDs are found through sorted index runs, one per
+    appended batch; equal-sized neighbouring runs are merged, so there are only
+    ever a logarithmic number of runs to check.
+    Callers serialize writes; readers use `view()` and need no lock.
+    """
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._orders_file = open(os.path.join(path, _ORDERS_FILE), "a+b")
+        self._lines_file = open(os.path.join(path, _LINES_FILE), "a+b")
+        self._view = ArchiveView(0, 0, b"", b"", ())
+        self._load(os.fstat(self._orders_file.fileno()).st_size // _ORDER.size)
+
+    def __len__(self) -> int:
+        return self._view.count
+
+    def __iter__(self) -> Iterator[Order]:
+        view = self._view
+        for position in range(view.count):
+            yield view.order_at(position)
+
+    def view(self) -> ArchiveView:
+        return self._view
+
+    def get(self, order_id: str) -> Optional[Order]:
+        return self._view.get(order_id)
+
+    def accepts(self, order: Order) -> bool:
+        """
+        Check whether an order's IDs fit the fixed-size records.
+        """
+        if _pack_id(order.id) is None:
+            return False
+        return all(
+            _pack_id(line.item_id) is not None
+            and (line.applied_offer_id is None or _pack_id(line.applied_offer_id) is not None)
+            for line in order.items
+        )
+
+    def truncate(self, count: int):
+        """
+        Drop every archived order after the first `count`.
+        Shrinks mapped files, so only call this while nothing reads the archive.
+        """
+        self._load(min(count, len(self)))
+
+    def _load(self, count: int):
+        # Drop a torn tail: orders whose line records were not fully written
+        line_records = os.fstat(self._lines_file.fileno()).st_size // _LINE.size
+        count = min(count, os.fstat(self._orders_file.fileno()).st_size // _ORDER.size)
+        orders = _map(self._orders_file)
+        line_count = 0
+        while count:
+            first_line, lines = struct.unpack_from("<2q", orders, count * _ORDER.size - 16)
+            if first_line + lines <= line_records:
+                line_count = first_line + lines
+                break
+            count -= 1
+        self._orders_file.truncate(count * _ORDER.size)
+        self._lines_file.truncate(line_count * _LINE.size)
+
+        # Use the runs that cover the records from the start; anything else is
+        # left over from an interrupted merge or a truncation
+        runs = {}
+        for name in os.listdir(self.path):
+            match = _RUN_FILE.fullmatch(name)
+            if match:
+                runs[(int(match.group(1)), int(match.group(2)))] = os.path.join(self.path, name)
+        chain = []
+        position = 0
+        while True:
+            ends = [end for start, end in runs if start == position and position < end <= count]
+            if not ends:
+                break
+            end = max(ends)
+            chain.append((position, end))
+            position = end
+        for key, path in runs.items():
+            if key not in chain:
+                os.remove(path)
+
+        runs = tuple(_Run(start, end, runs[(start, end)]) for start, end in chain)
+        obsolete = []
+        if position < count:
+            # Index the records no run covers
+            entries = sorted(_ENTRY.pack(_ID.unpack_from(orders, record * _ORDER.size)[0], record) for record in range(position, count))
+            runs, obsolete = self._with_run(runs, position, count, entries, [])
+        self._view = ArchiveView(count, line_count, _map(self._orders_file), _map(self._lines_file), runs)
+        for run in obsolete:
+            os.remove(run.path)
+        if count:
+            logger.info("Opened order archive at %s with %s order(s)", self.path, count)
+
+    def append(self, orders: List[Order]):
+        """
+        Append orders, which must be accepted, sorted by creation time and no
+        older than the newest archived order. The records and their index are
+        synced to disk before they become visible.
+        """
+        self.publish(self.stage(orders))
+
+    def stage(self, orders: List[Order]) -> Tuple[ArchiveView, List[_Run]]:
+        """
+        Write orders as for `append`, without making them visible yet: returns
+        the view that holds them, and the index runs it replaces, for `publish`.
+        Readers of the current view are unaffected, so this needs no lock
+        other than one append being staged at a time.
+        """
+        view = self._view
+        if not orders:
+            return view, []
+        line_position = view.line_count
+        order_records = bytearray()
+        line_records = bytearray()
+        entries = []
+        for record, order in enumerate(orders, start=view.count):
+            packed = _pack_id(order.id)
+            for line in order.items:
+                line_records += _LINE.pack(
+                    _pack_id(line.item_id),
+                    _pack_id(line.applied_offer_id) if line.applied_offer_id is not None else _NO_ID,
+                    line.quantity,
+                    line.unit_price,
+                    line.discount_amount
+                )
+            order_records += _ORDER.pack(
+                packed,
+                to_epoch_us(order.created_at),
+                order.total_amount,
+                order.discount_amount,
+                order.final_amount,
+                line_position,
+                len(order.items)
+            )
+            line_position += len(order.items)
+            entries.append(_ENTRY.pack(packed, record))
+        entries.sort()
+
+        count = view.count + len(orders)
+        written = []
+        try:
+            # Lines first, so an order record never points past the end of the lines file
+            for file, data in ((self._lines_file, line_records), (self._orders_file, order_records)):
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            runs, obsolete = self._with_run(view.runs, view.count, count, entries, written)
+        except BaseException:
+            # Put the files back as they were so the next append lines up;
+            # only the unmapped tail is cut, so readers are unaffected
+            self._lines_file.truncate(view.line_count * _LINE.size)
+            self._orders_file.truncate(view.count * _ORDER.size)
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        return ArchiveView(count, line_position, _map(self._orders_file), _map(self._lines_file), runs), obsolete
+
+    def publish(self, staged: Tuple[ArchiveView, List[_Run]]):
+        """
+        Make orders written by `stage` visible.
+        """
+        self._view, obsolete = staged
+        # Readers of older views keep their mappings; only the files go
+        for run in obsolete:
+            os.remove(run.path)
+
+    def _with_run(
+        self,
+        runs: Tuple[_Run, ...],
+        start: int,
+        end: int,
+        entries: Iterable[bytes],
+        written: List[str]
+    ) -> Tuple[Tuple[_Run, ...], List[_Run]]:
+        """
+        Add an index run for the records in [start, end), merging while the
+        previous run is no larger than the newest one.
+        Returns the new runs and the runs they replace.
+        """
+        runs = list(runs)
+        runs.append(self._write_run(start, end, entries, written))
+        obsolete = []
+        while len(runs) >= 2 and len(runs[-2]) <= len(runs[-1]):
+            newer = runs.pop()
+            older = runs.pop()
+            runs.append(self._write_run(older.start, newer.end, heapq.merge(older.entries(), newer.entries()), written))
+            obsolete.extend((older, newer))
+        return tuple(runs), obsolete
+
+    def _write_run(self, start: int, end: int, entries: Iterable[bytes], written: List[str]) -> _Run:
+        path = os.path.join(self.path, f"ids-{start:012d}-{end:012d}.idx")
+        written.append(path)
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            file.writelines(entries)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+        return _Run(start, end, path)
+
+class TieredOrders:
+    """
+    Orders split between a hot in-memory tier of recent orders and an archive.
+    When the hot tier grows `batch` orders past `hot_orders`, its oldest orders
+    are moved to the archive by a background thread, so the write that crosses
+    the threshold does not wait for the archive to be written. Orders the
+    archive cannot hold, or that are older than its newest order, stay hot.
+    Callers serialize writes by holding `lock`; moving orders only holds it
+    to pick them and, once they are on disk, to swap them over, so they can
+    be read from one tier or the other throughout.
+    """
+    def __init__(
+        self,
+        archive: OrderArchive,
+        hot_orders: int = 100000,
+        batch: int = 10000,
+        lock: Optional[threading.Lock] = None
+    ):
+        self.hot = CompactOrders()
+        self.archive = archive
+        self.hot_orders = hot_orders
+        self.batch = max(batch, 1)
+        self.lock = lock if lock is not None else threading.Lock()
+        self._next_archive = hot_orders + self.batch
+        # Set while orders are being moved, with the lock held
+        self._archiving = False
+        self._archiver: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.hot) + len(self.archive)
+
+    def __iter__(self) -> Iterator[Order]:
+        yield from self.archive
+        yield from self.hot
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self.hot or self.archive.view().find(order_id) is not None
+
+    def get(self, order_id: str) -> Optional[Order]:
+        order = self.hot.get(order_id)
+        return order if order is not None else self.archive.get(order_id)
+
+    def add(self, order: Order):
+        self.add_row(order_to_row(order))
+
+    def add_row(self, row: list):
+        """
+        Add an order given as a row from order_to_row. Called with the lock held.
+        """
+        self.hot.add_row(row)
+        if len(self.hot) >= self._next_archive and not self._archiving:
+            self._archiving = True
+            self._archiver = threading.Thread(target=self._archive_in_background, name="order-archiver", daemon=True)
+            self._archiver.start()
+
+    def _archive_in_background(self):
+        try:
+            self.compact()
+        finally:
+            with self.lock:
+                self._archiving = False
+
+    def compact(self):
+        """
+        Move the oldest hot orders to the archive until `hot_orders` are left.
+        Takes the lock itself; only one call may run at a time.
+        """
+        with self.lock:
+            order_ids = self.hot.oldest_ids(len(self.hot) - self.hot_orders)
+        # Decoded without the lock: records never change once added, and only this thread removes them
+        newest = self.archive.view().last_created()
+        moved = []
+        for order_id in order_ids:
+            order = self.hot.get(order_id)
+            created = to_epoch_us(order.created_at)
+            if (newest is None or created >= newest) and self.archive.accepts(order):
+                moved.append(order)
+                newest = created
+        try:
+            staged = self.archive.stage(moved)
+        except OSError:
+            logger.exception("Could not archive %s order(s); keeping them in memory", len(moved))
+            with self.lock:
+                self._next_archive = len(self.hot) + self.batch
+            return
+        # The archive holds them before they leave the hot tier, so reads always find them
+        with self.lock:
+            self.archive.publish(staged)
+            self.hot.discard(order.id for order in moved)
+            self._next_archive = max(self.hot_orders, len(self.hot)) + self.batch
+            hot, archived = len(self.hot), len(self.archive)
+        logger.info("Archived %s order(s): %s hot, %s archived", len(moved), hot, archived)
+
+    def wait(self):
+        """
+        Wait for orders being moved to the archive.
+        """
+        archiver = self._archiver
+        if archiver is not None:
+            archiver.join()
+
+    def page(
+        self,
+        after: Optional[Tuple[int, str]] = None,
+        limit: int = 100,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        with_items: bool = True
+    ) -> Tuple[List[Order], Optional[Tuple[int, str]]]:
+        return page_tiers([self.archive.view(), self.hot], after, limit, created_from, created_to, with_items)
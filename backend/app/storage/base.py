@@ -0,0 +1,378 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.models import Item, Offer, Order
+from datetime import datetime
+import base64
+import binascii
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+def encode_cursor(key: list) -> str:
+    """
+    Encode a storage-specific position as an opaque pagination cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Decode a cursor made by encode_cursor. Raises ValueError if it is malformed.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(key, list):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return key
+
+class Storage(ABC):
+    """
+    Interface the routers and services use to read and write items, offers and orders.
+    Objects returned by a storage are snapshots; changes go through its methods.
+    """
+
+    def initialize(self):
+        """
+        Prepare the storage for use, seeding sample data into an empty store.
+        """
+        if self.is_empty():
+            self._initialize_sample_data()
+
+    def close(self):
+        """
+        Flush pending writes and release resources before shutdown.
+        """
+
+    @abstractmethod
+    def is_empty(self) -> bool:
+        """
+        Check whether the store holds no items, offers or orders.
+        """
+
+    @abstractmethod
+    def version(self, collection: str) -> int:
+        """
+        Get a counter for "items" or "offers" that changes whenever a record in
+        that collection changes, including stock taken by orders.
+        Used to tell whether cached responses are stale.
+        """
+
+    # Items
+
+    @abstractmethod
+    def get_item(self, item_id: str) -> Optional[Item]:
+        """
+        Get an item by ID, or None if it does not exist.
+        """
+
+    @abstractmethod
+    def get_items(self, item_ids: Iterable[str]) -> Dict[str, Item]:
+        """
+        Get the existing items among the given IDs, keyed by item ID.
+        """
+
+    @abstractmethod
+    def list_items(self) -> List[Item]:
+        """
+        Get all items in insertion order.
+        """
+
+    @abstractmethod
+    def page_items(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: bool = False
+    ) -> Tuple[List[Item], Optional[str]]:
+        """
+        Get a page of items in insertion order, starting after the given cursor.
+        Price bounds are in cents.
+        Returns the page and the cursor of the next page, or None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
+
+    def iter_items(self, batch_size: int = 1000) -> Iterator[Item]:
+        """
+        Iterate over all items in insertion order, fetching them a page at a time.
+        """
+        cursor = None
+        while True:
+            items, cursor = self.page_items(cursor=cursor, limit=batch_size)
+            yield from items
+            if cursor is None:
+                return
+
+    @abstractmethod
+    def missing_items(self, item_ids: Iterable[str]) -> List[str]:
+        """
+        Get the IDs among the given ones that do not belong to any item.
+        """
+
+    @abstractmethod
+    def add_item(self, item: Item):
+        """
+        Store a new item.
+        """
+
+    @abstractmethod
+    def update_item(self, item_id: str, update_data: Dict) -> Optional[Item]:
+        """
+        Apply a partial update to an item, returning the updated item or None if it does not exist.
+        """
+
+    @abstractmethod
+    def delete_item(self, item_id: str) -> Optional[Item]:
+        """
+        Remove an item, returning it or None if it does not exist.
+        """
+
+    def add_items(self, items: List[Item]):
+        """
+        Store several new items, updating indexes once for the batch.
+        """
+        for item in items:
+            self.add_item(item)
+
+    def update_items(self, updates: Dict[str, Dict]) -> Dict[str, Item]:
+        """
+        Apply partial updates keyed by item ID, updating indexes once for the batch.
+        Returns the updated items; IDs that do not exist are left out.
+        """
+        updated = {}
+        for item_id, update_data in updates.items():
+            item = self.update_item(item_id, update_data)
+            if item is not None:
+                updated[item_id] = item
+        return updated
+
+    def delete_items(self, item_ids: Iterable[str]) -> Dict[str, Item]:
+        """
+        Remove several items, updating indexes once for the batch.
+        Returns the removed items; IDs that do not exist are left out.
+        """
+        deleted = {}
+        for item_id in item_ids:
+            item = self.delete_item(item_id)
+            if item is not None:
+                deleted[item_id] = item
+        return deleted
+
+    # Offers
+
+    @abstractmethod
+    def get_offer(self, offer_id: str) -> Optional[Offer]:
+        """
+        Get an offer by ID, or None if it does not exist.
+        """
+
+    @abstractmethod
+    def get_offers(self, offer_ids: Iterable[str]) -> Dict[str, Offer]:
+        """
+        Get the existing offers among the given IDs, keyed by offer ID.
+        """
+
+    @abstractmethod
+    def list_offers(self) -> List[Offer]:
+        """
+        Get all offers in insertion order, including inactive and scheduled ones.
+        """
+
+    @abstractmethod
+    def add_offer(self, offer: Offer):
+        """
+        Store a new offer.
+        """
+
+    @abstractmethod
+    def update_offer(self, offer_id: str, update_data: Dict) -> Optional[Offer]:
+        """
+        Apply a partial update to an offer, returning the updated offer or None if it does not exist.
+        """
+
+    @abstractmethod
+    def delete_offer(self, offer_id: str) -> Optional[Offer]:
+        """
+        Remove an offer, returning it or None if it does not exist.
+        """
+
+    def add_offers(self, offers: List[Offer]):
+        """
+        Store several new offers, updating indexes once for the batch.
+        """
+        for offer in offers:
+            self.add_offer(offer)
+
+    def update_offers(self, updates: Dict[str, Dict]) -> Dict[str, Offer]:
+        """
+        Apply partial updates keyed by offer ID, updating indexes once for the batch.
+        Returns the updated offers; IDs that do not exist are left out.
+        """
+        updated = {}
+        for offer_id, update_data in updates.items():
+            offer = self.update_offer(offer_id, update_data)
+            if offer is not None:
+                updated[offer_id] = offer
+        return updated
+
+    def delete_offers(self, offer_ids: Iterable[str]) -> Dict[str, Offer]:
+        """
+        Remove several offers, updating indexes once for the batch.
+        Returns the removed offers; IDs that do not exist are left out.
+        """
+        deleted = {}
+        for offer_id in offer_ids:
+            offer = self.delete_offer(offer_id)
+            if offer is not None:
+                deleted[offer_id] = offer
+        return deleted
+
+    @abstractmethod
+    def active_offers(self, now: Optional[datetime] = None) -> Dict[str, Offer]:
+        """
+        Get the offers that are active and within their validity period,
+        keyed by offer ID.
+        """
+
+    @abstractmethod
+    def offers_active_at(self, when: datetime) -> List[Offer]:
+        """
+        Get the offers that would be active at an arbitrary time.
+        """
+
+    @abstractmethod
+    def active_offers_for_items(self, item_ids: Iterable[str], now: Optional[datetime] = None) -> Dict[str, List[Offer]]:
+        """
+        Get the currently active offers applicable to each of the given items.
+        Items without an applicable offer are left out.
+        """
+
+    # Orders
+
+    @abstractmethod
+    def get_order(self, order_id: str) -> Optional[Order]:
+        """
+        Get an order by ID, or None if it does not exist.
+        """
+
+    @abstractmethod
+    def list_orders(self) -> List[Order]:
+        """
+        Get all orders in the order they were placed.
+        """
+
+    @abstractmethod
+    def page_orders(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        with_items: bool = True
+    ) -> Tuple[List[Order], Optional[str]]:
+        """
+        Get a page of orders by creation time, starting after the given cursor.
+        Returns the page and the cursor of the next page, or None on the last page.
+        Without `with_items`, orders come back with no lines, which is cheaper
+        when only their totals are needed.
+        Raises ValueError for a malformed cursor.
+        """
+
+    def iter_orders(self, since: Optional[datetime] = None, batch_size: int = 1000) -> Iterator[Order]:
+        """
+        Iterate over orders created at or after `since` by creation time,
+        fetching them a page at a time.
+        """
+        cursor = None
+        while True:
+            orders, cursor = self.page_orders(cursor=cursor, limit=batch_size, created_from=since)
+            yield from orders
+            if cursor is None:
+                return
+
+    @abstractmethod
+    def place_order(self, order: Order) -> List[str]:
+        """
+        Take stock for every line of the order and store it, all in one transaction.
+        Either the whole order is committed or nothing is; returns error messages if any.
+        """
+
+    def place_orders(self, orders: List[Order]) -> List[List[str]]:
+        """
+        Place several orders in the given sequence, each one all-or-nothing.
+        Returns the error messages for each order; an empty list means it was placed.
+        """
+        return [self.place_order(order) for order in orders]
+
+    def _initialize_sample_data(self):
+        # Sample items
+        sample_items = [
+            Item(
+                name="Laptop",
+                description="High-performance laptop",
+                price=999.99,
+                stock=15,
+                category="Electronics"
+            ),
+            Item(
+                name="Smartphone",
+                description="Latest smartphone model",
+                price=699.99,
+                stock=20,
+                category="Electronics"
+            ),
+            Item(
+                name="Headphones",
+                description="Noise-cancelling headphones",
+                price=149.99,
+                stock=30,
+                category="Electronics"
+            ),
+            Item(
+                name="Coffee Maker",
+                description="Automatic coffee maker",
+                price=79.99,
+                stock=10,
+                category="Kitchen"
+            ),
+            Item(
+                name="Blender",
+                description="High-speed blender",
+                price=49.99,
+                stock=25,
+                category="Kitchen"
+            )
+        ]
+
+        for item in sample_items:
+            self.add_item(item)
+            logger.info("Added sample item: %s with ID: %s", item.name, item.id)
+
+        # Sample offers
+        sample_offers = [
+            Offer(
+                name="Electronics Sale",
+                description="20% off all electronics",
+                offer_type="percentage",
+                discount_value=20.0,
+                applicable_items=[item.id for item in sample_items if item.category == "Electronics"],
+                is_active=True
+            ),
+            Offer(
+                name="Kitchen Special",
+                description="Buy one kitchen item, get $10 off",
+                offer_type="fixed",
+                discount_value=10.0,
+                min_quantity=1,
+                applicable_items=[item.id for item in sample_items if item.category == "Kitchen"],
+                is_active=True
+            )
+        ]
+
+        for offer in sample_offers:
+            self.add_offer(offer)
+            logger.info("Added sample offer: %s with ID: %s", offer.name, offer.id)
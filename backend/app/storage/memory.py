@@ -0,0 +1,715 @@
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+from app.models import Item, Offer, Order
+from app.storage.base import Storage, decode_cursor, encode_cursor
+from app.storage.archive import OrderArchive, TieredOrders
+from app.storage.records import CompactOrders, order_to_row
+from app.storage.schedule import OfferSchedule
+from app.storage.wal import WriteAheadLog
+from datetime import datetime
+import bisect
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Keys read from an index at a time when paging items
+_SCAN_CHUNK = 1024
+
+# In-memory database
+class MemoryStorage(Storage):
+    def __init__(
+        self,
+        order_archive: Optional[str] = None,
+        hot_orders: int = 100000,
+        archive_batch: int = 10000,
+        wal: Optional[WriteAheadLog] = None,
+        snapshot_every: int = 100000
+    ):
+        """
+        With `order_archive` set to a directory, only the newest `hot_orders`
+        orders stay in memory and older ones are moved there in batches of
+        `archive_batch`.
+        With a write-ahead log, every change is logged and the state is
+        recovered from it on startup. A snapshot is taken in the background
+        every `snapshot_every` log records.
+        """
+        self.items: Dict[str, Item] = {}
+        self.offers: Dict[str, Offer] = {}
+        # Guards the item and order indexes
+        self._index_lock = threading.Lock()
+        # Orders are packed into compact records; models are built on read
+        self.orders = CompactOrders()
+        if order_archive is not None:
+            self.orders = TieredOrders(OrderArchive(order_archive), hot_orders, archive_batch, self._index_lock)
+        # Inverted index: item ID -> IDs of offers listing that item.
+        # Entries are replaced rather than mutated so readers never see a set change size.
+        self.offers_by_item: Dict[str, FrozenSet[str]] = {}
+        # Start/end boundaries of offers and the currently live set
+        self.schedule = OfferSchedule()
+        # Per-item locks guarding stock; always acquired in sorted item ID order
+        self._item_locks: Dict[str, threading.Lock] = {}
+        self._item_locks_guard = threading.Lock()
+        # Secondary indexes for item pagination, keyed by an insertion sequence number.
+        # Orders keep their own creation-time index.
+        self._item_seqs = itertools.count()
+        self._item_seq: Dict[str, int] = {}
+        self._item_ids_by_seq: Dict[int, str] = {}
+        self._item_keys: List[int] = []
+        self._item_keys_by_category: Dict[str, List[int]] = {}
+        # (price, seq) pairs sorted by price, and the keys of items in stock,
+        # so price and stock filters can seek instead of checking every item
+        self._item_prices: List[Tuple[int, int]] = []
+        self._item_keys_in_stock: List[int] = []
+        # Collection versions; values come from one counter so they never repeat
+        self._version_counter = itertools.count(1)
+        self._versions: Dict[str, int] = {"items": 0, "offers": 0}
+        # LSN of the last logged change to each item, so replay can skip
+        # stock changes a snapshot already holds
+        self._wal: Optional[WriteAheadLog] = None
+        self._item_lsns: Dict[str, int] = {}
+        self._snapshot_every = snapshot_every
+        self._snapshot_lsn = 0
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._snapshot_guard = threading.Lock()
+        if wal is not None:
+            self._recover(wal)
+        elif isinstance(self.orders, TieredOrders):
+            # Nothing else in memory survives a restart, so neither do archived orders
+            self.orders.archive.truncate(0)
+
+    def is_empty(self) -> bool:
+        return not (self.items or self.offers or self.orders)
+
+    def version(self, collection: str) -> int:
+        return self._versions[collection]
+
+    def _bump(self, collection: str):
+        # Called after a change is applied, so a reader that sees the new
+        # version also sees the new data
+        self._versions[collection] = next(self._version_counter)
+
+    def item_lock(self, item_id: str) -> threading.Lock:
+        """
+        Get the lock guarding an item's stock.
+        """
+        lock = self._item_locks.get(item_id)
+        if lock is None:
+            with self._item_locks_guard:
+                lock = self._item_locks.setdefault(item_id, threading.Lock())
+        return lock
+
+    def reserve_stock(self, quantities: Dict[str, int], on_reserved: Optional[Callable[[], None]] = None) -> List[str]:
+        """
+        Atomically take stock for every item in the mapping of item ID to quantity.
+        Either every item is decremented or none is; returns error messages if any.
+        `on_reserved` is called once the stock is taken, while it is still locked.
+        """
+        item_ids = sorted(quantities)
+        locks = [self.item_lock(item_id) for item_id in item_ids]
+        for lock in locks:
+            lock.acquire()
+        try:
+            errors = []
+            sold_out = []
+            for item_id in item_ids:
+                db_item = self.items.get(item_id)
+                if db_item is None:
+                    errors.append(f"Item with ID {item_id} not found")
+                elif db_item.stock < quantities[item_id]:
+                    errors.append(f"Not enough stock for item {db_item.name}. Available: {db_item.stock}, Requested: {quantities[item_id]}")
+            if errors:
+                return errors
+
+            for item_id in item_ids:
+                db_item = self.items[item_id]
+                db_item.stock -= quantities[item_id]
+                logger.debug("Updated stock for %s: new stock = %s", db_item.name, db_item.stock)
+                if db_item.stock <= 0 < db_item.stock + quantities[item_id]:
+                    sold_out.append(item_id)
+            if sold_out:
+                with self._index_lock:
+                    for item_id in sold_out:
+                        self._index_stock(self._item_seq[item_id], False)
+            if on_reserved is not None:
+                on_reserved()
+            self._bump("items")
+            return errors
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    # Items
+
+    def get_item(self, item_id: str) -> Optional[Item]:
+        return self.items.get(item_id)
+
+    def get_items(self, item_ids: Iterable[str]) -> Dict[str, Item]:
+        items = {}
+        for item_id in item_ids:
+            item = self.items.get(item_id)
+            if item is not None:
+                items[item_id] = item
+        return items
+
+    def list_items(self) -> List[Item]:
+        return list(self.items.values())
+
+    def page_items(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: bool = False
+    ) -> Tuple[List[Item], Optional[str]]:
+        after = -1
+        if cursor is not None:
+            key = decode_cursor(cursor)
+            if len(key) != 1 or not isinstance(key[0], int):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            after = key[0]
+
+        # Walk the shortest key list a filter allows; the other filters are checked per item
+        keys = self._item_keys
+        if category is not None:
+            keys = min(keys, self._item_keys_by_category.get(category, []), key=len)
+        if in_stock:
+            keys = min(keys, self._item_keys_in_stock, key=len)
+        if min_price is not None or max_price is not None:
+            prices = self._item_prices
+            low = 0 if min_price is None else bisect.bisect_left(prices, (min_price,))
+            high = len(prices) if max_price is None else bisect.bisect_left(prices, (max_price + 1,))
+            if high - low < len(keys):
+                # The price range is the most selective filter; put its keys in cursor order
+                keys = sorted(seq for _, seq in prices[low:high] if seq > after)
+
+        page = []
+        last_seq = None
+        visited = after
+        while True:
+            # Lists can change underneath us, so seek past the last key seen for each slice
+            position = bisect.bisect_right(keys, visited)
+            chunk = keys[position:position + _SCAN_CHUNK]
+            if not chunk:
+                return page, None
+            for seq in chunk:
+                visited = seq
+                item = self.items.get(self._item_ids_by_seq.get(seq))
+                if item is None:
+                    continue
+                if category is not None and item.category != category:
+                    continue
+                if min_price is not None and item.price < min_price:
+                    continue
+                if max_price is not None and item.price > max_price:
+                    continue
+                if in_stock and item.stock <= 0:
+                    continue
+                if len(page) == limit:
+                    return page, encode_cursor([last_seq])
+                page.append(item)
+                last_seq = seq
+
+    def missing_items(self, item_ids: Iterable[str]) -> List[str]:
+        return [item_id for item_id in item_ids if item_id not in self.items]
+
+    def add_item(self, item: Item):
+        with self._index_lock:
+            seq = next(self._item_seqs)
+            self._item_seq[item.id] = seq
+            self._item_ids_by_seq[seq] = item.id
+            self._item_keys.append(seq)
+            self._item_keys_by_category.setdefault(item.category, []).append(seq)
+            self._index_price(seq, None, item.price)
+            self._index_stock(seq, item.stock > 0)
+            self.items[item.id] = item
+            self._log_items([item])
+        self._bump("items")
+
+    def update_item(self, item_id: str, update_data: Dict) -> Optional[Item]:
+        with self.item_lock(item_id):
+            item = self.items.get(item_id)
+            if item is None:
+                return None
+            old_category, old_price, was_in_stock = item.category, item.price, item.stock > 0
+            for key, value in update_data.items():
+                setattr(item, key, value)
+            if (item.category, item.price, item.stock > 0) != (old_category, old_price, was_in_stock):
+                with self._index_lock:
+                    seq = self._item_seq[item_id]
+                    if item.category != old_category:
+                        self._remove_key(self._item_keys_by_category, old_category, seq)
+                        bisect.insort(self._item_keys_by_category.setdefault(item.category, []), seq)
+                    self._index_price(seq, old_price, item.price)
+                    self._index_stock(seq, item.stock > 0)
+            self._log_items([item])
+        self._bump("items")
+        return item
+
+    def delete_item(self, item_id: str) -> Optional[Item]:
+        with self.item_lock(item_id):
+            item = self.items.pop(item_id, None)
+            if item is None:
+                return None
+            with self._index_lock:
+                seq = self._item_seq.pop(item_id)
+                del self._item_ids_by_seq[seq]
+                del self._item_keys[bisect.bisect_left(self._item_keys, seq)]
+                self._remove_key(self._item_keys_by_category, item.category, seq)
+                self._index_price(seq, item.price, None)
+                self._index_stock(seq, False)
+            self._log_item_deletes([item_id])
+        self._bump("items")
+        return item
+
+    def add_items(self, items: List[Item]):
+        with self._index_lock:
+            for item in items:
+                seq = next(self._item_seqs)
+                self._item_seq[item.id] = seq
+                self._item_ids_by_seq[seq] = item.id
+                self._item_keys.append(seq)
+                self._item_keys_by_category.setdefault(item.category, []).append(seq)
+                if item.stock > 0:
+                    self._item_keys_in_stock.append(seq)
+                self.items[item.id] = item
+            self._item_prices.extend((item.price, self._item_seq[item.id]) for item in items)
+            self._item_prices.sort()
+            self._log_items(items)
+        self._bump("items")
+
+    def update_items(self, updates: Dict[str, Dict]) -> Dict[str, Item]:
+        updated = {}
+        removed: Dict[str, Set[int]] = {}
+        added: Dict[str, List[int]] = {}
+        reindexed: Set[int] = set()
+        for item_id, update_data in updates.items():
+            with self.item_lock(item_id):
+                item = self.items.get(item_id)
+                if item is None:
+                    continue
+                old_category, old_price, was_in_stock = item.category, item.price, item.stock > 0
+                for key, value in update_data.items():
+                    setattr(item, key, value)
+                if item.category != old_category:
+                    seq = self._item_seq[item_id]
+                    removed.setdefault(old_category, set()).add(seq)
+                    added.setdefault(item.category, []).append(seq)
+                if item.price != old_price or (item.stock > 0) != was_in_stock:
+                    reindexed.add(self._item_seq[item_id])
+                # Logged under the item lock, in order with stock changes
+                self._log_items([item])
+            updated[item_id] = item
+
+        if removed or reindexed:
+            with self._index_lock:
+                self._rebuild_categories(removed, added)
+                self._reindex_items(reindexed)
+        if updated:
+            self._bump("items")
+        return updated
+
+    def delete_items(self, item_ids: Iterable[str]) -> Dict[str, Item]:
+        deleted = {}
+        removed: Dict[str, Set[int]] = {}
+        for item_id in item_ids:
+            with self.item_lock(item_id):
+                item = self.items.pop(item_id, None)
+                if item is not None:
+                    self._log_item_deletes([item_id])
+            if item is not None:
+                deleted[item_id] = item
+        if not deleted:
+            return deleted
+
+        with self._index_lock:
+            removed_seqs = set()
+            for item_id, item in deleted.items():
+                seq = self._item_seq.pop(item_id)
+                del self._item_ids_by_seq[seq]
+                removed_seqs.add(seq)
+                removed.setdefault(item.category, set()).add(seq)
+            # One pass over each index instead of one removal per item
+            self._item_keys = [seq for seq in self._item_keys if seq not in removed_seqs]
+            self._rebuild_categories(removed, {})
+            self._reindex_items(removed_seqs)
+        self._bump("items")
+        return deleted
+
+    @staticmethod
+    def _remove_key(index: Dict[str, List[int]], key: str, seq: int):
+        keys = index[key]
+        del keys[bisect.bisect_left(keys, seq)]
+        if not keys:
+            del index[key]
+
+    def _rebuild_categories(self, removed: Dict[str, Set[int]], added: Dict[str, List[int]]):
+        for category in set(removed) | set(added):
+            seqs = removed.get(category, ())
+            keys = [seq for seq in self._item_keys_by_category.get(category, ()) if seq not in seqs]
+            keys.extend(added.get(category, ()))
+            keys.sort()
+            if keys:
+                self._item_keys_by_category[category] = keys
+            else:
+                self._item_keys_by_category.pop(category, None)
+
+    # The price and stock helpers below are called with the index lock held.
+    # They index an item's current values and are idempotent, so a bulk
+    # update and a single-item change racing on one item leave it indexed once.
+
+    def _index_price(self, seq: int, old_price: Optional[int], new_price: Optional[int]):
+        prices = self._item_prices
+        if old_price is not None:
+            position = bisect.bisect_left(prices, (old_price, seq))
+            if position < len(prices) and prices[position] == (old_price, seq):
+                del prices[position]
+        if new_price is not None:
+            position = bisect.bisect_left(prices, (new_price, seq))
+            if position == len(prices) or prices[position] != (new_price, seq):
+                prices.insert(position, (new_price, seq))
+
+    def _index_stock(self, seq: int, in_stock: bool):
+        keys = self._item_keys_in_stock
+        position = bisect.bisect_left(keys, seq)
+        present = position < len(keys) and keys[position] == seq
+        if in_stock and not present:
+            keys.insert(position, seq)
+        elif not in_stock and present:
+            del keys[position]
+
+    def _reindex_items(self, seqs: Set[int]):
+        # One pass over each index; deleted items drop out
+        if not seqs:
+            return
+        items = {}
+        for seq in seqs:
+            item = self.items.get(self._item_ids_by_seq.get(seq))
+            if item is not None:
+                items[seq] = item
+        prices = [pair for pair in self._item_prices if pair[1] not in seqs]
+        prices.extend((item.price, seq) for seq, item in items.items())
+        prices.sort()
+        self._item_prices = prices
+        keys = [seq for seq in self._item_keys_in_stock if seq not in seqs]
+        keys.extend(seq for seq, item in items.items() if item.stock > 0)
+        keys.sort()
+        self._item_keys_in_stock = keys
+
+    # Offers
+
+    def get_offer(self, offer_id: str) -> Optional[Offer]:
+        return self.offers.get(offer_id)
+
+    def get_offers(self, offer_ids: Iterable[str]) -> Dict[str, Offer]:
+        return {offer_id: self.offers[offer_id] for offer_id in offer_ids if offer_id in self.offers}
+
+    def list_offers(self) -> List[Offer]:
+        return list(self.offers.values())
+
+    def add_offer(self, offer: Offer):
+        """
+        Store an offer and index it under each of its applicable items.
+        """
+        self.add_offers([offer])
+
+    def update_offer(self, offer_id: str, update_data: Dict) -> Optional[Offer]:
+        """
+        Apply a partial update to a stored offer, re-indexing it if its
+        applicable items changed and rescheduling it.
+        """
+        return self.update_offers({offer_id: update_data}).get(offer_id)
+
+    def delete_offer(self, offer_id: str) -> Optional[Offer]:
+        """
+        Remove an offer and drop it from the item index.
+        """
+        return self.delete_offers([offer_id]).get(offer_id)
+
+    def add_offers(self, offers: List[Offer]):
+        for offer in offers:
+            self.offers[offer.id] = offer
+        self._index_offers(offers)
+        self.schedule.add_many(offers)
+        self._log("offers", [offer.model_dump(mode="json") for offer in offers])
+        self._bump("offers")
+
+    def update_offers(self, updates: Dict[str, Dict]) -> Dict[str, Offer]:
+        updated = {offer_id: self.offers[offer_id] for offer_id in updates if offer_id in self.offers}
+        reindexed = [offer for offer_id, offer in updated.items() if "applicable_items" in updates[offer_id]]
+        self._unindex_offers(reindexed)
+        for offer_id, offer in updated.items():
+            for key, value in updates[offer_id].items():
+                setattr(offer, key, value)
+        self._index_offers(reindexed)
+        self.schedule.add_many(updated.values())
+        if updated:
+            self._log("offers", [offer.model_dump(mode="json") for offer in updated.values()])
+            self._bump("offers")
+        return updated
+
+    def delete_offers(self, offer_ids: Iterable[str]) -> Dict[str, Offer]:
+        deleted = {}
+        for offer_id in offer_ids:
+            offer = self.offers.pop(offer_id, None)
+            if offer is not None:
+                deleted[offer_id] = offer
+        self._unindex_offers(deleted.values())
+        self.schedule.remove_many(deleted)
+        if deleted:
+            self._log("delete_offers", list(deleted))
+            self._bump("offers")
+        return deleted
+
+    def active_offers(self, now: Optional[datetime] = None) -> Dict[str, Offer]:
+        return self.schedule.active(now)
+
+    def offers_active_at(self, when: datetime) -> List[Offer]:
+        return self.schedule.active_at(when)
+
+    def active_offers_for_items(self, item_ids: Iterable[str], now: Optional[datetime] = None) -> Dict[str, List[Offer]]:
+        active_offers = self.schedule.active(now)
+        offers_by_item = {}
+        for item_id in item_ids:
+            offers = [active_offers[offer_id] for offer_id in self.offers_by_item.get(item_id, ()) if offer_id in active_offers]
+            if offers:
+                offers_by_item[item_id] = offers
+        return offers_by_item
+
+    def _index_offers(self, offers: Iterable[Offer]):
+        # Group by item first so each posting set is replaced once per batch
+        added: Dict[str, Set[str]] = {}
+        for offer in offers:
+            for item_id in offer.applicable_items:
+                added.setdefault(item_id, set()).add(offer.id)
+        for item_id, offer_ids in added.items():
+            self.offers_by_item[item_id] = self.offers_by_item.get(item_id, frozenset()) | offer_ids
+
+    def _unindex_offers(self, offers: Iterable[Offer]):
+        removed: Dict[str, Set[str]] = {}
+        for offer in offers:
+            for item_id in offer.applicable_items:
+                removed.setdefault(item_id, set()).add(offer.id)
+        for item_id, offer_ids in removed.items():
+            remaining = self.offers_by_item.get(item_id, frozenset()) - offer_ids
+            if remaining:
+                self.offers_by_item[item_id] = remaining
+            else:
+                self.offers_by_item.pop(item_id, None)
+
+    # Orders
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        return self.orders.get(order_id)
+
+    def list_orders(self) -> List[Order]:
+        with self._index_lock:
+            return list(self.orders)
+
+    def page_orders(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        with_items: bool = True
+    ) -> Tuple[List[Order], Optional[str]]:
+        after = None
+        if cursor is not None:
+            key = decode_cursor(cursor)
+            if len(key) != 2 or not isinstance(key[0], int) or not isinstance(key[1], str):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            after = (key[0], key[1])
+        with self._index_lock:
+            page, last = self.orders.page(after, limit, created_from, created_to, with_items)
+        return page, encode_cursor(list(last)) if last is not None else None
+
+    def place_order(self, order: Order) -> List[str]:
+        quantities = {}
+        for line in order.items:
+            quantities[line.item_id] = quantities.get(line.item_id, 0) + line.quantity
+
+        def store():
+            with self._index_lock:
+                self.orders.add(order)
+            # Logged under the item locks, in order with other changes to these items
+            lsn = self._log("order", order_to_row(order))
+            if lsn is not None:
+                for item_id in quantities:
+                    self._item_lsns[item_id] = lsn
+
+        return self.reserve_stock(quantities, store)
+
+    # Write-ahead log
+
+    def _log(self, kind: str, value: Any) -> Optional[int]:
+        # Changes are logged after they are applied, so a snapshot taken from
+        # a log position holds every change logged before it
+        if self._wal is None:
+            return None
+        lsn = self._wal.append(kind, value)
+        if lsn + 1 - self._snapshot_lsn >= self._snapshot_every:
+            self._start_snapshot()
+        return lsn
+
+    def _log_items(self, items: List[Item]):
+        lsn = self._log("items", [item.model_dump(mode="json") for item in items])
+        if lsn is not None:
+            for item in items:
+                self._item_lsns[item.id] = lsn
+
+    def _log_item_deletes(self, item_ids: List[str]):
+        self._log("delete_items", item_ids)
+        for item_id in item_ids:
+            self._item_lsns.pop(item_id, None)
+
+    def _recover(self, wal: WriteAheadLog):
+        start = time.perf_counter()
+        applied = wal.recover(self._load_snapshot, self._replay)
+        self._wal = wal
+        logger.info(
+            "Recovered %s item(s), %s offer(s) and %s order(s) in %.2fs",
+            len(self.items), len(self.offers), len(self.orders), time.perf_counter() - start
+        )
+        if applied >= self._snapshot_every:
+            self._start_snapshot()
+
+    def _load_snapshot(self, header: Dict, entries: Iterator[list]):
+        self._snapshot_lsn = header["lsn"]
+        if isinstance(self.orders, TieredOrders):
+            # Orders archived after the snapshot are replayed from the log
+            self.orders.archive.truncate(header.get("archived", 0))
+        items = []
+        offers = []
+        for entry in entries:
+            if entry[0] == "order":
+                # Orders may already be moving to the archive in the background
+                with self._index_lock:
+                    self.orders.add_row(entry[1])
+            elif entry[0] == "item":
+                item = Item.model_validate(entry[2])
+                items.append(item)
+                self._item_lsns[item.id] = entry[1]
+            elif entry[0] == "offer":
+                offers.append(Offer.model_validate(entry[1]))
+        self.add_items(items)
+        self.add_offers(offers)
+
+    def _replay(self, kind: str, value: Any, lsn: int):
+        # The snapshot was taken while changes were being made, so records
+        # may repeat what it already holds; every step below is idempotent
+        if kind == "items":
+            creates = []
+            updates = {}
+            for record in value:
+                item = Item.model_validate(record)
+                if self._item_lsns.get(item.id, -1) >= lsn:
+                    continue
+                if item.id in self.items:
+                    updates[item.id] = {field: getattr(item, field) for field in Item.model_fields if field != "id"}
+                else:
+                    creates.append(item)
+                self._item_lsns[item.id] = lsn
+            self.update_items(updates)
+            if creates:
+                self.add_items(creates)
+        elif kind == "delete_items":
+            self.delete_items(value)
+            for item_id in value:
+                self._item_lsns.pop(item_id, None)
+        elif kind == "offers":
+            offers = [Offer.model_validate(record) for record in value]
+            self.update_offers({
+                offer.id: {field: getattr(offer, field) for field in Offer.model_fields if field != "id"}
+                for offer in offers if offer.id in self.offers
+            })
+            creates = [offer for offer in offers if offer.id not in self.offers]
+            if creates:
+                self.add_offers(creates)
+        elif kind == "delete_offers":
+            self.delete_offers(value)
+        elif kind == "order":
+            # Rows go straight into the order store; no models are built
+            order_id, lines = value[0], value[5]
+            if order_id in self.orders:
+                return
+            sold = []
+            for item_id, quantity, *_ in lines:
+                item = self.items.get(item_id)
+                # Skip stock the snapshot already took
+                if item is not None and self._item_lsns.get(item_id, -1) < lsn:
+                    item.stock -= quantity
+                    sold.append(item)
+            with self._index_lock:
+                self.orders.add_row(value)
+                for item in sold:
+                    self._index_stock(self._item_seq[item.id], item.stock > 0)
+            self._bump("items")
+        else:
+            logger.warning("Skipping unknown log record %s at LSN %s", kind, lsn)
+
+    def snapshot(self):
+        """
+        Take a snapshot now and wait for it, so startup only replays later changes.
+        """
+        if self._wal is None:
+            return
+        # Let a running snapshot finish first; it may already be out of date
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+        self._start_snapshot()
+        self._snapshot_thread.join()
+
+    def _start_snapshot(self):
+        with self._snapshot_guard:
+            if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+                return
+            # Claim the log position now so later writes don't start another snapshot
+            self._snapshot_lsn = self._wal.rotate()
+            self._snapshot_thread = threading.Thread(target=self._snapshot, args=(self._snapshot_lsn,), name="wal-snapshot", daemon=True)
+            self._snapshot_thread.start()
+
+    def _snapshot(self, lsn: int):
+        start = time.perf_counter()
+        try:
+            # Orders first: an order in the snapshot had its stock taken before
+            # the items are read below
+            with self._index_lock:
+                if isinstance(self.orders, TieredOrders):
+                    archived = len(self.orders.archive)
+                    orders = iter(self.orders.hot)
+                else:
+                    archived = 0
+                    orders = iter(self.orders)
+            self._wal.write_snapshot(lsn, {"archived": archived}, self._snapshot_entries(orders))
+        except Exception:
+            logger.exception("Snapshot at LSN %s failed", lsn)
+            return
+        logger.info("Wrote snapshot at LSN %s in %.2fs", lsn, time.perf_counter() - start)
+
+    def _snapshot_entries(self, orders: Iterator[Order]) -> Iterator[list]:
+        for order in orders:
+            yield ["order", order_to_row(order)]
+        for item_id, item in list(self.items.items()):
+            with self.item_lock(item_id):
+                if self.items.get(item_id) is not item:
+                    continue
+                record = item.model_dump(mode="json")
+                item_lsn = self._item_lsns.get(item_id, -1)
+            yield ["item", item_lsn, record]
+        for offer in list(self.offers.values()):
+            yield ["offer", offer.model_dump(mode="json")]
+
+    def close(self):
+        if isinstance(self.orders, TieredOrders):
+            self.orders.wait()
+        if self._wal is None:
+            return
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+        self._wal.close()
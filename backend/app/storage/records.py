@@ -0,0 +1,270 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from app.models import Cents, Order, OrderItem, construct_model
+from datetime import datetime, timedelta
+import bisect
+import uuid
+
+# Order IDs are kept as 128-bit ints when they are canonical UUID strings
+OrderKey = Union[int, str]
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# Record layout: a header of created_at, total, discount and final amount,
+# then five values per line: item ref, quantity, unit price, offer ref
+# (-1 for none) and discount. Amounts are cents; refs index the ID table.
+_HEADER = 4
+_LINE = 5
+_NO_OFFER = -1
+
+def encode_id(value: str) -> OrderKey:
+    """
+    Pack a canonical UUID string into a 128-bit int; other IDs are kept as strings.
+    """
+    # Only the canonical form (lowercase hex, hyphenated 8-4-4-4-12) round-trips exactly
+    if len(value) == 36 and value[8] == value[13] == value[18] == value[23] == "-":
+        digits = value.replace("-", "")
+        if len(digits) == 32 and digits.isascii() and digits.isalnum() and digits == digits.lower():
+            try:
+                return int(digits, 16)
+            except ValueError:
+                pass
+    return value
+
+def decode_id(key: OrderKey) -> str:
+    return str(uuid.UUID(int=key)) if isinstance(key, int) else key
+
+def to_epoch_us(when: datetime) -> int:
+    """
+    Convert a wall-clock time to integer microseconds since the epoch.
+    Aware times are converted to local wall-clock time first.
+    """
+    if when.tzinfo is not None:
+        when = when.astimezone().replace(tzinfo=None)
+    return (when - _EPOCH) // _MICROSECOND
+
+def from_epoch_us(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+def order_to_row(order: Order) -> list:
+    """
+    Flatten an order into a JSON-friendly row of strings and integers.
+    """
+    return [
+        order.id,
+        to_epoch_us(order.created_at),
+        int(order.total_amount),
+        int(order.discount_amount),
+        int(order.final_amount),
+        [[line.item_id, line.quantity, int(line.unit_price), line.applied_offer_id, int(line.discount_amount)] for line in order.items]
+    ]
+
+class CompactOrders:
+    """
+    Orders packed into one array('q') each, keyed by order ID as a 128-bit int,
+    with item and offer IDs interned in a shared table.
+    A creation-time index keeps orders sorted for pagination.
+    Pydantic models are only built when orders are read; callers serialize writes.
+    """
+    def __init__(self):
+        self._records: Dict[OrderKey, array] = {}
+        # Item and offer IDs, interned once and referenced by position
+        self._refs: Dict[str, int] = {}
+        self._ref_values: List[str] = []
+        # Creation times and the matching order keys, sorted by time
+        self._created = array("q")
+        self._keys: List[OrderKey] = []
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, order_id: str) -> bool:
+        return encode_id(order_id) in self._records
+
+    def __iter__(self) -> Iterator[Order]:
+        """
+        Iterate over orders in the order they were added, as they were when iteration started.
+        """
+        # Records never change once added, so a copy of the mapping is a consistent snapshot
+        records = list(self._records.items())
+        return (self._decode(key, record) for key, record in records)
+
+    def _ref(self, value: str) -> int:
+        ref = self._refs.get(value)
+        if ref is None:
+            ref = self._refs[value] = len(self._ref_values)
+            self._ref_values.append(value)
+        return ref
+
+    def add(self, order: Order):
+        """
+        Pack an order and add it to the creation-time index.
+        """
+        self.add_row(order_to_row(order))
+
+    def add_row(self, row: list):
+        """
+        Add an order given as a row from order_to_row.
+        """
+        order_id, created, total, discount, final, lines = row
+        record = array("q", (created, total, discount, final))
+        for item_id, quantity, unit_price, offer_id, line_discount in lines:
+            record.extend((
+                self._ref(item_id),
+                quantity,
+                unit_price,
+                self._ref(offer_id) if offer_id is not None else _NO_OFFER,
+                line_discount
+            ))
+        key = encode_id(order_id)
+        self._records[key] = record
+
+        # Orders almost always arrive in time order, so this is usually an append
+        if not self._created or created >= self._created[-1]:
+            self._created.append(created)
+            self._keys.append(key)
+        else:
+            position = bisect.bisect_right(self._created, created)
+            self._created.insert(position, created)
+            self._keys.insert(position, key)
+
+    def get(self, order_id: str) -> Optional[Order]:
+        key = encode_id(order_id)
+        record = self._records.get(key)
+        return self._decode(key, record) if record is not None else None
+
+    def oldest_ids(self, count: int) -> List[str]:
+        """
+        Get the IDs of up to `count` of the oldest orders, oldest first.
+        """
+        return [self.id_at(position) for position in range(min(count, len(self._keys)))]
+
+    def discard(self, order_ids: Iterable[str]):
+        """
+        Remove orders, rebuilding the creation-time index in one pass.
+        """
+        keys = {encode_id(order_id) for order_id in order_ids}
+        for key in keys:
+            self._records.pop(key, None)
+        kept = [position for position, key in enumerate(self._keys) if key not in keys]
+        self._created = array("q", (self._created[position] for position in kept))
+        self._keys = [self._keys[position] for position in kept]
+
+    # Tier interface used by page_tiers
+
+    @property
+    def created(self) -> array:
+        return self._created
+
+    def locate(self, timestamp: int, order_id: str) -> Optional[int]:
+        key = encode_id(order_id)
+        for position in range(bisect.bisect_left(self._created, timestamp), bisect.bisect_right(self._created, timestamp)):
+            if self._keys[position] == key:
+                return position
+        return None
+
+    def order_at(self, position: int, with_items: bool = True) -> Order:
+        key = self._keys[position]
+        return self._decode(key, self._records[key], with_items)
+
+    def id_at(self, position: int) -> str:
+        return decode_id(self._keys[position])
+
+    def page(
+        self,
+        after: Optional[Tuple[int, str]] = None,
+        limit: int = 100,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        with_items: bool = True
+    ) -> Tuple[List[Order], Optional[Tuple[int, str]]]:
+        return page_tiers([self], after, limit, created_from, created_to, with_items)
+
+    def _decode(self, key: OrderKey, record: array, with_items: bool = True) -> Order:
+        # Records were validated when added, so skip re-validation
+        values = self._ref_values
+        items = []
+        for offset in range(_HEADER, len(record) if with_items else _HEADER, _LINE):
+            item_ref, quantity, unit_price, offer_ref, discount = record[offset:offset + _LINE]
+            items.append(construct_model(OrderItem, {
+                "item_id": values[item_ref],
+                "quantity": quantity,
+                "unit_price": Cents(unit_price),
+                "applied_offer_id": values[offer_ref] if offer_ref != _NO_OFFER else None,
+                "discount_amount": Cents(discount)
+            }))
+        return construct_model(Order, {
+            "id": decode_id(key),
+            "items": items,
+            "total_amount": Cents(record[1]),
+            "discount_amount": Cents(record[2]),
+            "final_amount": Cents(record[3]),
+            "created_at": from_epoch_us(record[0])
+        })
+
+def page_tiers(
+    tiers: Sequence,
+    after: Optional[Tuple[int, str]] = None,
+    limit: int = 100,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    with_items: bool = True
+) -> Tuple[List[Order], Optional[Tuple[int, str]]]:
+    """
+    Get a page of orders by creation time across tiers, starting after the
+    (created_at microseconds, order ID) position of the previous page.
+    Each tier keeps its orders sorted by creation time and provides `created`,
+    `locate`, `order_at` and `id_at`. Orders created in the same microsecond
+    come in tier order, then in each tier's own order. Without `with_items`,
+    orders are returned with no lines.
+    Returns the page and the position of its last order, or None on the last page.
+    """
+    owner = None
+    if after is not None:
+        timestamp, order_id = after
+        for index, tier in enumerate(tiers):
+            position = tier.locate(timestamp, order_id)
+            if position is not None:
+                owner = (index, position)
+                break
+
+    starts = []
+    ends = []
+    for index, tier in enumerate(tiers):
+        created = tier.created
+        if after is None:
+            start = 0
+        elif owner is None or index < owner[0]:
+            start = bisect.bisect_right(created, timestamp)
+        elif index == owner[0]:
+            start = owner[1] + 1
+        else:
+            start = bisect.bisect_left(created, timestamp)
+        if created_from is not None:
+            start = max(start, bisect.bisect_left(created, to_epoch_us(created_from)))
+        end = len(created)
+        if created_to is not None:
+            end = bisect.bisect_right(created, to_epoch_us(created_to))
+        starts.append(start)
+        ends.append(end)
+
+    page = []
+    last = None
+    while len(page) < limit:
+        # Take the oldest next order of any tier; ties go to the earlier tier
+        best = None
+        best_created = None
+        for index, tier in enumerate(tiers):
+            if starts[index] < ends[index]:
+                created = tier.created[starts[index]]
+                if best is None or created < best_created:
+                    best, best_created = index, created
+        if best is None:
+            break
+        page.append(tiers[best].order_at(starts[best], with_items))
+        last = (best_created, tiers[best].id_at(starts[best]))
+        starts[best] += 1
+
+    more = any(start < end for start, end in zip(starts, ends))
+    return page, last if more else None
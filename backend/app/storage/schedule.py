@@ -0,0 +1,158 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models import Offer
+from datetime import datetime
+import heapq
+import math
+import threading
+
+# Boundary kinds; starts sort before ends at the same instant
+_START = 0
+_END = 1
+
+def _timestamp(value: Optional[datetime], default: float) -> float:
+    return value.timestamp() if value is not None else default
+
+class OfferSchedule:
+    """
+    Tracks which offers are live.
+    Start and end boundaries of scheduled offers are kept in a min-heap, and the
+    materialized active set only changes when the clock passes a boundary.
+    The active set is copied on write, so readers can hold it without locking.
+    """
+    def __init__(self):
+        self._offers: Dict[str, Offer] = {}
+        # offer_id -> (start, end) as epoch seconds
+        self._windows: Dict[str, Tuple[float, float]] = {}
+        # offer_id -> registration version, used to skip stale heap entries
+        self._versions: Dict[str, int] = {}
+        self._boundaries: List[Tuple[float, int, str, int]] = []
+        self._active: Dict[str, Offer] = {}
+        self._now = -math.inf
+        self._lock = threading.RLock()
+
+    def add(self, offer: Offer):
+        """
+        Register an offer, or re-register it after its dates or status changed.
+        """
+        self.add_many([offer])
+
+    def add_many(self, offers: Iterable[Offer]):
+        """
+        Register several offers, copying the active set once for the whole batch.
+        """
+        with self._lock:
+            active = dict(self._active)
+            for offer in offers:
+                self._add(offer, active)
+            self._active = active
+
+    def _add(self, offer: Offer, active: Dict[str, Offer]):
+        # Updates `active`, a copy that is not published yet
+        version = self._versions.get(offer.id, 0) + 1
+        self._versions[offer.id] = version
+        self._offers[offer.id] = offer
+
+        start = _timestamp(offer.start_date, -math.inf)
+        end = _timestamp(offer.end_date, math.inf)
+        self._windows[offer.id] = (start, end)
+        if offer.start_date is not None:
+            heapq.heappush(self._boundaries, (start, _START, offer.id, version))
+        if offer.end_date is not None:
+            heapq.heappush(self._boundaries, (end, _END, offer.id, version))
+
+        self._refresh(offer.id, active)
+
+    def remove(self, offer_id: str):
+        """
+        Forget an offer. Its pending boundaries are discarded lazily.
+        """
+        self.remove_many([offer_id])
+
+    def remove_many(self, offer_ids: Iterable[str]):
+        """
+        Forget several offers, copying the active set at most once.
+        """
+        with self._lock:
+            active = self._active
+            for offer_id in offer_ids:
+                self._offers.pop(offer_id, None)
+                self._windows.pop(offer_id, None)
+                self._versions.pop(offer_id, None)
+                if offer_id in active:
+                    if active is self._active:
+                        active = dict(active)
+                    del active[offer_id]
+            self._active = active
+
+    def active(self, now: Optional[datetime] = None) -> Dict[str, Offer]:
+        """
+        Get the offers live at the current time, keyed by offer ID.
+        The returned mapping is owned by the schedule and must not be modified.
+        """
+        self.advance((now or datetime.now()).timestamp())
+        return self._active
+
+    def active_at(self, when: datetime) -> List[Offer]:
+        """
+        Get the offers that would be live at an arbitrary time.
+        Does not move the schedule, so it can be used to preview sales.
+        """
+        ts = when.timestamp()
+        with self._lock:
+            return [self._offers[offer_id] for offer_id in self._offers if self._is_live(offer_id, ts)]
+
+    def advance(self, now: float):
+        """
+        Move the schedule to the given epoch time, updating the active set
+        for every boundary passed since the last call.
+        """
+        if now >= self._now and not self._passed(now):
+            # Nothing to do; the common case needs no lock
+            return
+
+        with self._lock:
+            if now < self._now:
+                # The clock went backwards; boundaries already consumed may apply again
+                self._rebuild(now)
+                return
+
+            self._now = now
+            active = dict(self._active)
+            boundaries = self._boundaries
+            while self._passed(now):
+                ts, kind, offer_id, version = heapq.heappop(boundaries)
+                if self._versions.get(offer_id) == version:
+                    self._refresh(offer_id, active)
+            self._active = active
+
+    def _passed(self, now: float) -> bool:
+        try:
+            ts, kind, _, _ = self._boundaries[0]
+        except IndexError:
+            return False
+        # An offer is still live at the exact instant of its end date
+        return ts < now or (ts == now and kind == _START)
+
+    def _rebuild(self, now: float):
+        offers = list(self._offers.values())
+        self._versions.clear()
+        self._boundaries = []
+        self._now = now
+        active: Dict[str, Offer] = {}
+        for offer in offers:
+            self._add(offer, active)
+        while self._passed(now):
+            heapq.heappop(self._boundaries)
+        self._active = active
+
+    def _is_live(self, offer_id: str, ts: float) -> bool:
+        if not self._offers[offer_id].is_active:
+            return False
+        start, end = self._windows[offer_id]
+        return start <= ts <= end
+
+    def _refresh(self, offer_id: str, active: Dict[str, Offer]):
+        if self._is_live(offer_id, self._now):
+            active[offer_id] = self._offers[offer_id]
+        else:
+            active.pop(offer_id, None)
@@ -0,0 +1,267 @@
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import logging
+import multiprocessing
+import os
+import struct
+
+logger = logging.getLogger(__name__)
+
+# Each slot: 16-byte hash of the item ID, stock, and state
+_SLOT = struct.Struct("<16sqq")
+_STOCK = struct.Struct("<q")
+_STOCK_OFFSET = 16
+_STATE_OFFSET = 24
+_EMPTY = 0
+_USED = 1
+_DELETED = 2
+# Locks guarding slots; slot i is guarded by lock i % LOCK_STRIPES
+LOCK_STRIPES = 64
+
+class SharedStockFull(Exception):
+    """
+    Raised when the shared stock table has no room for another item.
+    """
+
+def _key(item_id: str) -> bytes:
+    return hashlib.blake2b(item_id.encode(), digest_size=16).digest()
+
+class SharedStock:
+    """
+    Stock counters in a shared memory segment, so worker processes forked
+    from the process that created it all take stock from the same counters.
+
+    The segment is an open-addressed hash table keyed by a hash of the item
+    ID. Each slot is guarded by one of a fixed set of process-shared locks,
+    so orders for different items rarely wait for each other; reserving
+    stock for an order takes the locks of its items' slots in order, checks
+    every item and takes stock from all of them or none. Adding and removing
+    items also takes a table lock. Removed items leave markers behind that
+    keep probe sequences intact; once they take up too many slots, the table
+    is compacted in place, with every lock held.
+
+    It must be created before the workers are forked, since the locks are
+    inherited rather than looked up by name.
+    """
+    def __init__(self, capacity: int):
+        # At most half full, so probe sequences stay short
+        size = 1
+        while size < capacity * 2:
+            size *= 2
+        self._size = size
+        self._mask = size - 1
+        self._memory = shared_memory.SharedMemory(create=True, size=size * _SLOT.size)
+        self._buffer = self._memory.buf
+        context = multiprocessing.get_context("fork")
+        self._stripes = [context.Lock() for _ in range(LOCK_STRIPES)]
+        self._table_lock = context.Lock()
+        # Items in the table, and slots in use or marked deleted; changed with the table lock held
+        self._items = context.Value("q", 0, lock=False)
+        self._filled = context.Value("q", 0, lock=False)
+        self._capacity = capacity
+        self._creator = os.getpid()
+        # This process's cache of item ID -> slot, checked against the slot on use
+        self._slots: Dict[str, int] = {}
+        logger.info("Created shared stock table %s for %s item(s)", self._memory.name, capacity)
+
+    def _holds(self, slot: int, key: bytes) -> bool:
+        offset = slot * _SLOT.size
+        return (
+            _STOCK.unpack_from(self._buffer, offset + _STATE_OFFSET)[0] == _USED
+            and self._buffer[offset:offset + 16] == key
+        )
+
+    def _find(self, item_id: str) -> Optional[int]:
+        # The slot holding an item, or None. Not locked: a slot's key is
+        # written before it is marked used, and callers check it again under its lock
+        key = _key(item_id)
+        slot = self._slots.get(item_id)
+        if slot is not None and self._holds(slot, key):
+            return slot
+        slot = int.from_bytes(key[:8], "little") & self._mask
+        for _ in range(self._size):
+            offset = slot * _SLOT.size
+            state = _STOCK.unpack_from(self._buffer, offset + _STATE_OFFSET)[0]
+            if state == _EMPTY:
+                return None
+            if state == _USED and self._buffer[offset:offset + 16] == key:
+                self._slots[item_id] = slot
+                return slot
+            slot = (slot + 1) & self._mask
+        return None
+
+    def _insert(self, item_id: str) -> int:
+        # Called with the table lock held; returns the item's slot, adding it if needed
+        key = _key(item_id)
+        slot = int.from_bytes(key[:8], "little") & self._mask
+        reusable = None
+        for _ in range(self._size):
+            offset = slot * _SLOT.size
+            state = _STOCK.unpack_from(self._buffer, offset + _STATE_OFFSET)[0]
+            if state == _USED and self._buffer[offset:offset + 16] == key:
+                return slot
+            if state == _DELETED and reusable is None:
+                reusable = slot
+            if state == _EMPTY:
+                break
+            slot = (slot + 1) & self._mask
+        if self._items.value >= self._capacity:
+            raise SharedStockFull(f"Shared stock table is full ({self._capacity} items)")
+        if reusable is None:
+            if self._filled.value >= self._size * 3 // 4:
+                self._compact()
+                return self._insert(item_id)
+            self._filled.value += 1
+            reusable = slot
+        self._items.value += 1
+        offset = reusable * _SLOT.size
+        with self._stripes[reusable % LOCK_STRIPES]:
+            self._buffer[offset:offset + 16] = key
+            _STOCK.pack_into(self._buffer, offset + _STOCK_OFFSET, 0)
+            _STOCK.pack_into(self._buffer, offset + _STATE_OFFSET, _USED)
+        return reusable
+
+    def _compact(self):
+        # Called with the table lock held; clears out the markers of removed items
+        for lock in self._stripes:
+            lock.acquire()
+        try:
+            entries = []
+            for slot in range(self._size):
+                offset = slot * _SLOT.size
+                key, stock, state = _SLOT.unpack_from(self._buffer, offset)
+                if state == _USED:
+                    entries.append((key, stock))
+            self._buffer[:self._size * _SLOT.size] = bytes(self._size * _SLOT.size)
+            for key, stock in entries:
+                slot = int.from_bytes(key[:8], "little") & self._mask
+                while _STOCK.unpack_from(self._buffer, slot * _SLOT.size + _STATE_OFFSET)[0] != _EMPTY:
+                    slot = (slot + 1) & self._mask
+                _SLOT.pack_into(self._buffer, slot * _SLOT.size, key, stock, _USED)
+            self._filled.value = len(entries)
+            self._slots.clear()
+        finally:
+            for lock in reversed(self._stripes):
+                lock.release()
+        logger.info("Compacted shared stock table of %s item(s)", len(entries))
+
+    def _locked(self, slots: Iterable[int]) -> List:
+        return [self._stripes[stripe] for stripe in sorted({slot % LOCK_STRIPES for slot in slots})]
+
+    def set_many(self, stocks: Iterable[Tuple[str, int]]):
+        """
+        Set the stock of items, adding those not in the table yet.
+        """
+        with self._table_lock:
+            for item_id, stock in stocks:
+                slot = self._insert(item_id)
+                with self._stripes[slot % LOCK_STRIPES]:
+                    _STOCK.pack_into(self._buffer, slot * _SLOT.size + _STOCK_OFFSET, stock)
+
+    def remove_many(self, item_ids: Iterable[str]):
+        with self._table_lock:
+            for item_id in item_ids:
+                slot = self._find(item_id)
+                if slot is None:
+                    continue
+                with self._stripes[slot % LOCK_STRIPES]:
+                    _STOCK.pack_into(self._buffer, slot * _SLOT.size + _STATE_OFFSET, _DELETED)
+                self._items.value -= 1
+                self._slots.pop(item_id, None)
+
+    def get(self, item_id: str) -> Optional[int]:
+        slot = self._find(item_id)
+        if slot is None:
+            # It may have moved while the table was compacted; look again with it held still
+            with self._table_lock:
+                slot = self._find(item_id)
+            if slot is None:
+                return None
+        return _STOCK.unpack_from(self._buffer, slot * _SLOT.size + _STOCK_OFFSET)[0]
+
+    def reserve(self, quantities: Dict[str, int]) -> Dict[str, Optional[int]]:
+        """
+        Atomically take stock for every item in the mapping of item ID to quantity.
+        Either every item is decremented or none is. Returns, for each item
+        that could not be reserved, its available stock, or None if it is
+        not in the table; an empty result means the stock was taken.
+        """
+        failures = self._reserve(quantities)
+        if any(available is None for available in failures.values()):
+            # Items may have moved while the table was compacted; look again with it held still
+            with self._table_lock:
+                failures = self._reserve(quantities)
+        return failures
+
+    def _reserve(self, quantities: Dict[str, int]) -> Dict[str, Optional[int]]:
+        slots = {item_id: self._find(item_id) for item_id in quantities}
+        locks = self._locked(slot for slot in slots.values() if slot is not None)
+        for lock in locks:
+            lock.acquire()
+        try:
+            failures: Dict[str, Optional[int]] = {}
+            stocks = {}
+            for item_id, quantity in quantities.items():
+                slot = slots[item_id]
+                # Checked again under the lock, in case the item was removed meanwhile
+                if slot is None or not self._holds(slot, _key(item_id)):
+                    failures[item_id] = None
+                    continue
+                stock = _STOCK.unpack_from(self._buffer, slot * _SLOT.size + _STOCK_OFFSET)[0]
+                if stock < quantity:
+                    failures[item_id] = stock
+                stocks[item_id] = stock
+            if failures:
+                return failures
+            for item_id, quantity in quantities.items():
+                _STOCK.pack_into(self._buffer, slots[item_id] * _SLOT.size + _STOCK_OFFSET, stocks[item_id] - quantity)
+            return failures
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def adjust(self, changes: Dict[str, int]):
+        """
+        Add to the stock of items, e.g. to release a reservation or apply a
+        restock. Changes add up, so they can be applied in any order.
+        Items not in the table are skipped.
+        """
+        skipped = self._adjust(changes)
+        if skipped:
+            # Items may have moved while the table was compacted; look again with it held still
+            with self._table_lock:
+                self._adjust(skipped)
+
+    def _adjust(self, changes: Dict[str, int]) -> Dict[str, int]:
+        # Returns the changes to items that were not found
+        skipped = {}
+        slots = {item_id: self._find(item_id) for item_id in changes}
+        locks = self._locked(slot for slot in slots.values() if slot is not None)
+        for lock in locks:
+            lock.acquire()
+        try:
+            for item_id, change in changes.items():
+                slot = slots[item_id]
+                if slot is None or not self._holds(slot, _key(item_id)):
+                    skipped[item_id] = change
+                    continue
+                offset = slot * _SLOT.size + _STOCK_OFFSET
+                _STOCK.pack_into(self._buffer, offset, _STOCK.unpack_from(self._buffer, offset)[0] + change)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        return skipped
+
+    def close(self):
+        """
+        Detach from the segment, and remove it if this process created it.
+        """
+        self._buffer.release()
+        self._memory.close()
+        if os.getpid() == self._creator:
+            self._memory.unlink()
+
+# The table shared by the worker processes, set by the launcher before the
+# storage is created; forked workers inherit it
+current: Optional[SharedStock] = None
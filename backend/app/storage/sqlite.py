@@ -0,0 +1,672 @@
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.models import Cents, Item, Offer, OfferType, Order, OrderItem
+from app.storage.base import Storage, decode_cursor, encode_cursor
+from app.storage.shared import SharedStock
+from datetime import datetime
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Stay well below SQLite's limit on bound parameters per statement
+_MAX_PARAMS = 900
+
+# Rows sampled per index when refreshing the query planner's statistics
+_ANALYSIS_LIMIT = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    stock INTEGER NOT NULL,
+    category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_items_category ON items (category);
+CREATE INDEX IF NOT EXISTS idx_items_price ON items (price);
+CREATE INDEX IF NOT EXISTS idx_items_in_stock ON items (stock) WHERE stock > 0;
+
+CREATE TABLE IF NOT EXISTS offers (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    offer_type TEXT NOT NULL,
+    discount_value REAL NOT NULL,
+    min_quantity INTEGER,
+    start_date TEXT,
+    end_date TEXT,
+    start_ts REAL,
+    end_ts REAL,
+    is_active INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_offers_validity ON offers (is_active, start_ts, end_ts);
+
+CREATE TABLE IF NOT EXISTS offer_items (
+    offer_id TEXT NOT NULL REFERENCES offers (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    PRIMARY KEY (offer_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_offer_items_item ON offer_items (item_id);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    total_amount INTEGER NOT NULL,
+    discount_amount INTEGER NOT NULL,
+    final_amount INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    created_ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_ts);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    order_id TEXT NOT NULL REFERENCES orders (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price INTEGER NOT NULL,
+    applied_offer_id TEXT,
+    discount_amount INTEGER NOT NULL,
+    PRIMARY KEY (order_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS versions (
+    collection TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO versions (collection, version) VALUES ('items', 0), ('offers', 0);
+"""
+
+# Schema version 1 stores money as integer cents. Version 0 databases held
+# REAL dollars; their values are converted in place. The columns keep REAL
+# affinity there, which holds whole cents exactly, so rows are read with int().
+_SCHEMA_VERSION = 1
+_CENTS_MIGRATION = [
+    "UPDATE items SET price = ROUND(price * 100)",
+    "UPDATE orders SET total_amount = ROUND(total_amount * 100), discount_amount = ROUND(discount_amount * 100), "
+    "final_amount = ROUND(final_amount * 100)",
+    "UPDATE order_items SET unit_price = ROUND(unit_price * 100), discount_amount = ROUND(discount_amount * 100)",
+]
+
+# Statements are kept as constants so each connection's statement cache reuses them
+_ITEM_COLUMNS = "id, name, description, price, stock, category"
+_SELECT_ITEM = f"SELECT {_ITEM_COLUMNS} FROM items WHERE id = ?"
+_SELECT_ITEMS = f"SELECT {_ITEM_COLUMNS} FROM items ORDER BY rowid"
+_INSERT_ITEM = "INSERT INTO items (id, name, description, price, stock, category) VALUES (?, ?, ?, ?, ?, ?)"
+_TAKE_STOCK = "UPDATE items SET stock = stock - ? WHERE id = ? AND stock >= ?"
+_SELECT_STOCK = "SELECT name, stock FROM items WHERE id = ?"
+
+_OFFER_COLUMNS = "id, name, description, offer_type, discount_value, min_quantity, start_date, end_date, is_active"
+_INSERT_OFFER = (
+    "INSERT INTO offers (id, name, description, offer_type, discount_value, min_quantity, "
+    "start_date, end_date, start_ts, end_ts, is_active) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_UPDATE_OFFER = (
+    "UPDATE offers SET name = ?, description = ?, offer_type = ?, discount_value = ?, min_quantity = ?, "
+    "start_date = ?, end_date = ?, start_ts = ?, end_ts = ?, is_active = ? WHERE id = ?"
+)
+_SELECT_OFFERS = f"SELECT {_OFFER_COLUMNS} FROM offers ORDER BY rowid"
+_DELETE_OFFER = "DELETE FROM offers WHERE id = ?"
+_ACTIVE_OFFERS_WHERE = "is_active = 1 AND (start_ts IS NULL OR start_ts <= ?) AND (end_ts IS NULL OR end_ts >= ?)"
+_SELECT_ACTIVE_OFFERS = f"SELECT {_OFFER_COLUMNS} FROM offers WHERE {_ACTIVE_OFFERS_WHERE} ORDER BY rowid"
+_SELECT_ACTIVE_OFFER_IDS_FOR_ITEMS = (
+    "SELECT oi.item_id, o.id FROM offer_items oi JOIN offers o ON o.id = oi.offer_id "
+    "WHERE oi.item_id IN ({}) AND o.is_active = 1 "
+    "AND (o.start_ts IS NULL OR o.start_ts <= ?) AND (o.end_ts IS NULL OR o.end_ts >= ?)"
+)
+_INSERT_OFFER_ITEM = "INSERT INTO offer_items (offer_id, position, item_id) VALUES (?, ?, ?)"
+_DELETE_OFFER_ITEMS = "DELETE FROM offer_items WHERE offer_id = ?"
+
+_ORDER_COLUMNS = "id, total_amount, discount_amount, final_amount, created_at"
+_SELECT_ORDER = f"SELECT {_ORDER_COLUMNS} FROM orders WHERE id = ?"
+_SELECT_ORDERS = (
+    "SELECT o.id, o.total_amount, o.discount_amount, o.final_amount, o.created_at, "
+    "li.item_id, li.quantity, li.unit_price, li.applied_offer_id, li.discount_amount "
+    "FROM orders o JOIN order_items li ON li.order_id = o.id ORDER BY o.rowid, li.position"
+)
+_SELECT_ORDER_ITEMS = (
+    "SELECT item_id, quantity, unit_price, applied_offer_id, discount_amount "
+    "FROM order_items WHERE order_id = ? ORDER BY position"
+)
+_INSERT_ORDER = (
+    "INSERT INTO orders (id, total_amount, discount_amount, final_amount, created_at, created_ts) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_INSERT_ORDER_ITEM = (
+    "INSERT INTO order_items (order_id, position, item_id, quantity, unit_price, applied_offer_id, discount_amount) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Bumped in the same transaction as the change, so every process sees it
+_SELECT_VERSION = "SELECT version FROM versions WHERE collection = ?"
+_BUMP_VERSION = "UPDATE versions SET version = version + 1 WHERE collection = ?"
+
+_ITEM_FIELDS = {"name", "description", "price", "stock", "category"}
+
+def _chunks(values: Sequence[str]) -> Iterator[Sequence[str]]:
+    for start in range(0, len(values), _MAX_PARAMS):
+        yield values[start:start + _MAX_PARAMS]
+
+def _placeholders(count: int) -> str:
+    return ", ".join("?" * count)
+
+def _item_from_row(row) -> Item:
+    # Rows were validated when written, so skip re-validation
+    return Item.model_construct(
+        id=row[0], name=row[1], description=row[2], price=Cents(row[3]), stock=row[4], category=row[5]
+    )
+
+def _order_from_row(row) -> Order:
+    # (id, total_amount, discount_amount, final_amount, created_at); lines are added by the caller
+    return Order.model_construct(
+        id=row[0], items=[], total_amount=Cents(row[1]), discount_amount=Cents(row[2]), final_amount=Cents(row[3]),
+        created_at=datetime.fromisoformat(row[4])
+    )
+
+def _order_item_from_row(row) -> OrderItem:
+    # (item_id, quantity, unit_price, applied_offer_id, discount_amount)
+    return OrderItem.model_construct(
+        item_id=row[0], quantity=row[1], unit_price=Cents(row[2]), applied_offer_id=row[3], discount_amount=Cents(row[4])
+    )
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+def _offer_row(offer: Offer) -> tuple:
+    return (
+        offer.name,
+        offer.description,
+        OfferType(offer.offer_type).value,
+        offer.discount_value,
+        offer.min_quantity,
+        offer.start_date.isoformat() if offer.start_date else None,
+        offer.end_date.isoformat() if offer.end_date else None,
+        offer.start_date.timestamp() if offer.start_date else None,
+        offer.end_date.timestamp() if offer.end_date else None,
+        int(offer.is_active),
+    )
+
+def _quantities(order: Order) -> Dict[str, int]:
+    quantities = {}
+    for line in order.items:
+        quantities[line.item_id] = quantities.get(line.item_id, 0) + line.quantity
+    return quantities
+
+class _OrderRejected(Exception):
+    def __init__(self, errors: List[str]):
+        super().__init__(errors)
+        self.errors = errors
+
+class _ConnectionPool:
+    """
+    Hands out one connection per worker thread and process.
+    Connections are opened lazily and reopened after a fork.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+class SQLiteStorage(Storage):
+    """
+    Persistent storage in an SQLite database running in WAL mode, so readers
+    never block the writer and several worker processes can share one file.
+
+    With shared stock counters, orders take stock from the counters before
+    opening a transaction, so an order for an item that is out of stock is
+    turned away without waiting for the database's write lock. The table
+    stays the durable record of stock and is updated in the same transaction
+    as the order.
+    """
+    def __init__(self, path: str, stock: Optional[SharedStock] = None):
+        self.path = path
+        self._stock = stock
+        self._pool = _ConnectionPool(path)
+        conn = self._pool.get()
+        existing = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items'").fetchone() is not None
+        conn.executescript(_SCHEMA)
+        self._migrate(existing)
+        self._analyze()
+        logger.info("Opened SQLite storage at %s", path)
+
+    def _migrate(self, existing: bool):
+        with self._transaction() as conn:
+            # Checked under the write lock, so only one process migrates
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= _SCHEMA_VERSION:
+                return
+            if existing and version == 0:
+                logger.info("Converting money in %s to integer cents", self.path)
+                for statement in _CENTS_MIGRATION:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def _analyze(self):
+        # Without statistics the planner walks items in rowid order for every
+        # filter; with them it seeks the price or in-stock index when that is
+        # more selective. Sampled so it stays cheap on large tables.
+        conn = self._pool.get()
+        conn.execute(f"PRAGMA analysis_limit = {_ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE items")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._pool.get()
+        # Take the write lock up front so concurrent writers queue instead of failing to upgrade
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def is_empty(self) -> bool:
+        conn = self._pool.get()
+        for table in ("items", "offers", "orders"):
+            if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False
+        return True
+
+    def version(self, collection: str) -> int:
+        row = self._pool.get().execute(_SELECT_VERSION, (collection,)).fetchone()
+        if row is None:
+            raise KeyError(collection)
+        return row[0]
+
+    # Items
+
+    def get_item(self, item_id: str) -> Optional[Item]:
+        row = self._pool.get().execute(_SELECT_ITEM, (item_id,)).fetchone()
+        return _item_from_row(row) if row else None
+
+    def _select_items(self, conn: sqlite3.Connection, item_ids: List[str]) -> Dict[str, Item]:
+        items = {}
+        for chunk in _chunks(list(dict.fromkeys(item_ids))):
+            sql = f"SELECT {_ITEM_COLUMNS} FROM items WHERE id IN ({_placeholders(len(chunk))})"
+            for row in conn.execute(sql, chunk):
+                items[row[0]] = _item_from_row(row)
+        return items
+
+    def get_items(self, item_ids: Iterable[str]) -> Dict[str, Item]:
+        return self._select_items(self._pool.get(), list(item_ids))
+
+    def list_items(self) -> List[Item]:
+        return [_item_from_row(row) for row in self._pool.get().execute(_SELECT_ITEMS)]
+
+    def page_items(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        category: Optional[str] = None,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        in_stock: bool = False
+    ) -> Tuple[List[Item], Optional[str]]:
+        conditions = []
+        params = []
+        if cursor is not None:
+            key = decode_cursor(cursor)
+            if len(key) != 1 or not isinstance(key[0], int):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            conditions.append("rowid > ?")
+            params.append(key[0])
+        if category is not None:
+            conditions.append("category = ?")
+            params.append(category)
+        if min_price is not None:
+            conditions.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("price <= ?")
+            params.append(max_price)
+        if in_stock:
+            conditions.append("stock > 0")
+
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        # Fetch one extra row to know whether there is a next page
+        rows = self._pool.get().execute(
+            f"SELECT rowid, {_ITEM_COLUMNS} FROM items {where}ORDER BY rowid LIMIT ?", params + [limit + 1]
+        ).fetchall()
+        next_cursor = encode_cursor([rows[limit - 1][0]]) if len(rows) > limit else None
+        return [_item_from_row(row[1:]) for row in rows[:limit]], next_cursor
+
+    def missing_items(self, item_ids: Iterable[str]) -> List[str]:
+        item_ids = list(item_ids)
+        existing = self.get_items(item_ids)
+        return [item_id for item_id in item_ids if item_id not in existing]
+
+    def add_item(self, item: Item):
+        self.add_items([item])
+
+    def update_item(self, item_id: str, update_data: Dict) -> Optional[Item]:
+        return self.update_items({item_id: update_data}).get(item_id)
+
+    def delete_item(self, item_id: str) -> Optional[Item]:
+        return self.delete_items([item_id]).get(item_id)
+
+    def add_items(self, items: List[Item]):
+        with self._transaction() as conn:
+            conn.executemany(_INSERT_ITEM, [
+                (item.id, item.name, item.description, item.price, item.stock, item.category) for item in items
+            ])
+            conn.execute(_BUMP_VERSION, ("items",))
+        if self._stock is not None:
+            self._stock.set_many((item.id, item.stock) for item in items)
+        # A bulk load can change the table's shape enough to change the best plan
+        self._analyze()
+
+    def update_items(self, updates: Dict[str, Dict]) -> Dict[str, Item]:
+        with self._transaction() as conn:
+            restocked = [item_id for item_id, update_data in updates.items() if "stock" in update_data]
+            if self._stock is not None and restocked:
+                previous = self._select_items(conn, restocked)
+            for item_id, update_data in updates.items():
+                columns = [key for key in update_data if key in _ITEM_FIELDS]
+                if columns:
+                    assignments = ", ".join(f"{column} = ?" for column in columns)
+                    conn.execute(
+                        f"UPDATE items SET {assignments} WHERE id = ?",
+                        [update_data[column] for column in columns] + [item_id]
+                    )
+            conn.execute(_BUMP_VERSION, ("items",))
+            updated = self._select_items(conn, list(updates))
+        if self._stock is not None and restocked:
+            # Applied as changes rather than set, so orders holding stock
+            # they have not yet written to the table are still counted
+            self._stock.adjust({
+                item_id: updated[item_id].stock - item.stock
+                for item_id, item in previous.items() if item_id in updated
+            })
+        return updated
+
+    def delete_items(self, item_ids: Iterable[str]) -> Dict[str, Item]:
+        with self._transaction() as conn:
+            deleted = self._select_items(conn, list(item_ids))
+            for chunk in _chunks(list(deleted)):
+                conn.execute(f"DELETE FROM items WHERE id IN ({_placeholders(len(chunk))})", chunk)
+            conn.execute(_BUMP_VERSION, ("items",))
+        if self._stock is not None:
+            self._stock.remove_many(deleted)
+        return deleted
+
+    # Offers
+
+    def _load_offers(self, conn: sqlite3.Connection, rows: List[tuple]) -> Dict[str, Offer]:
+        applicable_items = {row[0]: [] for row in rows}
+        for chunk in _chunks(list(applicable_items)):
+            sql = f"SELECT offer_id, item_id FROM offer_items WHERE offer_id IN ({_placeholders(len(chunk))}) ORDER BY offer_id, position"
+            for offer_id, item_id in conn.execute(sql, chunk):
+                applicable_items[offer_id].append(item_id)
+        return {
+            row[0]: Offer.model_construct(
+                id=row[0],
+                name=row[1],
+                description=row[2],
+                offer_type=OfferType(row[3]),
+                discount_value=row[4],
+                min_quantity=row[5],
+                applicable_items=applicable_items[row[0]],
+                start_date=_parse_datetime(row[6]),
+                end_date=_parse_datetime(row[7]),
+                is_active=bool(row[8])
+            )
+            for row in rows
+        }
+
+    def _select_offers(self, conn: sqlite3.Connection, offer_ids: List[str]) -> Dict[str, Offer]:
+        rows = []
+        for chunk in _chunks(list(dict.fromkeys(offer_ids))):
+            rows.extend(conn.execute(f"SELECT {_OFFER_COLUMNS} FROM offers WHERE id IN ({_placeholders(len(chunk))})", chunk))
+        return self._load_offers(conn, rows)
+
+    def get_offer(self, offer_id: str) -> Optional[Offer]:
+        return self._select_offers(self._pool.get(), [offer_id]).get(offer_id)
+
+    def get_offers(self, offer_ids: Iterable[str]) -> Dict[str, Offer]:
+        return self._select_offers(self._pool.get(), list(offer_ids))
+
+    def list_offers(self) -> List[Offer]:
+        conn = self._pool.get()
+        return list(self._load_offers(conn, conn.execute(_SELECT_OFFERS).fetchall()).values())
+
+    def add_offer(self, offer: Offer):
+        self.add_offers([offer])
+
+    def update_offer(self, offer_id: str, update_data: Dict) -> Optional[Offer]:
+        return self.update_offers({offer_id: update_data}).get(offer_id)
+
+    def delete_offer(self, offer_id: str) -> Optional[Offer]:
+        return self.delete_offers([offer_id]).get(offer_id)
+
+    def add_offers(self, offers: List[Offer]):
+        with self._transaction() as conn:
+            conn.executemany(_INSERT_OFFER, [(offer.id,) + _offer_row(offer) for offer in offers])
+            conn.executemany(_INSERT_OFFER_ITEM, [
+                (offer.id, position, item_id) for offer in offers for position, item_id in enumerate(offer.applicable_items)
+            ])
+            conn.execute(_BUMP_VERSION, ("offers",))
+
+    def update_offers(self, updates: Dict[str, Dict]) -> Dict[str, Offer]:
+        with self._transaction() as conn:
+            offers = self._select_offers(conn, list(updates))
+            for offer_id, offer in offers.items():
+                for key, value in updates[offer_id].items():
+                    setattr(offer, key, value)
+            conn.executemany(_UPDATE_OFFER, [_offer_row(offer) + (offer_id,) for offer_id, offer in offers.items()])
+
+            reindexed = [offer for offer_id, offer in offers.items() if "applicable_items" in updates[offer_id]]
+            conn.executemany(_DELETE_OFFER_ITEMS, [(offer.id,) for offer in reindexed])
+            conn.executemany(_INSERT_OFFER_ITEM, [
+                (offer.id, position, item_id) for offer in reindexed for position, item_id in enumerate(offer.applicable_items)
+            ])
+            conn.execute(_BUMP_VERSION, ("offers",))
+        return offers
+
+    def delete_offers(self, offer_ids: Iterable[str]) -> Dict[str, Offer]:
+        with self._transaction() as conn:
+            deleted = self._select_offers(conn, list(offer_ids))
+            conn.executemany(_DELETE_OFFER, [(offer_id,) for offer_id in deleted])
+            conn.execute(_BUMP_VERSION, ("offers",))
+        return deleted
+
+    def active_offers(self, now: Optional[datetime] = None) -> Dict[str, Offer]:
+        ts = (now or datetime.now()).timestamp()
+        conn = self._pool.get()
+        return self._load_offers(conn, conn.execute(_SELECT_ACTIVE_OFFERS, (ts, ts)).fetchall())
+
+    def offers_active_at(self, when: datetime) -> List[Offer]:
+        return list(self.active_offers(when).values())
+
+    def active_offers_for_items(self, item_ids: Iterable[str], now: Optional[datetime] = None) -> Dict[str, List[Offer]]:
+        ts = (now or datetime.now()).timestamp()
+        conn = self._pool.get()
+        offer_ids_by_item = {}
+        for chunk in _chunks(list(dict.fromkeys(item_ids))):
+            sql = _SELECT_ACTIVE_OFFER_IDS_FOR_ITEMS.format(_placeholders(len(chunk)))
+            for item_id, offer_id in conn.execute(sql, list(chunk) + [ts, ts]):
+                offer_ids_by_item.setdefault(item_id, []).append(offer_id)
+        if not offer_ids_by_item:
+            return {}
+
+        offers = self._select_offers(conn, [offer_id for offer_ids in offer_ids_by_item.values() for offer_id in offer_ids])
+        return {item_id: [offers[offer_id] for offer_id in offer_ids] for item_id, offer_ids in offer_ids_by_item.items()}
+
+    # Orders
+
+    def get_order(self, order_id: str) -> Optional[Order]:
+        conn = self._pool.get()
+        row = conn.execute(_SELECT_ORDER, (order_id,)).fetchone()
+        if row is None:
+            return None
+        order = _order_from_row(row)
+        order.items.extend(_order_item_from_row(line) for line in conn.execute(_SELECT_ORDER_ITEMS, (order_id,)))
+        return order
+
+    def page_orders(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        with_items: bool = True
+    ) -> Tuple[List[Order], Optional[str]]:
+        conditions = []
+        params = []
+        if cursor is not None:
+            key = decode_cursor(cursor)
+            if len(key) != 2 or not all(isinstance(value, (int, float)) for value in key):
+                raise ValueError(f"Invalid cursor: {cursor}")
+            conditions.append("(created_ts, rowid) > (?, ?)")
+            params.extend(key)
+        if created_from is not None:
+            conditions.append("created_ts >= ?")
+            params.append(created_from.timestamp())
+        if created_to is not None:
+            conditions.append("created_ts <= ?")
+            params.append(created_to.timestamp())
+
+        conn = self._pool.get()
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+        # Fetch one extra row to know whether there is a next page
+        rows = conn.execute(
+            f"SELECT created_ts, rowid, {_ORDER_COLUMNS} FROM orders {where}ORDER BY created_ts, rowid LIMIT ?",
+            params + [limit + 1]
+        ).fetchall()
+        next_cursor = encode_cursor(list(rows[limit - 1][:2])) if len(rows) > limit else None
+
+        orders = {}
+        for row in rows[:limit]:
+            orders[row[2]] = _order_from_row(row[2:])
+        if not with_items:
+            return list(orders.values()), next_cursor
+        for chunk in _chunks(list(orders)):
+            sql = (
+                "SELECT order_id, item_id, quantity, unit_price, applied_offer_id, discount_amount FROM order_items "
+                f"WHERE order_id IN ({_placeholders(len(chunk))}) ORDER BY order_id, position"
+            )
+            for line in conn.execute(sql, chunk):
+                orders[line[0]].items.append(_order_item_from_row(line[1:]))
+        return list(orders.values()), next_cursor
+
+    def list_orders(self) -> List[Order]:
+        orders = []
+        current = None
+        for row in self._pool.get().execute(_SELECT_ORDERS):
+            if current is None or current.id != row[0]:
+                current = _order_from_row(row)
+                orders.append(current)
+            current.items.append(_order_item_from_row(row[5:]))
+        return orders
+
+    def _place_order(self, conn: sqlite3.Connection, order: Order, quantities: Dict[str, int]) -> List[str]:
+        errors = []
+        for item_id, quantity in quantities.items():
+            if conn.execute(_TAKE_STOCK, (quantity, item_id, quantity)).rowcount == 1:
+                continue
+            row = conn.execute(_SELECT_STOCK, (item_id,)).fetchone()
+            if row is None:
+                errors.append(f"Item with ID {item_id} not found")
+            else:
+                errors.append(f"Not enough stock for item {row[0]}. Available: {row[1]}, Requested: {quantity}")
+        if errors:
+            # Undo the stock already taken for earlier lines
+            raise _OrderRejected(errors)
+
+        conn.execute(_BUMP_VERSION, ("items",))
+        conn.execute(_INSERT_ORDER, (
+            order.id, order.total_amount, order.discount_amount, order.final_amount,
+            order.created_at.isoformat(), order.created_at.timestamp()
+        ))
+        conn.executemany(_INSERT_ORDER_ITEM, [
+            (order.id, position, line.item_id, line.quantity, line.unit_price, line.applied_offer_id, line.discount_amount)
+            for position, line in enumerate(order.items)
+        ])
+        return errors
+
+    def _reserve(self, quantities: Dict[str, int]) -> List[str]:
+        # Takes the order's stock from the shared counters; returns the errors if it cannot
+        failures = self._stock.reserve(quantities)
+        if not failures:
+            return []
+        items = self.get_items(failures)
+        errors = []
+        for item_id, available in failures.items():
+            item = items.get(item_id)
+            if item is None:
+                errors.append(f"Item with ID {item_id} not found")
+            else:
+                # The counter may have run out before the table, which still holds stock for orders in flight
+                errors.append(f"Not enough stock for item {item.name}. Available: {max(available or 0, 0)}, Requested: {quantities[item_id]}")
+        return errors
+
+    def place_order(self, order: Order) -> List[str]:
+        quantities = _quantities(order)
+        if self._stock is not None:
+            errors = self._reserve(quantities)
+            if errors:
+                return errors
+        placed = False
+        try:
+            with self._transaction() as conn:
+                errors = self._place_order(conn, order, quantities)
+            placed = True
+            return errors
+        except _OrderRejected as rejected:
+            return rejected.errors
+        finally:
+            if self._stock is not None and not placed:
+                self._stock.adjust(quantities)
+
+    def place_orders(self, orders: List[Order]) -> List[List[str]]:
+        # One transaction for the batch; a savepoint per order lets a rejected
+        # order roll back on its own
+        results = []
+        reserved = []
+        committed = False
+        try:
+            with self._transaction() as conn:
+                for order in orders:
+                    quantities = _quantities(order)
+                    if self._stock is not None:
+                        errors = self._reserve(quantities)
+                        if errors:
+                            results.append(errors)
+                            continue
+                    conn.execute("SAVEPOINT place_order")
+                    try:
+                        results.append(self._place_order(conn, order, quantities))
+                        if self._stock is not None:
+                            reserved.append(quantities)
+                    except _OrderRejected as rejected:
+                        conn.execute("ROLLBACK TO place_order")
+                        results.append(rejected.errors)
+                        if self._stock is not None:
+                            self._stock.adjust(quantities)
+                    conn.execute("RELEASE place_order")
+            committed = True
+        finally:
+            if not committed:
+                for quantities in reserved:
+                    self._stock.adjust(quantities)
+        return results
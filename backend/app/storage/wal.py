@@ -0,0 +1,278 @@
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Frame header: payload length and CRC-32 of the payload
+_FRAME = struct.Struct("<II")
+_SEGMENT_FILE = re.compile(r"wal-(\d+)\.log")
+_SNAPSHOT_FILE = re.compile(r"snapshot-(\d+)\.jsonl")
+
+def _encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+class _Rotate:
+    """
+    Marker in the pending queue: start a new segment at this LSN.
+    """
+    __slots__ = ("lsn",)
+
+    def __init__(self, lsn: int):
+        self.lsn = lsn
+
+class WriteAheadLog:
+    """
+    Append-only log of JSON records in numbered segment files, plus snapshots.
+    Every record gets a log sequence number (LSN), counting from 0.
+
+    Appends only queue the encoded record. A flusher thread writes everything
+    queued and syncs it with a single fsync (group commit), at most once per
+    `flush_interval` seconds. With `sync_writes`, `append` waits until its
+    record is on disk; otherwise up to `flush_interval` of writes can be lost
+    in a crash.
+
+    A snapshot covers every record before its LSN. Writing one starts a new
+    segment, and once it is complete, older segments and snapshots are deleted.
+    """
+    def __init__(self, path: str, flush_interval: float = 0.01, sync_writes: bool = False):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.sync_writes = sync_writes
+        self._cond = threading.Condition()
+        self._pending: List[Any] = []
+        self._next_lsn = 0
+        self._durable_lsn = 0
+        self._file = None
+        self._closed = False
+        self._failed: Optional[BaseException] = None
+        self._flusher: Optional[threading.Thread] = None
+
+    # Startup
+
+    def recover(self, load_snapshot: Callable[[dict, Iterator[Any]], None], apply: Callable[[str, Any, int], None]) -> int:
+        """
+        Load the newest snapshot, then apply every logged record after it in order.
+        `load_snapshot` gets the snapshot header and an iterator over its entries,
+        or a header with LSN 0 and no entries when there is no snapshot;
+        `apply` gets each record's kind, data and LSN.
+        A torn or corrupt tail is cut off. Starts the flusher and returns the
+        number of records applied.
+        """
+        for name in os.listdir(self.path):
+            if name.endswith(".tmp"):
+                # A snapshot that was being written when the process stopped
+                os.remove(os.path.join(self.path, name))
+        start = 0
+        snapshots = self._files(_SNAPSHOT_FILE)
+        if snapshots:
+            start, name = snapshots[-1]
+            with open(os.path.join(self.path, name), "rb") as file:
+                header = json.loads(file.readline())
+                load_snapshot(header, (json.loads(line) for line in file))
+            logger.info("Loaded snapshot %s", name)
+        else:
+            load_snapshot({"lsn": 0}, iter(()))
+
+        applied = 0
+        lsn = start
+        segments = self._files(_SEGMENT_FILE)
+        last_segment = None
+        for index, (first, name) in enumerate(segments):
+            if index + 1 < len(segments) and segments[index + 1][0] <= start:
+                # Entirely covered by the snapshot
+                continue
+            if first > lsn:
+                logger.warning("Log records %s to %s are missing; dropping %s and later segments", lsn, first - 1, name)
+                for _, later in segments[index:]:
+                    os.remove(os.path.join(self.path, later))
+                break
+            lsn, count, complete = self._replay(name, first, start, apply)
+            applied += count
+            last_segment = name
+            if not complete:
+                for _, later in segments[index + 1:]:
+                    logger.warning("Dropping log segment %s after a torn record", later)
+                    os.remove(os.path.join(self.path, later))
+                break
+
+        self._next_lsn = self._durable_lsn = max(lsn, start)
+        if last_segment is None:
+            last_segment = f"wal-{self._next_lsn:020d}.log"
+        self._file = open(os.path.join(self.path, last_segment), "ab")
+        self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+        self._flusher.start()
+        logger.info("Recovered %s log record(s); next LSN is %s", applied, self._next_lsn)
+        return applied
+
+    def _replay(self, name: str, first: int, start: int, apply: Callable[[str, Any, int], None]) -> Tuple[int, int, bool]:
+        path = os.path.join(self.path, name)
+        with open(path, "rb") as file:
+            data = file.read()
+        offset = 0
+        lsn = first
+        applied = 0
+        while offset < len(data):
+            if offset + _FRAME.size > len(data):
+                break
+            length, checksum = _FRAME.unpack_from(data, offset)
+            payload = data[offset + _FRAME.size:offset + _FRAME.size + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            if lsn >= start:
+                kind, value = json.loads(payload)
+                apply(kind, value, lsn)
+                applied += 1
+            offset += _FRAME.size + length
+            lsn += 1
+        complete = offset == len(data)
+        if not complete:
+            logger.warning("Cutting torn record off %s at byte %s", name, offset)
+            with open(path, "r+b") as file:
+                file.truncate(offset)
+        return lsn, applied, complete
+
+    def _files(self, pattern: re.Pattern) -> List[Tuple[int, str]]:
+        files = []
+        for name in os.listdir(self.path):
+            match = pattern.fullmatch(name)
+            if match:
+                files.append((int(match.group(1)), name))
+        files.sort()
+        return files
+
+    # Writing
+
+    def append(self, kind: str, value: Any) -> int:
+        """
+        Queue a record and return its LSN. Callers must append records in the
+        order their changes were applied.
+        """
+        payload = _encode([kind, value])
+        frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._cond:
+            if self._failed is not None:
+                raise RuntimeError("Write-ahead log is unavailable") from self._failed
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            self._pending.append(frame)
+            self._cond.notify_all()
+            if self.sync_writes:
+                self._wait_durable(lsn + 1)
+        return lsn
+
+    @property
+    def next_lsn(self) -> int:
+        return self._next_lsn
+
+    def wait_durable(self, lsn: int):
+        """
+        Wait until every record before `lsn` is on disk.
+        """
+        with self._cond:
+            self._wait_durable(lsn)
+
+    def _wait_durable(self, lsn: int):
+        self._cond.wait_for(lambda: self._durable_lsn >= lsn or self._failed is not None)
+        if self._durable_lsn < lsn:
+            raise RuntimeError("Write-ahead log is unavailable") from self._failed
+
+    def _flush_loop(self):
+        last_flush = 0.0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if not self._pending and self._closed:
+                    return
+            # Let more records gather so one fsync covers them all
+            delay = last_flush + self.flush_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with self._cond:
+                pending, self._pending = self._pending, []
+                upto = self._next_lsn
+            try:
+                self._write(pending)
+            except BaseException as e:
+                logger.exception("Write-ahead log flush failed")
+                with self._cond:
+                    self._failed = e
+                    self._cond.notify_all()
+                return
+            last_flush = time.monotonic()
+            with self._cond:
+                self._durable_lsn = upto
+                self._cond.notify_all()
+
+    def _write(self, pending: List[Any]):
+        frames = []
+        for entry in pending:
+            if isinstance(entry, _Rotate):
+                self._sync(frames)
+                frames = []
+                self._file.close()
+                self._file = open(os.path.join(self.path, f"wal-{entry.lsn:020d}.log"), "ab")
+            else:
+                frames.append(entry)
+        self._sync(frames)
+
+    def _sync(self, frames: List[bytes]):
+        if frames:
+            self._file.write(b"".join(frames))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    # Snapshots
+
+    def rotate(self) -> int:
+        """
+        Start a new segment for the records that follow. Returns the LSN it starts at.
+        """
+        with self._cond:
+            lsn = self._next_lsn
+            self._pending.append(_Rotate(lsn))
+            self._cond.notify_all()
+        return lsn
+
+    def write_snapshot(self, lsn: int, header: dict, entries: Iterable[Any]):
+        """
+        Write a snapshot covering every record before `lsn`, then delete the
+        segments and snapshots it replaces.
+        """
+        path = os.path.join(self.path, f"snapshot-{lsn:020d}.jsonl")
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(_encode({**header, "lsn": lsn}) + b"\n")
+            for entry in entries:
+                file.write(_encode(entry) + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+        # The snapshot may cover records that are not on disk yet
+        self.wait_durable(lsn)
+        os.replace(temporary, path)
+
+        for first, name in self._files(_SEGMENT_FILE):
+            if first < lsn:
+                os.remove(os.path.join(self.path, name))
+        for first, name in self._files(_SNAPSHOT_FILE):
+            if first < lsn:
+                os.remove(os.path.join(self.path, name))
+
+    def close(self):
+        """
+        Flush every queued record and stop the flusher.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._file is not None:
+            self._file.close()
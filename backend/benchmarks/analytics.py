@@ -0,0 +1,118 @@
+"""
+Benchmark for the sales analytics aggregates.
+
+Seeds the storage with a synthetic catalog and places orders, then reports as
+JSON:
+- what recording an order costs on top of placing it
+- how long dashboard queries take from the aggregates
+- how long computing per-category totals by scanning every order takes
+- how long a rebuild from the order history takes
+
+Run from the backend directory:
+    python -m benchmarks.analytics --orders 100000 --output analytics.json
+
+Set INVENTORY_DATABASE_URL to run it against another storage backend.
+"""
+from app.analytics import sales_analytics
+from app.database import db
+from app.models import SalesInterval
+from app.services import process_order
+from benchmarks.catalog import make_carts, seed_catalog
+from benchmarks.report import summarize, write_report
+import argparse
+import logging
+import random
+import time
+
+def time_calls(function, count: int):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def scan_categories():
+    # What a dashboard had to do before: read every order and total it up
+    categories = {}
+    item_categories = {}
+    for order in db.iter_orders():
+        missing = [line.item_id for line in order.items if line.item_id not in item_categories]
+        if missing:
+            for item_id, item in db.get_items(missing).items():
+                item_categories[item_id] = item.category
+        for line in order.items:
+            category = item_categories.get(line.item_id)
+            categories[category] = categories.get(category, 0) + line.unit_price * line.quantity - line.discount_amount
+    return categories
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--offers", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    items, _ = seed_catalog(db, args.items, args.offers, rng)
+    item_ids = list(items)
+    # Build the empty aggregates first, so every order below is recorded live
+    sales_analytics.totals()
+
+    carts = make_carts(item_ids, args.orders, args.lines, rng)
+    placed = []
+    start = time.perf_counter()
+    for cart in carts:
+        order, errors = process_order(cart)
+        if not errors:
+            placed.append(order)
+    place_time = time.perf_counter() - start
+
+    # Recording again double counts, which does not matter for timing
+    sample = placed[:args.queries]
+    record_latencies = []
+    for order in sample:
+        order_items = {line.item_id: items[line.item_id] for line in order.items}
+        start = time.perf_counter()
+        sales_analytics.record(order, order_items)
+        record_latencies.append(time.perf_counter() - start)
+
+    queries = {
+        "totals": sales_analytics.totals,
+        "item": lambda: sales_analytics.item(rng.choice(item_ids)),
+        "top_items": lambda: sales_analytics.top_items(10),
+        "categories": sales_analytics.categories,
+        "offers": lambda: sales_analytics.offers(10),
+        "daily_series": lambda: sales_analytics.series(SalesInterval.DAY),
+        "hourly_series": lambda: sales_analytics.series(SalesInterval.HOUR),
+    }
+    results = {
+        "place_orders_s": place_time,
+        "record": summarize(record_latencies),
+    }
+    for name, query in queries.items():
+        results[name] = summarize(time_calls(query, args.queries))
+
+    start = time.perf_counter()
+    scan_categories()
+    results["scan_categories_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    sales_analytics.rebuild()
+    results["rebuild_ms"] = (time.perf_counter() - start) * 1000
+    db.close()
+
+    write_report(
+        "analytics",
+        {name: value for name, value in vars(args).items() if name != "output"},
+        results,
+        args.output
+    )
+
+if __name__ == "__main__":
+    main()
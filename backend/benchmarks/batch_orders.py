@@ -0,0 +1,82 @@
+"""
+Throughput benchmark for batch order placement.
+
+Places the same random carts once through N single process_order calls and
+once through process_orders in batches, and reports orders per second for each.
+
+Run from the backend directory:
+    python -m benchmarks.batch_orders --orders 5000 --batch-size 100
+"""
+from app.models import Item, Offer, OrderItem
+from app.database import db
+from app.services import process_order, process_orders
+import argparse
+import logging
+import random
+import time
+
+def seed_catalog(item_count: int, offer_count: int, rng: random.Random):
+    items = [
+        Item(
+            name=f"Batch item {i}",
+            description="Benchmark item",
+            price=round(rng.uniform(1, 500), 2),
+            stock=10 ** 9,
+            category=f"Category {i % 20}"
+        )
+        for i in range(item_count)
+    ]
+    db.add_items(items)
+
+    item_ids = [item.id for item in items]
+    offers = [
+        Offer(
+            name=f"Batch offer {i}",
+            description="Benchmark offer",
+            offer_type=rng.choice(["percentage", "fixed"]),
+            discount_value=rng.uniform(1, 30),
+            applicable_items=rng.sample(item_ids, min(20, len(item_ids)))
+        )
+        for i in range(offer_count)
+    ]
+    db.add_offers(offers)
+    return item_ids
+
+def make_carts(item_ids, count: int, max_lines: int, rng: random.Random):
+    return [
+        [OrderItem(item_id=item_id, quantity=rng.randint(1, 3), unit_price=0)
+         for item_id in rng.sample(item_ids, rng.randint(1, max_lines))]
+        for _ in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--offers", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-lines", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    item_ids = seed_catalog(args.items, args.offers, rng)
+    carts = make_carts(item_ids, args.orders, args.max_lines, rng)
+
+    start = time.perf_counter()
+    for cart in carts:
+        process_order(cart)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for offset in range(0, len(carts), args.batch_size):
+        process_orders(carts[offset:offset + args.batch_size])
+    batched = time.perf_counter() - start
+
+    print(f"orders={args.orders} items={args.items} offers={args.offers} batch_size={args.batch_size}")
+    print(f"single: {single:.3f}s {args.orders / single:.0f} orders/s")
+    print(f"batch:  {batched:.3f}s {args.orders / batched:.0f} orders/s ({single / batched:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Synthetic catalogs shared by the benchmarks.
+
+Items are spread over 20 categories with stock high enough that orders never
+run out. Offers mix percentage, fixed and buy X get Y rules, each covering 20
+random items, and one in five is scheduled to start yesterday or tomorrow.
+The same seed always gives the same catalog, apart from generated IDs.
+"""
+from app.models import Item, Offer, OrderItem
+from app.storage import Storage
+from datetime import datetime, timedelta
+import random
+
+# Records added to the storage per call when seeding
+SEED_BATCH_SIZE = 10000
+
+def make_catalog(item_count: int, offer_count: int, rng: random.Random):
+    items = {}
+    for i in range(item_count):
+        item = Item(
+            name=f"Benchmark item {i}",
+            description="Benchmark item",
+            price=round(rng.uniform(1, 500), 2),
+            stock=10 ** 9,
+            category=f"Category {i % 20}"
+        )
+        items[item.id] = item
+
+    item_ids = list(items)
+    now = datetime.now()
+    offers = []
+    for i in range(offer_count):
+        offer_type = rng.choice(["percentage", "fixed", "buy_x_get_y"])
+        # Some offers are scheduled, so validity checks are part of the work
+        start_date = now + timedelta(days=rng.choice([-1, 1])) if i % 5 == 0 else None
+        offers.append(Offer(
+            name=f"Benchmark offer {i}",
+            description="Benchmark offer",
+            offer_type=offer_type,
+            discount_value=rng.randint(1, 2) if offer_type == "buy_x_get_y" else rng.uniform(1, 30),
+            min_quantity=rng.randint(1, 3),
+            applicable_items=rng.sample(item_ids, min(20, len(item_ids))),
+            start_date=start_date
+        ))
+    return items, offers
+
+def make_carts(item_ids, count: int, lines: int, rng: random.Random):
+    return [
+        [OrderItem(item_id=item_id, quantity=rng.randint(1, 5), unit_price=0)
+         for item_id in rng.sample(item_ids, min(lines, len(item_ids)))]
+        for _ in range(count)
+    ]
+
+def seed_catalog(storage: Storage, item_count: int, offer_count: int, rng: random.Random):
+    """
+    Add a synthetic catalog to the storage and return its items by ID and its offers.
+    """
+    items, offers = make_catalog(item_count, offer_count, rng)
+    records = list(items.values())
+    for start in range(0, len(records), SEED_BATCH_SIZE):
+        storage.add_items(records[start:start + SEED_BATCH_SIZE])
+    for start in range(0, len(offers), SEED_BATCH_SIZE):
+        storage.add_offers(offers[start:start + SEED_BATCH_SIZE])
+    return items, offers
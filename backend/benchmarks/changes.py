@@ -0,0 +1,102 @@
+"""
+Fan-out benchmark for the change feed.
+
+Connects many subscribers to a change feed in-process, some of them slow to
+read, publishes bursts of stock changes over a small set of items, and
+reports as JSON:
+- what publishing a change costs
+- how long until every subscriber has seen the last change
+- how many events each subscriber received after merging, and how many
+  subscribers fell so far behind that they were reset
+
+Run from the backend directory:
+    python -m benchmarks.changes --subscribers 1000 --changes 100000 --output changes.json
+"""
+from app.changes import ChangeFeed
+from benchmarks.report import summarize, write_report
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+async def subscribe(feed: ChangeFeed, delay: float, received: list, resets: list, index: int, published: asyncio.Event, last_id: str):
+    stream = feed.stream()
+    try:
+        async for chunk in stream:
+            received[index] += chunk.count("event: item")
+            if "event: reset" in chunk:
+                resets[index] += 1
+                if published.is_set():
+                    # The client would fetch the lists again, which includes the last change
+                    return time.perf_counter()
+            if last_id in chunk:
+                return time.perf_counter()
+            if delay:
+                # A slow client: the feed waits for it without buffering more for it
+                await asyncio.sleep(delay)
+    finally:
+        await stream.aclose()
+
+async def run(args):
+    rng = random.Random(args.seed)
+    feed = ChangeFeed(args.history)
+    item_ids = [f"item-{index}" for index in range(args.items)]
+    received = [0] * args.subscribers
+    resets = [0] * args.subscribers
+    last_id = "last-change"
+    published = asyncio.Event()
+    tasks = [
+        asyncio.create_task(subscribe(
+            feed, args.slow_delay if index < args.subscribers * args.slow_share else 0, received, resets, index, published, last_id
+        ))
+        for index in range(args.subscribers)
+    ]
+    # Let every subscriber connect
+    await asyncio.sleep(0.5)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(args.changes // args.burst):
+        for _ in range(args.burst):
+            change_start = time.perf_counter()
+            feed.publish("item", [{"id": rng.choice(item_ids), "stock": rng.randrange(1000)}])
+            latencies.append(time.perf_counter() - change_start)
+        # Give subscribers a turn between bursts, as request handling would
+        await asyncio.sleep(0)
+    publish_end = time.perf_counter()
+    published.set()
+    feed.publish("item", [{"id": last_id, "stock": 0}])
+    finished = await asyncio.gather(*tasks)
+    return {
+        "publish": summarize(latencies, publish_end - start),
+        "all_delivered_ms": (max(finished) - publish_end) * 1000,
+        "events_per_subscriber_mean": sum(received) / len(received),
+        "events_per_subscriber_min": min(received),
+        "subscribers_reset": sum(1 for count in resets if count),
+        "changes_published": args.changes,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=20000)
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=10000)
+    parser.add_argument("--slow-share", type=float, default=0.1, help="Share of subscribers that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Seconds a slow subscriber takes per read")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    write_report(
+        "changes",
+        {name: value for name, value in vars(args).items() if name != "output"},
+        asyncio.run(run(args)),
+        args.output
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark for checkout against a seeded catalog.
+
+Seeds the storage with a synthetic catalog, then times individual calls to
+calculate_applicable_offers and process_order for random carts, and reports
+their latency percentiles and calls per second as JSON.
+
+Run from the backend directory, once per catalog size:
+    python -m benchmarks.checkout --items 100000 --offers 10000 --output checkout.json
+
+Set INVENTORY_DATABASE_URL to run it against another storage backend.
+"""
+from app.database import db
+from app.models import OrderItem
+from app.services import calculate_applicable_offers, pricing_engine, process_order
+from benchmarks.catalog import make_carts, seed_catalog
+from benchmarks.report import summarize, write_report
+import argparse
+import logging
+import random
+import time
+
+def timed_calls(function, carts):
+    latencies = []
+    start = time.perf_counter()
+    for cart in carts:
+        call_start = time.perf_counter()
+        function(cart)
+        latencies.append(time.perf_counter() - call_start)
+    return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--offers", type=int, default=1000)
+    parser.add_argument("--carts", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    items, _ = seed_catalog(db, args.items, args.offers, rng)
+    seed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pricing_engine.rules()
+    compile_time = time.perf_counter() - start
+
+    carts = make_carts(list(items), args.carts, args.lines, rng)
+    # calculate_applicable_offers is given lines already priced, as process_order does
+    priced_carts = [
+        [OrderItem(item_id=line.item_id, quantity=line.quantity, unit_price=items[line.item_id].price) for line in cart]
+        for cart in carts
+    ]
+
+    offer_latencies, offer_time = timed_calls(calculate_applicable_offers, priced_carts)
+    order_latencies, order_time = timed_calls(process_order, carts)
+    db.close()
+
+    write_report(
+        "checkout",
+        {name: value for name, value in vars(args).items() if name != "output"},
+        {
+            "seed_s": seed_time,
+            "compile_offers_ms": compile_time * 1000,
+            "calculate_applicable_offers": summarize(offer_latencies, offer_time),
+            "process_order": summarize(order_latencies, order_time),
+        },
+        args.output
+    )
+
+if __name__ == "__main__":
+    main()
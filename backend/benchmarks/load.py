@@ -0,0 +1,134 @@
+"""
+In-process load test for the API.
+
+Seeds the storage with a synthetic catalog, then drives the ASGI app
+directly (no network or server) with concurrent clients running a mix of:
+- browse: GET an item page by category, a single item, or a single offer
+- order: POST /orders with a random cart
+- admin: POST /items-management/{id} with a new price
+
+All clients share one event loop, as the requests to one worker process do.
+Reports overall throughput and per-operation latency percentiles as JSON.
+
+Run from the backend directory:
+    python -m benchmarks.load --items 100000 --offers 10000 --concurrency 64 --duration 30
+
+Set INVENTORY_DATABASE_URL to run it against another storage backend.
+"""
+from app.database import db
+from benchmarks.catalog import seed_catalog
+from benchmarks.report import summarize, write_report
+from main import app
+import argparse
+import asyncio
+import httpx
+import logging
+import random
+import time
+
+OPERATIONS = ("browse", "order", "admin")
+
+def parse_mix(mix: str):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation in mix: {name}")
+        weights[name] = float(weight)
+    return weights
+
+class Workload:
+    """
+    Builds requests for each operation from the seeded catalog.
+    """
+    def __init__(self, item_ids, offer_ids, lines: int, rng: random.Random):
+        self.item_ids = item_ids
+        self.offer_ids = offer_ids
+        self.lines = lines
+        self.rng = rng
+
+    async def browse(self, client: httpx.AsyncClient) -> httpx.Response:
+        choice = self.rng.random()
+        if choice < 0.4:
+            return await client.get("/items/", params={"category": f"Category {self.rng.randrange(20)}", "limit": 20})
+        if choice < 0.8 or not self.offer_ids:
+            return await client.get(f"/items/{self.rng.choice(self.item_ids)}")
+        return await client.get(f"/offers/{self.rng.choice(self.offer_ids)}")
+
+    async def order(self, client: httpx.AsyncClient) -> httpx.Response:
+        cart = [
+            {"item_id": item_id, "quantity": self.rng.randint(1, 5), "unit_price": 0}
+            for item_id in self.rng.sample(self.item_ids, self.rng.randint(1, self.lines))
+        ]
+        return await client.post("/orders/", json=cart)
+
+    async def admin(self, client: httpx.AsyncClient) -> httpx.Response:
+        price = round(self.rng.uniform(1, 500), 2)
+        return await client.post(f"/items-management/{self.rng.choice(self.item_ids)}", json={"price": price})
+
+async def run(workload: Workload, weights, concurrency: int, duration: float, warmup: float):
+    names = list(weights)
+    cumulative = list(weights.values())
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    transport = httpx.ASGITransport(app=app)
+
+    async def client_loop(client: httpx.AsyncClient, measure_from: float, stop_at: float):
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            name = workload.rng.choices(names, cumulative)[0]
+            response = await getattr(workload, name)(client)
+            # Nothing in the in-process transport suspends, so give other clients a turn as a network would
+            await asyncio.sleep(0)
+            if now < measure_from:
+                continue
+            latencies[name].append(time.perf_counter() - now)
+            if response.status_code >= 400:
+                errors[name] += 1
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        start = time.perf_counter()
+        measure_from = start + warmup
+        stop_at = measure_from + duration
+        await asyncio.gather(*(client_loop(client, measure_from, stop_at) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - measure_from
+
+    total = sum(len(values) for values in latencies.values())
+    results = {
+        "requests": total,
+        "elapsed_s": elapsed,
+        "requests_per_second": total / elapsed,
+        "operations": {},
+    }
+    for name in names:
+        results["operations"][name] = {**summarize(latencies[name], elapsed), "errors": errors[name]}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--offers", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to measure for")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds to run before measuring")
+    parser.add_argument("--mix", type=parse_mix, default="browse=80,order=15,admin=5",
+                        help="Relative weights of the operations")
+    parser.add_argument("--lines", type=int, default=5, help="Most lines in an order")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    items, offers = seed_catalog(db, args.items, args.offers, rng)
+    workload = Workload(list(items), [offer.id for offer in offers], args.lines, rng)
+    results = asyncio.run(run(workload, args.mix, args.concurrency, args.duration, args.warmup))
+    db.close()
+
+    parameters = {name: value for name, value in vars(args).items() if name != "output"}
+    write_report("load", parameters, results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Memory benchmark for retained orders.
+
+Builds the same synthetic orders twice: once kept as Pydantic models in a
+dict with a sorted (timestamp, order ID) index, as the memory store used to
+hold them, and once packed into CompactOrders. Reports the bytes retained
+per order for each, measured with tracemalloc.
+
+Run from the backend directory:
+    python -m benchmarks.order_memory --orders 20000
+"""
+from app.models import Order, OrderItem
+from app.storage.records import CompactOrders
+from datetime import datetime, timedelta
+import argparse
+import bisect
+import gc
+import random
+import sys
+import tracemalloc
+import uuid
+
+def make_order(item_ids, offer_ids, created_at: datetime, rng: random.Random) -> Order:
+    items = []
+    for item_id in rng.sample(item_ids, rng.randint(1, 5)):
+        quantity = rng.randint(1, 5)
+        unit_price = rng.randint(100, 50000)
+        discounted = rng.random() < 0.3
+        items.append(OrderItem(
+            item_id=item_id,
+            quantity=quantity,
+            unit_price=unit_price / 100,
+            applied_offer_id=rng.choice(offer_ids) if discounted else None,
+            discount_amount=unit_price * quantity // 10 / 100 if discounted else 0
+        ))
+    total = sum(line.unit_price * line.quantity for line in items)
+    discount = sum(line.discount_amount for line in items)
+    return Order(
+        items=items,
+        total_amount=total / 100,
+        discount_amount=discount / 100,
+        final_amount=(total - discount) / 100,
+        created_at=created_at
+    )
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        store = build()
+        gc.collect()
+        used, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del store
+    return used
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Catalog IDs exist in both layouts already, so they are created outside the measurement
+    item_ids = [str(uuid.uuid4()) for _ in range(args.items)]
+    offer_ids = [str(uuid.uuid4()) for _ in range(args.items // 10 or 1)]
+    start = datetime(2024, 1, 1)
+
+    def orders():
+        rng = random.Random(args.seed)
+        for i in range(args.orders):
+            yield make_order(item_ids, offer_ids, start + timedelta(seconds=i), rng)
+
+    def build_models():
+        store = {}
+        keys = []
+        for order in orders():
+            store[order.id] = order
+            bisect.insort(keys, (order.created_at.timestamp(), order.id))
+        return store, keys
+
+    def build_compact():
+        store = CompactOrders()
+        for order in orders():
+            store.add(order)
+        return store
+
+    models = measure(build_models)
+    compact = measure(build_compact)
+    print(f"orders={args.orders} items={args.items}")
+    print(f"pydantic models: {models / args.orders:8.1f} bytes per order")
+    print(f"compact records: {compact / args.orders:8.1f} bytes per order ({models / compact:.1f}x smaller)")
+
+    # Round trip check: records decode to the orders they were built from
+    store = CompactOrders()
+    for order in orders():
+        store.add(order)
+        if store.get(order.id) != order:
+            print(f"FAILED: order {order.id} did not round-trip")
+            sys.exit(1)
+    print("OK: every order round-trips")
+
+if __name__ == "__main__":
+    main()
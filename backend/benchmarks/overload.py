@@ -0,0 +1,126 @@
+"""
+Overload benchmark for admission control.
+
+Seeds the storage with a synthetic catalog, then drives the ASGI app
+in-process with:
+- orders: POST /orders with large carts, arriving at a fixed `--order-rate`
+  whether or not earlier ones finished, as in a flash sale
+- reads: `--readers` clients fetching single items back to back
+
+Reports as JSON the latency of reads and of orders that were accepted, how
+many orders were turned away with 503, and the admission metrics. Run it with
+and without `--no-admission` to compare; pick an order rate above what the
+process can price to see load shedding.
+
+Run from the backend directory:
+    python -m benchmarks.overload --order-rate 400 --lines 50 --duration 10
+    python -m benchmarks.overload --order-rate 400 --lines 50 --duration 10 --no-admission
+"""
+from benchmarks.catalog import seed_catalog
+from benchmarks.report import summarize, write_report
+import argparse
+import asyncio
+import httpx
+import logging
+import os
+import random
+import time
+
+async def run(app, item_ids, args, rng: random.Random):
+    reads = []
+    orders = []
+    rejected = 0
+    failed = 0
+    transport = httpx.ASGITransport(app=app)
+
+    async def place_order(client: httpx.AsyncClient, arrival: float, measured: bool):
+        nonlocal rejected, failed
+        cart = [
+            {"item_id": item_id, "quantity": rng.randint(1, 5), "unit_price": 0}
+            for item_id in rng.sample(item_ids, args.lines)
+        ]
+        response = await client.post("/orders/", json=cart)
+        if not measured:
+            return
+        if response.status_code == 503:
+            rejected += 1
+        elif response.status_code >= 400:
+            failed += 1
+        else:
+            # Timed from when the order arrived, including any wait for the event loop
+            orders.append(time.perf_counter() - arrival)
+
+    async def read_loop(client: httpx.AsyncClient, measure_from: float, stop_at: float):
+        nonlocal failed
+        while True:
+            start = time.perf_counter()
+            if start >= stop_at:
+                return
+            response = await client.get(f"/items/{rng.choice(item_ids)}")
+            # Nothing in the in-process transport suspends, so give other clients a turn as a network would
+            await asyncio.sleep(0)
+            if start >= measure_from:
+                reads.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    failed += 1
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        start = time.perf_counter()
+        measure_from = start + args.warmup
+        stop_at = measure_from + args.duration
+        readers = [asyncio.create_task(read_loop(client, measure_from, stop_at)) for _ in range(args.readers)]
+        pending = set()
+        arrival = start + rng.expovariate(args.order_rate)
+        while arrival < stop_at:
+            # Orders arrive on schedule even when the process is behind:
+            # every order due by now is sent at once
+            now = time.perf_counter()
+            while arrival <= now and arrival < stop_at:
+                task = asyncio.create_task(place_order(client, arrival, arrival >= measure_from))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                arrival += rng.expovariate(args.order_rate)
+            await asyncio.sleep(max(arrival - time.perf_counter(), 0))
+        await asyncio.gather(*readers, *pending)
+        elapsed = time.perf_counter() - measure_from
+
+    return {
+        "reads": summarize(reads, elapsed),
+        "orders_accepted": summarize(orders, elapsed),
+        "orders_rejected": rejected,
+        "errors": failed,
+        "elapsed_s": elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--offers", type=int, default=1000)
+    parser.add_argument("--order-rate", type=float, default=400, help="Orders arriving per second")
+    parser.add_argument("--lines", type=int, default=50, help="Lines in each order")
+    parser.add_argument("--readers", type=int, default=8, help="Clients reading items back to back")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to measure for")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds to run before measuring")
+    parser.add_argument("--no-admission", action="store_true", help="Admit every request, as without admission control")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    # Read when the app is imported
+    os.environ["ADMISSION_CONTROL"] = "false" if args.no_admission else "true"
+    from app.database import db
+    from app.metrics import render
+    from main import app
+
+    logging.disable(logging.WARNING)
+    rng = random.Random(args.seed)
+    items, _ = seed_catalog(db, args.items, args.offers, rng)
+    results = asyncio.run(run(app, list(items), args, rng))
+    results["admission_metrics"] = [line for line in render().splitlines() if line.startswith("admission_") and "_bucket" not in line]
+    db.close()
+
+    parameters = {name: value for name, value in vars(args).items() if name != "output"}
+    write_report("overload", parameters, results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for the pricing engine.
+
+Compiles a synthetic set of percentage, fixed and buy X get Y offers once,
+then prices random carts and reports the time per priced cart, both for the
+rule evaluation alone and for the full price_order call.
+When NumPy is installed, the columnar path is timed too and its results are
+checked against the scalar path.
+
+Run from the backend directory:
+    python -m benchmarks.pricing --lines 500 --carts 200
+"""
+from app.models import OrderItem
+from app.pricing import compile_offers, price_lines
+from app.services import price_lines_columnar, price_order
+from benchmarks.catalog import make_carts, make_catalog
+import argparse
+import logging
+import random
+import sys
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--offers", type=int, default=1000)
+    parser.add_argument("--carts", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    items, offers = make_catalog(args.items, args.offers, rng)
+    carts = make_carts(list(items), args.carts, args.lines, rng)
+
+    start = time.perf_counter()
+    rules = compile_offers(offers)
+    compile_time = time.perf_counter() - start
+
+    priced_carts = []
+    for cart in carts:
+        priced_carts.append([
+            OrderItem(item_id=line.item_id, quantity=line.quantity, unit_price=items[line.item_id].price)
+            for line in cart
+        ])
+    categories = [[items[line.item_id].category for line in cart] for cart in priced_carts]
+
+    start = time.perf_counter()
+    for cart, cart_categories in zip(priced_carts, categories):
+        price_lines(rules, cart, cart_categories)
+    rules_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for cart in carts:
+        price_order(cart, items, rules, columnar=False)
+    order_time = time.perf_counter() - start
+
+    print(f"items={args.items} offers={args.offers} carts={args.carts} lines={args.lines}")
+    print(f"compile:     {compile_time * 1000:.2f}ms")
+    print(f"price_lines: {rules_time / args.carts * 1000:.3f}ms per cart")
+    print(f"price_order: {order_time / args.carts * 1000:.3f}ms per cart")
+
+    if price_lines_columnar is None:
+        print("columnar:    skipped (NumPy is not installed)")
+        return
+
+    now = time.time()
+    price_lines_columnar(rules, priced_carts[0], categories[0], now)
+    start = time.perf_counter()
+    for cart, cart_categories in zip(priced_carts, categories):
+        price_lines_columnar(rules, cart, cart_categories, now)
+    columnar_time = time.perf_counter() - start
+    print(f"columnar:    {columnar_time / args.carts * 1000:.3f}ms per cart ({rules_time / columnar_time:.2f}x)")
+
+    mismatches = sum(
+        price_lines(rules, cart, cart_categories, now) != price_lines_columnar(rules, cart, cart_categories, now)
+        for cart, cart_categories in zip(priced_carts, categories)
+    )
+    if mismatches:
+        print(f"FAILED: {mismatches} cart(s) priced differently by the columnar path")
+        sys.exit(1)
+    print("OK: columnar results identical to scalar")
+
+if __name__ == "__main__":
+    main()
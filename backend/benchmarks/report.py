@@ -0,0 +1,63 @@
+"""
+Latency summaries and JSON reports for the benchmarks, so runs can be compared over time.
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
+import json
+import platform
+import subprocess
+import sys
+
+def percentile(ordered: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+def summarize(latencies: List[float], elapsed: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Summarize latencies given in seconds, in milliseconds.
+    With `elapsed`, the throughput over that many seconds is included.
+    """
+    ordered = sorted(latencies)
+    summary = {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.5) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+    if elapsed is not None:
+        summary["per_second"] = len(ordered) / elapsed if elapsed > 0 else 0.0
+    return summary
+
+def _commit() -> Optional[str]:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+def write_report(benchmark: str, parameters: Dict[str, Any], results: Dict[str, Any], output: Optional[str] = None):
+    """
+    Write a benchmark report as JSON to `output`, or to stdout.
+    The report records when and where it ran, and the git commit, alongside the results.
+    """
+    report = {
+        "benchmark": benchmark,
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": parameters,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output is None:
+        sys.stdout.write(text + "\n")
+    else:
+        with open(output, "w") as file:
+            file.write(text + "\n")
@@ -0,0 +1,104 @@
+"""
+Benchmark for the item search index.
+
+Builds a catalog whose names and descriptions are drawn from a synthetic
+vocabulary with a Zipf-like word frequency, indexes it, then times searches
+of one and two words, category-filtered searches, and typeahead requests for
+the first letters of a word. Reports build time and latency percentiles as JSON.
+
+Run from the backend directory:
+    python -m benchmarks.search --items 1000000
+"""
+from app.models import Item
+from app.search import SearchIndex
+from app.storage import MemoryStorage
+from benchmarks.report import summarize, write_report
+import argparse
+import itertools
+import logging
+import random
+import time
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "tor", "vex", "sa", "ri", "un", "bel", "co", "dra", "fi", "gu", "ho", "pla"]
+
+def make_vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def make_items(count: int, vocabulary, rng: random.Random):
+    # Word i is drawn with weight 1 / (i + 1), so a few words are very common
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    def words(k):
+        return rng.choices(vocabulary, cum_weights=weights, k=k)
+    return [
+        Item(
+            name=" ".join(words(rng.randint(2, 4))).title(),
+            description=" ".join(words(rng.randint(6, 12))),
+            price=round(rng.uniform(1, 500), 2),
+            stock=rng.randint(0, 100),
+            category=f"Category {i % 50}"
+        )
+        for i in range(count)
+    ]
+
+def timed(queries, run):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        run(query)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    items = make_items(args.items, vocabulary, rng)
+    storage = MemoryStorage()
+    storage.add_items(items)
+
+    index = SearchIndex(storage)
+    start = time.perf_counter()
+    len(index)
+    build_time = time.perf_counter() - start
+
+    # Queries are words from real item names, so most of them match something
+    names = [rng.choice(items).name.split() for _ in range(args.queries)]
+    one_word = [rng.choice(words) for words in names]
+    two_words = [" ".join(rng.sample(words, 2)) for words in names]
+    prefixes = [word[:3] for word in one_word]
+    categories = [f"Category {rng.randrange(50)}" for _ in range(args.queries)]
+
+    results = {
+        "build_s": build_time,
+        "one_word": timed(one_word, lambda query: index.search(query)),
+        "two_words": timed(two_words, lambda query: index.search(query)),
+        "one_word_in_category": timed(
+            zip(one_word, categories), lambda query: index.search(query[0], category=query[1])
+        ),
+        "typeahead": timed(
+            prefixes, lambda query: (index.complete(query, 5), index.search(query, limit=5, prefix=True))
+        ),
+    }
+
+    start = time.perf_counter()
+    for item in items[:1000]:
+        item.name = f"{item.name} Renamed"
+        index.add(item)
+    results["update_us"] = (time.perf_counter() - start) / 1000 * 1e6
+
+    parameters = {name: value for name, value in vars(args).items() if name != "output"}
+    write_report("search", parameters, results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Stress benchmark for concurrent checkouts.
+
+Many threads place random multi-line orders against a small set of items with
+limited stock, then the benchmark checks that no item was oversold and that the
+stock taken matches the orders that succeeded.
+
+Run from the backend directory:
+    python -m benchmarks.stock_contention --threads 32 --orders 20000
+
+Set INVENTORY_DATABASE_URL to run it against another storage backend.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from app.models import Item, OrderItem
+from app.database import db
+from app.services import process_order
+import argparse
+import logging
+import random
+import sys
+import time
+
+def seed_items(count: int, stock: int):
+    items = []
+    for i in range(count):
+        item = Item(
+            name=f"Contended item {i}",
+            description="Benchmark item",
+            price=10.0,
+            stock=stock,
+            category="Benchmark"
+        )
+        db.add_item(item)
+        items.append(item)
+    return items
+
+def run(threads: int, orders: int, item_count: int, stock: int, max_lines: int, seed: int):
+    items = seed_items(item_count, stock)
+    item_ids = [item.id for item in items]
+    rng = random.Random(seed)
+    carts = []
+    for _ in range(orders):
+        lines = rng.sample(item_ids, rng.randint(1, min(max_lines, len(item_ids))))
+        carts.append([OrderItem(item_id=item_id, quantity=rng.randint(1, 3), unit_price=0) for item_id in lines])
+
+    def place(cart):
+        order, errors = process_order(cart)
+        return order if not errors else None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(place, carts))
+    elapsed = time.perf_counter() - start
+
+    sold = {item_id: 0 for item_id in item_ids}
+    placed = 0
+    for order in results:
+        if order is None:
+            continue
+        placed += 1
+        for line in order.items:
+            sold[line.item_id] += line.quantity
+
+    items = [db.get_item(item.id) for item in items]
+    oversold = []
+    for item in items:
+        if item.stock < 0 or item.stock != stock - sold[item.id]:
+            oversold.append(item.name)
+
+    print(f"threads={threads} orders={orders} items={item_count} stock/item={stock}")
+    print(f"placed={placed} rejected={orders - placed} elapsed={elapsed:.3f}s throughput={orders / elapsed:.0f} orders/s")
+    print(f"remaining stock min={min(item.stock for item in items)} total={sum(item.stock for item in items)}")
+    if oversold:
+        print(f"FAILED: stock inconsistent for {oversold}")
+        return False
+    print("OK: no item oversold")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=20)
+    parser.add_argument("--stock", type=int, default=500)
+    parser.add_argument("--max-lines", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # Switch threads as often as possible to provoke races between check and decrement
+    sys.setswitchinterval(1e-6)
+    ok = run(args.threads, args.orders, args.items, args.stock, args.max_lines, args.seed)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
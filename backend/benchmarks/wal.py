@@ -0,0 +1,107 @@
+"""
+Benchmark for the write-ahead log of the in-memory store.
+
+For each dataset size, places that many orders into a MemoryStorage without
+a log, with a group-committed log, and with a log where every write waits
+for its fsync (from several threads, so fsyncs are shared). Reports the cost
+per order for each, then the startup time when replaying the whole log and
+when loading a snapshot plus a tail of 10% of the orders.
+
+Run from the backend directory:
+    python -m benchmarks.wal --sizes 1000 10000 50000
+"""
+from app.models import Item, Order, OrderItem
+from app.storage import MemoryStorage
+from app.storage.wal import WriteAheadLog
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import logging
+import random
+import shutil
+import tempfile
+import time
+
+def make_orders(item_ids, count: int, rng: random.Random):
+    orders = []
+    for _ in range(count):
+        lines = [
+            OrderItem(item_id=item_id, quantity=rng.randint(1, 3), unit_price=rng.randint(100, 50000) / 100)
+            for item_id in rng.sample(item_ids, rng.randint(1, 5))
+        ]
+        total = sum(line.unit_price * line.quantity for line in lines)
+        orders.append(Order(items=lines, total_amount=total / 100, final_amount=total / 100))
+    return orders
+
+def open_storage(path, flush_interval: float = 0.01, sync_writes: bool = False) -> MemoryStorage:
+    wal = WriteAheadLog(path, flush_interval, sync_writes) if path is not None else None
+    # Snapshots are taken explicitly below
+    return MemoryStorage(wal=wal, snapshot_every=10 ** 12)
+
+def place(storage: MemoryStorage, items, orders, threads: int = 1) -> float:
+    storage.add_items(items)
+    start = time.perf_counter()
+    if threads == 1:
+        for order in orders:
+            storage.place_order(order)
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(storage.place_order, orders))
+    elapsed = time.perf_counter() - start
+    storage.close()
+    return elapsed
+
+def timed_open(path) -> float:
+    start = time.perf_counter()
+    storage = open_storage(path)
+    elapsed = time.perf_counter() - start
+    storage.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    print(f"{'orders':>8} {'no log':>10} {'group':>10} {'sync':>10} {'replay':>9} {'snapshot':>9}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        items = [
+            Item(name=f"WAL item {i}", description="Benchmark item", price=9.99, stock=10 ** 9, category="Benchmark")
+            for i in range(args.items)
+        ]
+        orders = make_orders([item.id for item in items], size, rng)
+        directory = tempfile.mkdtemp(prefix="wal-benchmark-")
+        try:
+            # Each run gets fresh item objects, since stock is changed in place
+            plain = place(open_storage(None), [item.model_copy() for item in items], orders)
+            group = place(open_storage(f"{directory}/group"), [item.model_copy() for item in items], orders)
+            sync = place(open_storage(f"{directory}/sync", 0, True), [item.model_copy() for item in items], orders, args.threads)
+
+            replay = timed_open(f"{directory}/group")
+
+            # Snapshot everything but the last 10% of the orders
+            tail = size // 10
+            storage = open_storage(f"{directory}/snapshot")
+            storage.add_items([item.model_copy() for item in items])
+            for order in orders[:size - tail]:
+                storage.place_order(order)
+            storage.snapshot()
+            for order in orders[size - tail:]:
+                storage.place_order(order)
+            storage.close()
+            snapshot = timed_open(f"{directory}/snapshot")
+        finally:
+            shutil.rmtree(directory)
+
+        print(
+            f"{size:>8} {plain / size * 1e6:>8.1f}us {group / size * 1e6:>8.1f}us {sync / size * 1e6:>8.1f}us "
+            f"{replay:>8.2f}s {snapshot:>8.2f}s"
+        )
+    print(f"sync: every write waits for its fsync, from {args.threads} threads")
+
+if __name__ == "__main__":
+    main()
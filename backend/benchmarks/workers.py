@@ -0,0 +1,143 @@
+"""
+Checkout throughput against several worker processes.
+
+For each worker count, seeds a fresh SQLite database with a synthetic catalog,
+starts `serve.py` with that many workers, and drives POST /orders over HTTP
+from separate client processes for a fixed time. Reports as JSON, per worker
+count, order throughput and latency percentiles, and whether the stock taken
+from the database matches the units in the orders placed.
+
+The clients run on the same machine and compete with the workers for CPU, so
+give them a share of the cores, or run them elsewhere, when measuring scaling.
+
+Run from the backend directory:
+    python -m benchmarks.workers --workers 1,2,4 --clients 2 --concurrency 32 --duration 10
+"""
+from app.storage import SQLiteStorage
+from benchmarks.catalog import seed_catalog
+from benchmarks.report import summarize, write_report
+import argparse
+import asyncio
+import httpx
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+def parse_counts(value: str):
+    return [int(count) for count in value.split(",")]
+
+async def drive(base_url: str, item_ids, args, seed: int):
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+
+    async def client_loop(client: httpx.AsyncClient, measure_from: float, stop_at: float):
+        nonlocal errors
+        while True:
+            now = time.perf_counter()
+            if now >= stop_at:
+                return
+            cart = [
+                {"item_id": item_id, "quantity": rng.randint(1, 5), "unit_price": 0}
+                for item_id in rng.sample(item_ids, rng.randint(1, args.lines))
+            ]
+            response = await client.post("/orders/", json=cart)
+            if now < measure_from:
+                continue
+            latencies.append(time.perf_counter() - now)
+            if response.status_code >= 400:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        measure_from = time.perf_counter() + args.warmup
+        stop_at = measure_from + args.duration
+        await asyncio.gather(*(client_loop(client, measure_from, stop_at) for _ in range(args.concurrency)))
+    return latencies, errors
+
+def client_process(base_url: str, item_ids, args, seed: int, results):
+    results.put(asyncio.run(drive(base_url, item_ids, args, seed)))
+
+def wait_until_up(base_url: str, server: subprocess.Popen):
+    for _ in range(600):
+        if server.poll() is not None:
+            sys.exit(f"serve.py exited with code {server.returncode}")
+        try:
+            httpx.get(base_url + "/")
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    sys.exit("serve.py did not start")
+
+def run(workers: int, args):
+    directory = tempfile.mkdtemp(prefix="benchmark-workers-")
+    path = os.path.join(directory, "inventory.db")
+    storage = SQLiteStorage(path)
+    items, _ = seed_catalog(storage, args.items, args.offers, random.Random(args.seed))
+    storage.close()
+    item_ids = list(items)
+    stock_before = sum(item.stock for item in items.values())
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, INVENTORY_DATABASE_URL=f"sqlite:///{path}", LOG_LEVEL="WARNING")
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(args.port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_up(base_url, server)
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        clients = [
+            context.Process(target=client_process, args=(base_url, item_ids, args, args.seed + index, results))
+            for index in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        outcomes = [results.get() for _ in clients]
+        for client in clients:
+            client.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    latencies = [latency for client_latencies, _ in outcomes for latency in client_latencies]
+    conn = sqlite3.connect(path)
+    stock_after = conn.execute("SELECT SUM(stock) FROM items").fetchone()[0]
+    units_ordered = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM order_items").fetchone()[0]
+    conn.close()
+    return {
+        "orders": summarize(latencies, args.duration),
+        "errors": sum(errors for _, errors in outcomes),
+        "stock_consistent": stock_before - stock_after == units_ordered,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=parse_counts, default="1,2,4", help="Comma-separated worker counts to run")
+    parser.add_argument("--clients", type=int, default=2, help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight per client process")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--offers", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=5, help="Most lines in an order")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to measure for")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds to run before measuring")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="File to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = {str(workers): run(workers, args) for workers in args.workers}
+    parameters = {name: value for name, value in vars(args).items() if name != "output"}
+    write_report("workers", parameters, results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,38 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
+import asyncio
+import math
 import uvicorn
-from app.routers import items, orders, offers, items_management, offers_management
+from app.routers import items, orders, offers, items_management, offers_management, exports, metrics, analytics, changes
+from app.changes import watch_offer_schedule
+from app.database import db
 from app.logger import setup_logger
+from app.metrics import TimingMiddleware
+from app.pagination import NEXT_CURSOR_HEADER
+from app.admission import ADMISSION_CONTROL, AdmissionMiddleware
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; without it responses are encoded with the json module
+    orjson = None
 
 # Setup logger
 logger = setup_logger()
 
-app = FastAPI(title="Inventory Management System")
+app = FastAPI(
+    title="Inventory Management System",
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse
+)
+
+# Limit how many requests of each kind are handled at once, turning the rest
+# away when too many are waiting. Added first, so it runs inside CORS and
+# timing: responses it turns away still get CORS headers and are timed
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
 
 # CORS middleware for frontend interaction
 app.add_middleware(
@@ -16,14 +41,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the cursor of the next page of a list
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Record how long each request takes, per route, for /metrics
+app.add_middleware(TimingMiddleware)
+
 # Include routers
 app.include_router(items.router)
 app.include_router(orders.router)
 app.include_router(offers.router)
 app.include_router(items_management.router)
 app.include_router(offers_management.router)
+app.include_router(exports.router)
+app.include_router(metrics.router)
+app.include_router(analytics.router)
+app.include_router(changes.router)
+
+def _finite(value):
+    # JSON has no Infinity or NaN; send them as text
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_finite(item) for item in value]
+    return value
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # Validation errors echo the input, which may be a number such as Infinity
+    # that was parsed from the body but cannot be sent back as JSON
+    return JSONResponse(status_code=422, content={"detail": _finite(jsonable_encoder(exc.errors()))})
+
+@app.on_event("startup")
+async def startup():
+    # Publish offers starting and ending on schedule to the change feed
+    app.state.offer_schedule_watcher = asyncio.create_task(watch_offer_schedule())
+
+@app.on_event("shutdown")
+def shutdown():
+    app.state.offer_schedule_watcher.cancel()
+    # Flush anything the storage still has buffered, such as the write-ahead log
+    db.close()
 
 @app.get("/")
 async def root():
@@ -32,4 +93,5 @@ async def root():
 
 if __name__ == "__main__":
     logger.info("Starting Inventory Management System API")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    # Change feed streams stay open until the client leaves; stop waiting for them after a few seconds
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, timeout_graceful_shutdown=5) 
\ No newline at end of file
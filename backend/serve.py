@@ -0,0 +1,120 @@
+"""
+Run the API in several worker processes that share one inventory.
+
+    INVENTORY_DATABASE_URL=sqlite:///inventory.db python serve.py --workers 4
+
+The workers share the SQLite database for items, offers and orders, and take
+stock from counters in shared memory, so an order in one worker sees the
+stock taken by every other. Items and offers written, stock taken and orders
+placed through one worker are passed on to the others, for their search
+index, sales aggregates and change feed subscribers.
+
+Workers that exit are started again; SIGINT or SIGTERM stops them all.
+"""
+from app.logger import JsonFormatter, LOG_FORMAT
+from app.storage import shared
+from app.storage.shared import SharedStock
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import uvicorn
+
+# Items the shared stock table has room for, including ones added while running
+SHARED_STOCK_CAPACITY = int(os.environ.get("SHARED_STOCK_CAPACITY", "1000000"))
+# How long workers get to finish their requests when stopping
+WORKER_STOP_SECONDS = 10.0
+
+# The workers log through the application's logging set up in main; this
+# process only logs about starting and stopping them
+logger = logging.getLogger("serve")
+
+def _setup_logger():
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def _serve(config: uvicorn.Config, sock, connection):
+    from app.cluster import join
+    # The parent handles these by stopping every worker; uvicorn installs its own while serving
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    join(connection)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    _setup_logger()
+
+    database_url = os.environ.get("INVENTORY_DATABASE_URL", "memory://")
+    if not database_url.startswith("sqlite:///"):
+        sys.exit("Worker processes need storage they can share: set INVENTORY_DATABASE_URL=sqlite:///path/to/inventory.db")
+
+    # Created before the workers are forked, so they inherit it; the storage picks it up
+    shared.current = SharedStock(SHARED_STOCK_CAPACITY)
+    from app.database import db
+    stocks = [(item.id, item.stock) for item in db.iter_items()]
+    shared.current.set_many(stocks)
+    logger.info("Loaded stock of %s item(s) into shared memory", len(stocks))
+
+    from app.cluster import Hub
+    hub = Hub()
+    # Change feed streams stay open until the client leaves; stop waiting for them after a few seconds
+    config = uvicorn.Config("main:app", host=args.host, port=args.port, timeout_graceful_shutdown=5)
+    sock = config.bind_socket()
+    context = multiprocessing.get_context("fork")
+
+    def start(worker: int) -> multiprocessing.Process:
+        process = context.Process(target=_serve, args=(config, sock, hub.connect(worker)), name=f"worker-{worker}")
+        process.start()
+        logger.info("Started worker %s (pid %s)", worker, process.pid)
+        return process
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = [start(worker) for worker in range(args.workers)]
+    hub.start()
+    try:
+        while not stopping:
+            time.sleep(0.5)
+            for worker, process in enumerate(workers):
+                if not stopping and not process.is_alive():
+                    logger.warning("Worker %s (pid %s) exited with code %s, restarting it", worker, process.pid, process.exitcode)
+                    workers[worker] = start(worker)
+    finally:
+        logger.info("Stopping workers")
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + WORKER_STOP_SECONDS
+        for process in workers:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+        sock.close()
+        shared.current.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getItems, createOrder } from '../services/api';
+import { getItems, createOrder, subscribeToChanges, applyChange } from '../services/api';
 
 const ItemsPage = () => {
   const [items, setItems] = useState([]);
@@ -23,6 +23,12 @@ const ItemsPage = () => {
     };
 
     fetchItems();
+
+    // Keep stock and prices current as they change, instead of polling
+    return subscribeToChanges({
+      onItem: (change) => setItems(currentItems => applyChange(currentItems, change)),
+      onReset: fetchItems,
+    });
   }, []);
 
   const addToCart = (item) => {
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { getOffers } from '../services/api';
+import { getOffers, subscribeToChanges } from '../services/api';
 
 const OffersPage = () => {
   const [offers, setOffers] = useState([]);
@@ -20,6 +20,16 @@ const OffersPage = () => {
     };
 
     fetchOffers();
+
+    // Offers that start, end or change are rare, so the list is fetched again
+    const refreshOffers = async () => {
+      try {
+        setOffers(await getOffers());
+      } catch (err) {
+        console.error('Error refreshing offers:', err);
+      }
+    };
+    return subscribeToChanges({ onOffer: refreshOffers, onReset: refreshOffers });
   }, []);
 
   const formatOfferDetails = (offer) => {
@@ -10,11 +10,25 @@ const api = axios.create({
   },
 });
 
+// List endpoints return one page at a time, with the cursor for the next
+// page in the X-Next-Cursor header; follow it until every record is fetched
+const PAGE_SIZE = 1000;
+
+const getAllPages = async (path) => {
+  const records = [];
+  let cursor;
+  do {
+    const response = await api.get(path, { params: { limit: PAGE_SIZE, cursor } });
+    records.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return records;
+};
+
 // Items API
 export const getItems = async () => {
   try {
-    const response = await api.get('/items');
-    return response.data;
+    return await getAllPages('/items/');
   } catch (error) {
     console.error('Error fetching items:', error);
     throw error;
@@ -44,8 +58,7 @@ export const createOrder = async (orderItems) => {
 
 export const getOrders = async () => {
   try {
-    const response = await api.get('/orders');
-    return response.data;
+    return await getAllPages('/orders/');
   } catch (error) {
     console.error('Error fetching orders:', error);
     throw error;
@@ -123,4 +136,32 @@ export const deleteOffer = async (offerId) => {
     console.error(`Error deleting offer ${offerId}:`, error);
     throw error;
   }
-}; 
\ No newline at end of file
+}; 
+
+// Change feed API
+// Streams item and offer changes so lists stay current without re-fetching.
+// EventSource reconnects by itself and resumes after the last event it received.
+export const subscribeToChanges = ({ onItem, onOffer, onReset }) => {
+  const source = new EventSource(`${API_URL}/changes/`);
+  const listen = (type, callback) => {
+    if (callback) {
+      source.addEventListener(type, (event) => callback(JSON.parse(event.data)));
+    }
+  };
+  listen('item', onItem);
+  listen('offer', onOffer);
+  listen('reset', onReset);
+  return () => source.close();
+};
+
+// Apply a change feed event to a list of records
+export const applyChange = (records, change) => {
+  if (change.deleted) {
+    return records.filter(record => record.id !== change.id);
+  }
+  if (records.some(record => record.id === change.id)) {
+    return records.map(record => record.id === change.id ? { ...record, ...change } : record);
+  }
+  // Changes to records not in the list only carry the changed fields; new records come in full
+  return change.name !== undefined ? [...records, change] : records;
+};